@@ -0,0 +1,237 @@
+"""
+Daily sales rollups for the admin analytics endpoints.
+
+Questions like "revenue by day", "top dishes this month" or "busiest hour"
+used to mean exporting orders and crunching them by hand. Instead each day
+gets one document in analytics_daily:
+
+  {"day": "2025-03-14", "orders": 42, "revenue": 1234.5,
+   "items": {"<menu_item_id>": <quantity>, ...},
+   "hours": {"17": 6, "18": 11, ...}, "updated_at": ...}
+
+server.py $incs the day's document as each order is placed, and recomputes
+it from orders (rollup_day) whenever an order is cancelled or restored.
+A background task re-rolls the last couple of days to repair any drift, and
+backfill() rebuilds any range from scratch with the same aggregation
+pipeline. The admin endpoints read only these documents, never orders, so
+they cost the same at ten thousand orders as at ten million.
+
+Days and hours are in ANALYTICS_TIMEZONE (default UTC). Cancelled orders are
+left out.
+
+  python analytics.py                           # rebuild every day with orders
+  python analytics.py --since 2025-01-01 --until 2025-03-31
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "analytics_daily"
+EXCLUDED_STATUSES = ["Cancelled"]
+# Days the background refresh recomputes; orders rarely change after that
+REFRESH_DAYS = 2
+
+
+class Rollups:
+    """Reads and writes of the rollup documents, with days cut in one timezone"""
+
+    def __init__(self, tz_name: str = "UTC"):
+        self.tz_name = tz_name
+        self.tz = ZoneInfo(tz_name)
+
+    async def ensure_indexes(self, db):
+        await db[COLLECTION].create_index("day", unique=True)
+
+    def local_day(self, moment: datetime) -> date:
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.astimezone(self.tz).date()
+
+    def _day_bounds(self, start: date, end: date):
+        """UTC instants covering local days start..end inclusive"""
+        lower = datetime.combine(start, time.min, self.tz).astimezone(timezone.utc)
+        upper = datetime.combine(end + timedelta(days=1), time.min, self.tz).astimezone(timezone.utc)
+        return lower, upper
+
+    def _date_expr(self, operator: str, spec: Optional[dict] = None) -> dict:
+        if self.tz_name == "UTC" and not spec:
+            return {operator: "$created_at"}
+        spec = {"date": "$created_at", **(spec or {})}
+        if self.tz_name != "UTC":
+            spec["timezone"] = self.tz_name
+        return {operator: spec}
+
+    # ============= WRITES =============
+
+    async def record_order(self, db, order: dict):
+        """Add one newly placed order to its day; errors are logged, the next refresh repairs them"""
+        created_at = order["created_at"]
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        local = created_at.astimezone(self.tz)
+        inc = {"orders": 1, "revenue": order.get("total", 0.0), f"hours.{local.hour}": 1}
+        for item in order.get("items", []):
+            inc[f"items.{item['menu_item_id']}"] = inc.get(f"items.{item['menu_item_id']}", 0) + item["quantity"]
+        try:
+            await db[COLLECTION].update_one(
+                {"day": local.date().isoformat()},
+                {"$inc": inc, "$set": {"updated_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.error(f"Failed to record order {order.get('order_id')} in analytics: {str(e)}")
+
+    async def rollup_day(self, db, day: date):
+        await self.rollup_range(db, day, day)
+
+    async def rollup_range(self, db, start: date, end: date) -> int:
+        """Recompute start..end from orders and overwrite their rollups; returns days with orders"""
+        lower, upper = self._day_bounds(start, end)
+        match = {"$match": {
+            "created_at": {"$gte": lower, "$lt": upper},
+            "status": {"$nin": EXCLUDED_STATUSES},
+        }}
+        day = self._date_expr("$dateToString", {"format": "%Y-%m-%d"})
+
+        by_hour = await db.orders.aggregate([
+            match,
+            {"$group": {
+                "_id": {"day": day, "hour": self._date_expr("$hour")},
+                "orders": {"$sum": 1},
+                "revenue": {"$sum": "$total"},
+            }},
+        ]).to_list(None)
+        by_item = await db.orders.aggregate([
+            match,
+            {"$unwind": "$items"},
+            {"$group": {
+                "_id": {"day": day, "item": "$items.menu_item_id"},
+                "quantity": {"$sum": "$items.quantity"},
+            }},
+        ]).to_list(None)
+
+        docs: Dict[str, dict] = {}
+        for row in by_hour:
+            doc = docs.setdefault(row["_id"]["day"], {"orders": 0, "revenue": 0.0, "items": {}, "hours": {}})
+            doc["orders"] += row["orders"]
+            doc["revenue"] += row["revenue"]
+            doc["hours"][str(row["_id"]["hour"])] = row["orders"]
+        for row in by_item:
+            doc = docs.get(row["_id"]["day"])
+            if doc is not None:
+                doc["items"][row["_id"]["item"]] = row["quantity"]
+
+        now = datetime.now(timezone.utc)
+        current = start
+        while current <= end:
+            key = current.isoformat()
+            if key in docs:
+                await db[COLLECTION].replace_one(
+                    {"day": key}, {"day": key, **docs[key], "updated_at": now}, upsert=True
+                )
+            else:
+                # Every order that day was cancelled (or deleted by hand)
+                await db[COLLECTION].delete_one({"day": key})
+            current += timedelta(days=1)
+        return len(docs)
+
+    async def backfill(self, db, since: Optional[date] = None, until: Optional[date] = None,
+                       chunk_days: int = 31) -> int:
+        """Rebuild rollups for since..until (default: first order to today), a chunk at a time"""
+        if since is None:
+            first = await db.orders.find_one({}, {"_id": 0, "created_at": 1}, sort=[("created_at", 1)])
+            if first is None:
+                return 0
+            since = self.local_day(first["created_at"])
+        until = until or self.local_day(datetime.now(timezone.utc))
+
+        days_with_orders = 0
+        start = since
+        while start <= until:
+            end = min(start + timedelta(days=chunk_days - 1), until)
+            days_with_orders += await self.rollup_range(db, start, end)
+            start = end + timedelta(days=1)
+        return days_with_orders
+
+    async def refresh_periodically(self, db, interval: float):
+        """Background task: re-roll the most recent days every `interval` seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                today = self.local_day(datetime.now(timezone.utc))
+                await self.rollup_range(db, today - timedelta(days=REFRESH_DAYS - 1), today)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Analytics refresh failed: {str(e)}")
+
+    # ============= READS =============
+
+    async def days(self, db, start: date, end: date) -> List[dict]:
+        return await db[COLLECTION].find(
+            {"day": {"$gte": start.isoformat(), "$lte": end.isoformat()}}, {"_id": 0}
+        ).sort("day", 1).to_list(None)
+
+    async def daily_sales(self, db, start: date, end: date) -> List[dict]:
+        """One row per day in the range, zero-filled"""
+        by_day = {doc["day"]: doc for doc in await self.days(db, start, end)}
+        rows = []
+        current = start
+        while current <= end:
+            doc = by_day.get(current.isoformat(), {})
+            orders = doc.get("orders", 0)
+            revenue = round(doc.get("revenue", 0.0), 2)
+            rows.append({
+                "day": current.isoformat(),
+                "orders": orders,
+                "revenue": revenue,
+                "average_order_value": round(revenue / orders, 2) if orders else 0.0,
+            })
+            current += timedelta(days=1)
+        return rows
+
+    async def item_totals(self, db, start: date, end: date) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for doc in await self.days(db, start, end):
+            for item_id, quantity in doc.get("items", {}).items():
+                totals[item_id] = totals.get(item_id, 0) + quantity
+        return totals
+
+    async def hourly_orders(self, db, start: date, end: date) -> List[int]:
+        hours = [0] * 24
+        for doc in await self.days(db, start, end):
+            for hour, count in doc.get("hours", {}).items():
+                hours[int(hour)] += count
+        return hours
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    load_dotenv(Path(__file__).parent / '.env')
+    parser = argparse.ArgumentParser(description="Rebuild the daily sales rollups from orders")
+    parser.add_argument("--since", type=date.fromisoformat, help="First day (default: day of the first order)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Last day (default: today)")
+    parser.add_argument("--chunk-days", type=int, default=31, help="Days aggregated per pipeline run")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    rollups = Rollups(os.environ.get('ANALYTICS_TIMEZONE', 'UTC'))
+    await rollups.ensure_indexes(db)
+    print("Backfilling daily sales rollups...")
+    days = await rollups.backfill(db, args.since, args.until, args.chunk_days)
+    print(f"  {days} days with orders rolled up")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,17 +1,22 @@
+import logging
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 # Secret key for JWT - in production, use environment variable
 SECRET_KEY = "your-secret-key-change-this-in-production-lakeside-restaurant-2024"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
+# Stream tokens travel in URLs, so they only need to live long enough to open the connection
+STREAM_TOKEN_EXPIRE_SECONDS = 60
+STREAM_SCOPE = "stream"
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -29,12 +34,36 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_stream_token(username: str) -> str:
+    """A short-lived token that can only open event streams"""
+    return create_access_token(
+        {"sub": username, "scope": STREAM_SCOPE}, expires_delta=timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return username_from_token(credentials.credentials)
+
+def verify_stream_token(
+    token: Optional[str] = Query(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+):
+    """verify_token for event streams: browsers' EventSource can't send headers, so ?token= is accepted too.
+
+    Only a stream token from create_stream_token is accepted in the query
+    string; the admin token would end up in access and proxy logs.
+    """
+    if credentials is not None:
+        return username_from_token(credentials.credentials)
+    if token:
+        return username_from_token(token, scope=STREAM_SCOPE)
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
+
+def username_from_token(token: str, scope: Optional[str] = None) -> str:
+    """The token's subject, if it is valid and carries exactly `scope` (None for the admin token)"""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("scope") != scope:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
@@ -45,3 +74,13 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
+
+class RedactQueryString(logging.Filter):
+    """Access log filter: stream tokens travel in query strings, so those are left out of the request line"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # uvicorn.access records carry (client, method, path with query, http version, status)
+        if isinstance(record.args, tuple) and len(record.args) == 5 and "?" in str(record.args[2]):
+            client, method, path, version, status_code = record.args
+            record.args = (client, method, path.split("?", 1)[0] + "?[redacted]", version, status_code)
+        return True
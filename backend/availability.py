@@ -0,0 +1,221 @@
+"""
+Live dish availability and stock.
+
+When the kitchen ran out of something the only options were deleting the
+dish or editing its description. Each dish can now be switched off, and can
+carry a stock count, in menu_stock:
+
+  {"menu_item_id": ..., "available": true, "stock": 12, "updated_at": ...}
+
+No document means available with no stock limit, and "stock": null means
+not counted. A dish is sold out when it is switched off or its stock is 0.
+
+Placing an order reserves stock with one conditional $inc per counted dish
+({"stock": {"$gte": quantity}}), so two orders can never both take the last
+portion. If any dish falls short, the decrements already made are put back
+and the order is refused. Cancelling an order returns its stock.
+
+Every worker keeps the documents in memory. Menu responses stay cached per
+menu version as pre-encoded item fragments, and only the "available" flag is
+spliced in per availability version (see splice()). The version only changes
+when a dish sells out or comes back, not on every decrement. Those changes
+are pushed to open /menu/availability/stream connections and, over the
+cache bus, to the other workers, which reload the map from Mongo.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from event_stream import EventHub
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "menu_stock"
+CHANNEL = "menu"
+
+
+class SoldOut(Exception):
+    def __init__(self, menu_item_id: str):
+        super().__init__(menu_item_id)
+        self.menu_item_id = menu_item_id
+
+
+def _sold_out(doc: dict) -> bool:
+    return doc.get("available") is False or doc.get("stock") == 0
+
+
+def encode_fragment(doc: dict) -> bytes:
+    """One menu item as JSON with "available": true last, so splice() can flip it in place"""
+    doc = dict(doc)
+    doc.pop("available", None)
+    doc["available"] = True
+    return dumps(doc)
+
+
+def splice(fragments: List[Tuple[str, bytes]], sold_out: FrozenSet[str]) -> bytes:
+    """JSON array of encoded items with sold-out ones marked "available": false"""
+    return b"[" + b",".join(
+        fragment[:-5] + b"false}" if item_id in sold_out else fragment for item_id, fragment in fragments
+    ) + b"]"
+
+
+class Availability:
+    """In-memory copy of menu_stock for this worker, plus reservations against it"""
+
+    def __init__(self, heartbeat: float = 15.0):
+        self.events = EventHub(heartbeat)
+        self.loaded = False
+        self._docs: Dict[str, dict] = {}
+        self.sold_out: FrozenSet[str] = frozenset()
+        # Bumped whenever sold_out changes, so menu responses re-splice
+        self.version = 0
+        self._listeners: List[Callable[[], None]] = []
+        self._reload_task: Optional[asyncio.Task] = None
+        self._reload_again = False
+
+    async def ensure_indexes(self, db):
+        await db[COLLECTION].create_index("menu_item_id", unique=True)
+
+    def on_change(self, listener: Callable[[], None]):
+        """Call `listener` whenever a dish sells out or comes back, e.g. to drop a cached page"""
+        self._listeners.append(listener)
+
+    def is_available(self, menu_item_id: str) -> bool:
+        return menu_item_id not in self.sold_out
+
+    def _store(self, docs: Iterable[dict]):
+        """Update the map; if that changes what is sold out, bump the version and tell open streams"""
+        for doc in docs:
+            self._docs[doc["menu_item_id"]] = doc
+        self._refresh()
+
+    def _refresh(self):
+        sold_out = frozenset(item_id for item_id, doc in self._docs.items() if _sold_out(doc))
+        if sold_out == self.sold_out:
+            return
+        for item_id in sold_out ^ self.sold_out:
+            doc = self._docs.get(item_id, {})
+            self.events.broadcast(CHANNEL, "availability", {
+                "menu_item_id": item_id, "available": item_id not in sold_out, "stock": doc.get("stock"),
+            })
+        self.sold_out = sold_out
+        self.version += 1
+        for listener in self._listeners:
+            listener()
+
+    async def load(self, db):
+        docs = await db[COLLECTION].find({}, {"_id": 0}).to_list(None)
+        self._docs = {}
+        self._store(docs)
+        self.loaded = True
+
+    async def ensure_loaded(self, db):
+        if not self.loaded:
+            await self.load(db)
+
+    def schedule_reload(self, db):
+        """Cache-bus handler: another worker changed availability, reload it (coalescing bursts)"""
+        if self._reload_task is not None and not self._reload_task.done():
+            self._reload_again = True
+            return
+        self._reload_task = asyncio.create_task(self._reload(db))
+
+    async def _reload(self, db):
+        while True:
+            self._reload_again = False
+            try:
+                await self.load(db)
+            except Exception as e:
+                logger.error(f"Availability reload failed: {str(e)}")
+            if not self._reload_again:
+                return
+
+    # ============= WRITES =============
+
+    async def update(self, db, menu_item_id: str, changes: dict) -> dict:
+        """Set "available" and/or "stock" (None stops counting) for one dish"""
+        update = {"$set": {**changes, "updated_at": datetime.now(timezone.utc)}}
+        defaults = {key: value for key, value in (("available", True), ("stock", None)) if key not in changes}
+        if defaults:
+            update["$setOnInsert"] = defaults
+        doc = await db[COLLECTION].find_one_and_update(
+            {"menu_item_id": menu_item_id},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        doc.pop("_id", None)
+        self._store([doc])
+        return doc
+
+    async def reserve(self, db, quantities: Dict[str, int]) -> List[Tuple[str, int]]:
+        """Take stock for an order's dishes; raises SoldOut (with nothing taken) if any falls short.
+
+        Returns the decrements made, for release() should the order not go through.
+        """
+        for menu_item_id, quantity in quantities.items():
+            # A negative "reservation" would add stock
+            if quantity <= 0:
+                raise ValueError(f"Invalid quantity {quantity} for {menu_item_id}")
+            if not self.is_available(menu_item_id):
+                raise SoldOut(menu_item_id)
+
+        taken: List[Tuple[str, int]] = []
+        changed = []
+        try:
+            for menu_item_id, quantity in quantities.items():
+                if self._docs.get(menu_item_id, {}).get("stock") is None:
+                    continue
+                doc = await db[COLLECTION].find_one_and_update(
+                    {"menu_item_id": menu_item_id, "available": {"$ne": False}, "stock": {"$gte": quantity}},
+                    {"$inc": {"stock": -quantity}},
+                    return_document=ReturnDocument.AFTER,
+                )
+                if doc is None:
+                    # Our copy was stale or the last portions just went; pick up the real count
+                    current = await db[COLLECTION].find_one({"menu_item_id": menu_item_id}, {"_id": 0})
+                    if current is not None:
+                        changed.append(current)
+                    raise SoldOut(menu_item_id)
+                doc.pop("_id", None)
+                changed.append(doc)
+                taken.append((menu_item_id, quantity))
+        except BaseException:
+            # Keep only the count that fell short; the others are about to be put back
+            reserved = {menu_item_id for menu_item_id, _ in taken}
+            self._store(doc for doc in changed if doc["menu_item_id"] not in reserved)
+            await self.release(db, taken)
+            raise
+        self._store(changed)
+        return taken
+
+    async def release(self, db, taken: Iterable[Tuple[str, int]]):
+        """Put back stock taken by reserve() (or by an order that has since been cancelled)"""
+        restored = []
+        for menu_item_id, quantity in taken:
+            try:
+                doc = await db[COLLECTION].find_one_and_update(
+                    {"menu_item_id": menu_item_id, "stock": {"$ne": None}},
+                    {"$inc": {"stock": quantity}},
+                    return_document=ReturnDocument.AFTER,
+                )
+            except Exception as e:
+                logger.error(f"Failed to return {quantity} x {menu_item_id} to stock: {str(e)}")
+                continue
+            if doc is not None:
+                doc.pop("_id", None)
+                restored.append(doc)
+        self._store(restored)
+
+    # ============= EVENT STREAM =============
+
+    def stream(self) -> AsyncIterator[bytes]:
+        """SSE body for menu pages: the sold-out ids, then an event whenever a dish sells out or returns"""
+        return self.events.stream(CHANNEL, lambda: {"sold_out": sorted(self.sold_out)})
+
+    def close_streams(self):
+        self.events.close()
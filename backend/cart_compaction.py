@@ -0,0 +1,247 @@
+"""
+Compaction for the carts and wishlists collections.
+
+The TTL index on updated_at (see server.py) removes carts and wishlists that
+nobody has touched for CART_TTL_DAYS, but only once they hold a BSON date,
+and it never rewrites the documents that survive. This job fills both gaps:
+
+  * purges carts/wishlists whose updated_at is older than the cut-off, which
+    also covers documents written before the TTL index existed; those may
+    still hold the ISO string older versions wrote (see
+    migrate_timestamps.py), which a date range never matches, so strings are
+    parsed and compared here
+  * pulls cart lines and wishlist ids that point at deleted menu items
+
+Work is done in _id-ordered batches with an optional pause between them so
+the primary keeps serving live traffic. Each pass reports how many bytes of
+document data it freed (from collStats). WiredTiger reuses freed pages for
+new writes rather than returning them to the OS.
+
+merge_duplicates() folds carts or wishlists that share a user_id into one
+document. Before the user_id indexes were unique, two concurrent first adds
+could each create one; server.py runs it when the unique index can't be
+built, and migrate_timestamps.py runs it as one of its steps.
+
+server.py runs compaction in the background every CART_COMPACTION_INTERVAL_SECONDS;
+it can also be run by hand:
+
+  python cart_compaction.py                 # one pass with the server defaults
+  python cart_compaction.py --dry-run       # count what would change
+  python cart_compaction.py --max-age-days 7 --batch-size 200 --pause 0.05
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from metrics import cart_compaction_documents_total, cart_compaction_reclaimed_bytes_total
+from migrate_timestamps import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# updated_at as written before timestamps were stored as BSON dates
+LEGACY_TIMESTAMP = {"updated_at": {"$type": "string"}}
+
+# collection -> (array field, filter for an element pointing at a deleted item)
+STALE_REFERENCES = {
+    "carts": ("items", lambda live_ids: {"menu_item_id": {"$nin": live_ids}}),
+    "wishlists": ("menu_item_ids", lambda live_ids: {"$nin": live_ids}),
+}
+
+
+async def data_size(db, collection_name: str) -> Optional[int]:
+    try:
+        stats = await db.command("collStats", collection_name)
+    except Exception:
+        # Not every deployment grants collStats; the pass still runs without a byte count
+        return None
+    return stats.get("size")
+
+
+async def _batched_docs(collection, query: dict, batch_size: int, projection: dict):
+    last_id = None
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        docs = await collection.find(batch_query, {**projection, "_id": 1}).sort("_id", 1).to_list(batch_size)
+        if not docs:
+            return
+        yield docs
+        last_id = docs[-1]["_id"]
+
+
+async def _batched_ids(collection, query: dict, batch_size: int):
+    async for docs in _batched_docs(collection, query, batch_size, {}):
+        yield [doc["_id"] for doc in docs]
+
+
+async def _expired_legacy(collection, cutoff: datetime, batch_size: int):
+    """Batches of (_id, updated_at string) for documents whose string timestamp is older than cutoff"""
+    async for docs in _batched_docs(collection, LEGACY_TIMESTAMP, batch_size, {"updated_at": 1}):
+        expired = []
+        for doc in docs:
+            parsed = parse_timestamp(doc["updated_at"])
+            # An unparseable string can't be aged; migrate_timestamps.py reports those
+            if parsed is not None and parsed < cutoff:
+                expired.append((doc["_id"], doc["updated_at"]))
+        if expired:
+            yield expired
+
+
+async def compact_collection(db, collection_name: str, max_age_days: float, batch_size: int = 500,
+                             pause: float = 0.0, dry_run: bool = False) -> dict:
+    collection = db[collection_name]
+    started = datetime.now(timezone.utc)
+    cutoff = started - timedelta(days=max_age_days)
+    size_before = await data_size(db, collection_name)
+
+    expired_query = {"updated_at": {"$lt": cutoff}}
+    live_ids = await db.menu_items.distinct("id")
+    field, stale_element = STALE_REFERENCES[collection_name]
+    # Skip documents modified during this pass: they may reference a dish created after live_ids was read.
+    # Any write stores a date, so a string timestamp means the document hasn't been touched since the old version
+    stale_query = {
+        field: {"$elemMatch": stale_element(live_ids)},
+        "$or": [{"updated_at": {"$lt": started}}, LEGACY_TIMESTAMP],
+    }
+
+    if dry_run:
+        legacy = 0
+        async for batch in _expired_legacy(collection, cutoff, batch_size):
+            legacy += len(batch)
+        return {
+            "collection": collection_name,
+            "expired": await collection.count_documents(expired_query) + legacy,
+            "stale": await collection.count_documents(stale_query),
+            "reclaimed_bytes": None,
+        }
+
+    expired = 0
+    async for ids in _batched_ids(collection, expired_query, batch_size):
+        # Re-check the age so a cart updated since the batch was read survives
+        result = await collection.delete_many({"_id": {"$in": ids}, **expired_query})
+        expired += result.deleted_count
+        if pause:
+            await asyncio.sleep(pause)
+
+    async for batch in _expired_legacy(collection, cutoff, batch_size):
+        # Matching the string it was read with keeps a document updated since then
+        result = await collection.delete_many(
+            {"$or": [{"_id": _id, "updated_at": updated_at} for _id, updated_at in batch]}
+        )
+        expired += result.deleted_count
+        if pause:
+            await asyncio.sleep(pause)
+
+    stale = 0
+    async for ids in _batched_ids(collection, stale_query, batch_size):
+        # updated_at is left alone: pruning isn't customer activity and mustn't postpone expiry
+        result = await collection.update_many(
+            {"_id": {"$in": ids}, **stale_query},
+            {"$pull": {field: stale_element(live_ids)}}
+        )
+        stale += result.modified_count
+        if pause:
+            await asyncio.sleep(pause)
+
+    size_after = await data_size(db, collection_name)
+    reclaimed = None
+    if size_before is not None and size_after is not None:
+        reclaimed = max(0, size_before - size_after)
+        cart_compaction_reclaimed_bytes_total.labels(collection_name).inc(reclaimed)
+    cart_compaction_documents_total.labels(collection_name, "expired").inc(expired)
+    cart_compaction_documents_total.labels(collection_name, "pruned").inc(stale)
+    return {"collection": collection_name, "expired": expired, "stale": stale, "reclaimed_bytes": reclaimed}
+
+
+def _merged(collection_name: str, docs: list) -> dict:
+    """The array field for one user's duplicate documents combined: cart quantities add up, wishlist ids are unioned"""
+    field = STALE_REFERENCES[collection_name][0]
+    if collection_name == "carts":
+        quantities = {}
+        for doc in docs:
+            for line in doc.get(field) or []:
+                quantities[line["menu_item_id"]] = quantities.get(line["menu_item_id"], 0) + line.get("quantity", 0)
+        return {field: [{"menu_item_id": item_id, "quantity": quantity} for item_id, quantity in quantities.items()]}
+    ids = []
+    for doc in docs:
+        ids.extend(item_id for item_id in doc.get(field) or [] if item_id not in ids)
+    return {field: ids}
+
+
+async def merge_duplicates(db, collection_name: str) -> int:
+    """Merge documents sharing a user_id into the oldest one; returns how many were removed"""
+    collection = db[collection_name]
+    groups = await collection.aggregate([
+        {"$group": {"_id": "$user_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]).to_list(None)
+    removed = 0
+    for group in groups:
+        docs = await collection.find({"_id": {"$in": group["ids"]}}).sort("_id", 1).to_list(None)
+        keeper, duplicates = docs[0], docs[1:]
+        update = _merged(collection_name, docs)
+        dates = [doc["updated_at"] for doc in docs if isinstance(doc.get("updated_at"), datetime)]
+        if dates:
+            update["updated_at"] = max(dates)
+        await collection.update_one({"_id": keeper["_id"]}, {"$set": update})
+        result = await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in duplicates]}})
+        removed += result.deleted_count
+    if removed:
+        logger.info(f"Merged {removed} duplicate {collection_name} into their users' oldest document")
+    return removed
+
+
+async def compact(db, max_age_days: float, batch_size: int = 500, pause: float = 0.0,
+                  dry_run: bool = False) -> list:
+    reports = []
+    for collection_name in STALE_REFERENCES:
+        report = await compact_collection(db, collection_name, max_age_days, batch_size, pause, dry_run)
+        logger.info(
+            f"Compacted {collection_name}: {report['expired']} expired, {report['stale']} with deleted items, "
+            f"{report['reclaimed_bytes'] if report['reclaimed_bytes'] is not None else 'unknown'} bytes reclaimed"
+        )
+        reports.append(report)
+    return reports
+
+
+async def compact_periodically(db, interval: float, max_age_days: float, batch_size: int = 500, pause: float = 0.05):
+    """Background task: one pass every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await compact(db, max_age_days, batch_size, pause)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Cart compaction failed: {str(e)}")
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    load_dotenv(Path(__file__).parent / '.env')
+    parser = argparse.ArgumentParser(description="Purge abandoned carts/wishlists and prune deleted menu items")
+    parser.add_argument("--max-age-days", type=float, default=float(os.environ.get('CART_TTL_DAYS', '30')))
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    print("Compacting carts and wishlists..." + (" (dry run)" if args.dry_run else ""))
+    for report in await compact(db, args.max_age_days, args.batch_size, args.pause, args.dry_run):
+        reclaimed = report["reclaimed_bytes"]
+        print(f"  {report['collection']}: {report['expired']} expired, {report['stale']} referencing deleted items"
+              + ("" if reclaimed is None else f", {reclaimed} bytes reclaimed"))
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,254 @@
+"""
+Negotiated brotli/gzip compression.
+
+Two paths:
+
+  * CompressedPayload / ResponseCache hold cacheable public payloads (the
+    home bundle, menu listings) already encoded and compressed. Each variant
+    is built once per content version and payload_response() serves the
+    bytes that match Accept-Encoding. Each variant is a different
+    representation, so each has its own strong ETag ("<sha1>", "<sha1>-br",
+    "<sha1>-gz"). Only the canonical payloads every visitor shares get the
+    high compression level; keys built from arbitrary query parameters get
+    the cheap one, so cycling through them can't buy a brotli-11 run per
+    request. Either way the compression runs in a worker thread, off the
+    event loop.
+  * CompressionMiddleware compresses everything else per request at a cheap
+    level: admin listings, orders and other dynamic JSON.
+
+Bodies smaller than MIN_SIZE are sent as-is; the framing overhead would eat
+any saving. Both paths record the achieved ratio (compressed / original) in
+the http_response_compression_ratio histogram.
+"""
+import asyncio
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import brotli
+from fastapi import Request, Response
+
+from metrics import http_response_compression_ratio
+
+MIN_SIZE = 1024
+
+# Preference order when the client accepts several encodings equally
+ENCODINGS = ("br", "gzip")
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+# ETag suffix per encoding; the identity body's tag has none
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+
+def _compress(body: bytes, encoding: str, precomputed: bool) -> bytes:
+    if encoding == "br":
+        # Quality 11 is too slow per request but fine once per content version
+        return brotli.compress(body, quality=11 if precomputed else 4)
+    return gzip.compress(body, compresslevel=9 if precomputed else 6)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values; None for identity"""
+    weights: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressedPayload:
+    """One JSON body with its compressed variants and an ETag for each.
+
+    `precomputed` picks the high compression level, for payloads shared by
+    every visitor; the cheap level is for ad-hoc ones.
+    """
+
+    __slots__ = ("body", "etags", "variants")
+
+    def __init__(self, body: bytes, precomputed: bool = True):
+        self.body = body
+        digest = hashlib.sha1(body).hexdigest()
+        # Keyed by encoding, None being the uncompressed body
+        self.etags: Dict[Optional[str], str] = {None: f'"{digest}"'}
+        self.variants: Dict[str, bytes] = {}
+        if len(body) >= MIN_SIZE:
+            for encoding in ENCODINGS:
+                compressed = _compress(body, encoding, precomputed)
+                http_response_compression_ratio.labels(encoding, "precomputed" if precomputed else "dynamic").observe(
+                    len(compressed) / len(body)
+                )
+                self.variants[encoding] = compressed
+                self.etags[encoding] = f'"{digest}{ETAG_SUFFIXES[encoding]}"'
+
+
+def none_match(if_none_match: Optional[str], etag: str) -> bool:
+    """True if If-None-Match lists `etag` (weak comparison) or is "*", i.e. the client's copy is current"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def payload_response(request: Request, payload: CompressedPayload, cache_control: str = "no-cache") -> Response:
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    if encoding not in payload.variants:
+        encoding = None
+    headers = {"ETag": payload.etags[encoding], "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if none_match(request.headers.get("if-none-match"), payload.etags[encoding]):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(payload.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(payload.variants[encoding], media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """Compressed payloads keyed by (content version, request key), bounded LRU.
+
+    Entries for older versions are simply never hit again and age out, so
+    invalidation is just bumping the version the caller passes in. With
+    `compress=False` the built values are cached as they are.
+    """
+
+    def __init__(self, max_entries: int = 256, compress: bool = True):
+        self.max_entries = max_entries
+        self.compress = compress
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        # cache key -> [lock, requests using it]; kept until the last of them is done
+        self._locks: Dict[Hashable, list] = {}
+
+    async def get(self, version: Hashable, key: Hashable, build: Callable[[], Awaitable[Any]],
+                  precomputed: bool = True) -> Any:
+        """The cached payload, building it once however many requests miss together.
+
+        `precomputed=False` marks a key made from arbitrary request parameters,
+        compressed at the cheap level.
+        """
+        cache_key = (version, key)
+        payload = self._entries.get(cache_key)
+        if payload is not None:
+            self._entries.move_to_end(cache_key)
+            return payload
+
+        entry = self._locks.setdefault(cache_key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                payload = self._entries.get(cache_key)
+                if payload is None:
+                    payload = await build()
+                    if self.compress:
+                        payload = await asyncio.to_thread(CompressedPayload, payload, precomputed)
+                    self._entries[cache_key] = payload
+                    if len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        finally:
+            # Dropped only once nobody is queued on it, so a late miss can't start a second build
+            entry[1] -= 1
+            if entry[1] == 0 and self._locks.get(cache_key) is entry:
+                del self._locks[cache_key]
+        return payload
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing single-message responses that aren't already encoded"""
+
+    def __init__(self, app, min_size: int = MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            if start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = start_message.get("headers", [])
+            content_type = b""
+            already_encoded = False
+            for name, value in headers:
+                if name == b"content-type":
+                    content_type = value
+                elif name == b"content-encoding":
+                    already_encoded = True
+
+            compressible = (
+                not already_encoded
+                and not message.get("more_body", False)
+                and len(body) >= self.min_size
+                and content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+            )
+            if not compressible:
+                # Streaming bodies, files and small or pre-encoded responses go through untouched
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = _compress(body, encoding, precomputed=False)
+            http_response_compression_ratio.labels(encoding, "dynamic").observe(len(compressed) / len(body))
+            new_headers = [(name, value) for name, value in headers
+                           if name not in (b"content-length", b"vary")]
+            vary = [value for name, value in headers if name == b"vary"]
+            if b"accept-encoding" not in b",".join(vary).lower():
+                vary.append(b"Accept-Encoding")
+            new_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+                (b"vary", b", ".join(vary)),
+            ]
+            passthrough = True
+            await send({**start_message, "headers": new_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
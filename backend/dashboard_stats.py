@@ -0,0 +1,147 @@
+"""
+Counters behind the admin dashboard.
+
+Rather than counting collections on every dashboard load, server.py bumps a
+single counter document with $inc whenever it inserts or deletes something
+the dashboard shows. The document also keeps per-day buckets for the
+date-stamped collections so today/this-week figures come from the same read.
+
+$inc keeps the counters exact under concurrent writes, but anything that
+bypasses the API (seed_data.py, manual edits, a crash between the insert and
+the $inc) makes them drift, so reconcile() recounts from the source
+collections and a background task runs it periodically.
+
+Order revenue leaves out cancelled orders (analytics.EXCLUDED_STATUSES), the
+same as the sales reports; server.py takes an order's total back out of the
+revenue when it is cancelled and adds it again if it is restored.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from analytics import EXCLUDED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_ID = "dashboard"
+# Daily buckets older than this are dropped on reconciliation
+DAILY_RETENTION_DAYS = 14
+
+# counter name -> source collection
+TOTAL_COUNTERS = {
+    "contacts": "contact_forms",
+    "reservations": "reservations",
+    "menu_items": "menu_items",
+    "testimonials": "testimonials",
+    "orders": "orders",
+}
+# Counters that also get a per-day bucket keyed on created_at
+DAILY_COUNTERS = ("contacts", "reservations", "orders")
+
+
+def day_key(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%d")
+
+
+async def record(db, counter: str, amount: int = 1, created_at: Optional[datetime] = None, revenue: float = 0.0):
+    """Apply one insert (amount=1) or delete (amount=-1) to the counters.
+
+    amount=0 with a revenue adjusts only the revenue, for an order that is
+    cancelled or restored.
+
+    Failures are logged rather than raised: a missed increment is repaired by
+    the next reconciliation and must not fail the customer's request.
+    """
+    inc = {f"totals.{counter}": amount}
+    if revenue:
+        inc["totals.order_revenue"] = revenue
+    if created_at is not None and counter in DAILY_COUNTERS:
+        day = day_key(created_at)
+        inc[f"daily.{day}.{counter}"] = amount
+        if revenue:
+            inc[f"daily.{day}.order_revenue"] = revenue
+    try:
+        # No upsert: until the first reconciliation has written a full baseline
+        # a partial document would report misleadingly small totals
+        await db.dashboard_counters.update_one({"id": COUNTERS_ID}, {"$inc": inc})
+    except Exception as e:
+        logger.error(f"Failed to update dashboard counter {counter}: {str(e)}")
+
+
+async def reconcile(db, now: Optional[datetime] = None) -> dict:
+    """Recount everything from the source collections and overwrite the counters"""
+    now = now or datetime.now(timezone.utc)
+    since = (now - timedelta(days=DAILY_RETENTION_DAYS - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    totals = {}
+    for counter, collection in TOTAL_COUNTERS.items():
+        totals[counter] = await db[collection].count_documents({})
+    revenue = await db.orders.aggregate([
+        {"$match": {"status": {"$nin": EXCLUDED_STATUSES}}},
+        {"$group": {"_id": None, "revenue": {"$sum": "$total"}}}
+    ]).to_list(1)
+    totals["order_revenue"] = revenue[0]["revenue"] if revenue else 0.0
+
+    daily = {}
+    for counter in DAILY_COUNTERS:
+        group = {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "count": {"$sum": 1}}
+        if counter == "orders":
+            # Cancelled orders still count as orders placed that day, but earn nothing
+            group["revenue"] = {"$sum": {"$cond": [{"$in": ["$status", EXCLUDED_STATUSES]}, 0, "$total"]}}
+        buckets = await db[TOTAL_COUNTERS[counter]].aggregate([
+            {"$match": {"created_at": {"$gte": since}}},
+            {"$group": group},
+        ]).to_list(None)
+        for bucket in buckets:
+            day = daily.setdefault(bucket["_id"], {})
+            day[counter] = bucket["count"]
+            if "revenue" in bucket:
+                day["order_revenue"] = bucket["revenue"]
+
+    doc = {"id": COUNTERS_ID, "totals": totals, "daily": daily, "reconciled_at": now}
+    await db.dashboard_counters.replace_one({"id": COUNTERS_ID}, doc, upsert=True)
+    return doc
+
+
+def _sum_days(daily: dict, days) -> dict:
+    summed = {counter: 0 for counter in DAILY_COUNTERS}
+    summed["order_revenue"] = 0.0
+    for day in days:
+        for counter, value in daily.get(day, {}).items():
+            summed[counter] = summed.get(counter, 0) + value
+    summed["order_revenue"] = round(summed["order_revenue"], 2)
+    return summed
+
+
+async def get_stats(db, now: Optional[datetime] = None) -> dict:
+    """Dashboard figures from the single counter document"""
+    now = now or datetime.now(timezone.utc)
+    doc = await db.dashboard_counters.find_one({"id": COUNTERS_ID}, {"_id": 0})
+    if doc is None:
+        doc = await reconcile(db, now)
+
+    totals = dict(doc.get("totals", {}))
+    totals["order_revenue"] = round(float(totals.get("order_revenue", 0.0)), 2)
+    daily = doc.get("daily", {})
+    today = now.astimezone(timezone.utc).date()
+    # Weeks start on Monday; days are UTC like every stored timestamp
+    week = [today - timedelta(days=offset) for offset in range(today.weekday() + 1)]
+    return {
+        "totals": totals,
+        "today": _sum_days(daily, [today.isoformat()]),
+        "this_week": _sum_days(daily, [day.isoformat() for day in week]),
+        "reconciled_at": doc.get("reconciled_at"),
+    }
+
+
+async def reconcile_periodically(db, interval: float):
+    """Background task: reconcile now and then every `interval` seconds"""
+    while True:
+        try:
+            await reconcile(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Dashboard counter reconciliation failed: {str(e)}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,242 @@
+"""
+Delivery zones: the delivery fee and order minimum for an address.
+
+The fee used to be whatever the browser sent. Admins now define zones in
+delivery_zones, each with a fee, a minimum subtotal, and a postcode set, a
+polygon of [longitude, latitude] points, or both:
+
+  {"id": ..., "name": "Inner east", "fee": 4.0, "minimum_order": 20.0,
+   "postcodes": ["3121", "3122", "3123"], "polygon": [[145.02, -37.81], ...],
+   "active": true}
+
+A free-form delivery address is resolved offline against a postcode/suburb
+table (POSTCODE_TABLE, default postcodes.csv beside this file: suburb,
+postcode, state, latitude, longitude) to a suburb and its centroid. The
+shipped table covers the suburbs around the restaurant; point it at a full
+national table to resolve anything else. The location is then looked up in
+a ZoneIndex compiled from the active zones:
+
+  * postcodes go in a dict
+  * polygons are rasterised onto a grid of cells. A cell no polygon edge
+    passes through is wholly inside or wholly outside each polygon, so only
+    points in edge cells need a point-in-polygon test
+
+When several zones match, the cheapest wins. The compiled index is kept per
+worker and rebuilt after admin edits, so resolving an order's fee is a few
+dict lookups. With no zones defined at all every address gets the flat
+default fee, as before.
+"""
+import asyncio
+import csv
+import math
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_TABLE = Path(__file__).parent / "postcodes.csv"
+# Degrees per grid cell (about 500 m); coarsened when zones cover a large area
+CELL_SIZE = 0.005
+MAX_CELLS = 250_000
+# Longest suburb name, in words, looked for in an address
+MAX_SUBURB_WORDS = 4
+
+_WORD = re.compile(r"[A-Z0-9]+")
+
+
+@dataclass(frozen=True)
+class Location:
+    suburb: str
+    postcode: str
+    state: str
+    latitude: float
+    longitude: float
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.upper().replace("'", ""))
+
+
+class PostcodeTable:
+    """Suburb and postcode lookup for free-form addresses"""
+
+    def __init__(self, rows: Sequence[Location]):
+        self.by_postcode: Dict[str, List[Location]] = {}
+        self.by_suburb: Dict[Tuple[str, ...], List[Location]] = {}
+        for row in rows:
+            self.by_postcode.setdefault(row.postcode, []).append(row)
+            self.by_suburb.setdefault(tuple(_words(row.suburb)), []).append(row)
+        self.states = {row.state for row in rows}
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "PostcodeTable":
+        with open(path, newline="") as f:
+            return cls([
+                Location(row["suburb"], row["postcode"], row["state"], float(row["latitude"]), float(row["longitude"]))
+                for row in csv.DictReader(f)
+            ])
+
+    def resolve(self, address: str) -> Optional[Location]:
+        """The address's suburb, preferring one that agrees with its postcode and state"""
+        words = _words(address)
+        state = next((w for w in reversed(words) if w in self.states), None)
+
+        # Suburb names in the address, later and longer ones first ("... Hawthorn East VIC 3123")
+        suburbs: List[Location] = []
+        last_suburb_at = 0
+        for end in range(len(words), 0, -1):
+            for size in range(min(MAX_SUBURB_WORDS, end), 0, -1):
+                found = self.by_suburb.get(tuple(words[end - size:end]), [])
+                if found and not suburbs:
+                    last_suburb_at = end - size
+                suburbs += found
+
+        # A number ahead of the suburb is a street number ("3121 Burwood Rd, Hawthorn"), not a postcode
+        postcode = next(
+            (w for w in reversed(words[last_suburb_at:]) if len(w) == 4 and w.isdigit() and w in self.by_postcode), None
+        )
+
+        if postcode is not None:
+            candidates = self.by_postcode[postcode]
+            return next((row for row in suburbs if row in candidates), candidates[0])
+        if state is not None:
+            suburbs = [row for row in suburbs if row.state == state] or suburbs
+        return suburbs[0] if suburbs else None
+
+
+def point_in_polygon(x: float, y: float, polygon: Sequence[Tuple[float, float]]) -> bool:
+    """Even-odd ray casting"""
+    inside = False
+    x1, y1 = polygon[-1]
+    for x2, y2 in polygon:
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+class ZoneIndex:
+    """Active zones compiled for lookup by postcode and by point"""
+
+    def __init__(self, zones: List[dict], cell_size: float = CELL_SIZE):
+        # Cheapest first, so the first match is the one to charge
+        self.zones = sorted(zones, key=lambda zone: (zone["fee"], zone["name"]))
+        self.by_postcode: Dict[str, int] = {}
+        for rank, zone in enumerate(self.zones):
+            for postcode in zone.get("postcodes") or []:
+                self.by_postcode.setdefault(postcode, rank)
+
+        polygons = [(rank, zone["polygon"]) for rank, zone in enumerate(self.zones) if zone.get("polygon")]
+        area = sum(
+            (max(x for x, _ in p) - min(x for x, _ in p)) * (max(y for _, y in p) - min(y for _, y in p))
+            for _, p in polygons
+        )
+        self.cell_size = max(cell_size, math.sqrt(area / MAX_CELLS))
+        # cell -> [(rank, exact)]: exact means the whole cell is inside, otherwise test the point
+        self.grid: Dict[Tuple[int, int], List[Tuple[int, bool]]] = {}
+        for rank, polygon in polygons:
+            self._rasterise(rank, polygon)
+        for cell in self.grid.values():
+            cell.sort()
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _edge_cells(self, a: Tuple[float, float], b: Tuple[float, float]):
+        """Cells the segment a-b passes through, column by column, padded slightly against rounding"""
+        size = self.cell_size
+        pad = size * 1e-6
+        (x1, y1), (x2, y2) = sorted((a, b))
+        for i in range(math.floor((x1 - pad) / size), math.floor((x2 + pad) / size) + 1):
+            if x2 - x1 <= pad:
+                low, high = min(y1, y2), max(y1, y2)
+            else:
+                # The segment's y at either side of column i, clipped to the segment
+                ya = y1 + (y2 - y1) * (max(x1, i * size) - x1) / (x2 - x1)
+                yb = y1 + (y2 - y1) * (min(x2, (i + 1) * size) - x1) / (x2 - x1)
+                low, high = min(ya, yb), max(ya, yb)
+            for j in range(math.floor((low - pad) / size), math.floor((high + pad) / size) + 1):
+                yield i, j
+
+    def _rasterise(self, rank: int, polygon: List[Tuple[float, float]]):
+        size = self.cell_size
+        (x0, y0) = self._cell(min(x for x, _ in polygon), min(y for _, y in polygon))
+        (x1, y1) = self._cell(max(x for x, _ in polygon), max(y for _, y in polygon))
+
+        edge_cells = set()
+        previous = polygon[-1]
+        for point in polygon:
+            edge_cells.update(self._edge_cells(previous, point))
+            previous = point
+
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                if (i, j) in edge_cells:
+                    self.grid.setdefault((i, j), []).append((rank, False))
+                elif point_in_polygon((i + 0.5) * size, (j + 0.5) * size, polygon):
+                    self.grid.setdefault((i, j), []).append((rank, True))
+
+    def match(self, location: Location) -> Optional[dict]:
+        best = self.by_postcode.get(location.postcode)
+        for rank, exact in self.grid.get(self._cell(location.longitude, location.latitude), ()):
+            if best is not None and rank >= best:
+                break
+            if exact or point_in_polygon(location.longitude, location.latitude, self.zones[rank]["polygon"]):
+                best = rank
+                break
+        return None if best is None else self.zones[best]
+
+
+class DeliveryZones:
+    """Per-worker compiled zone index, reloaded lazily after invalidate(), and fee quotes"""
+
+    def __init__(self, postcodes: PostcodeTable, default_fee: float):
+        self.postcodes = postcodes
+        self.default_fee = default_fee
+        self._index: Optional[ZoneIndex] = None
+        self._lock = asyncio.Lock()
+        self.version = 0
+
+    async def index(self, db) -> ZoneIndex:
+        index = self._index
+        if index is not None:
+            return index
+
+        async with self._lock:
+            if self._index is None:
+                version = self.version
+                zones = await db.delivery_zones.find({"active": True}, {"_id": 0}).to_list(None)
+                loaded = ZoneIndex(zones)
+                # A zone was edited while we were loading; serve it but don't keep it
+                if version != self.version:
+                    return loaded
+                self._index = loaded
+            return self._index
+
+    def invalidate(self):
+        self._index = None
+        self.version += 1
+
+    async def quote(self, db, address: str, subtotal: float) -> dict:
+        """Fee and minimum for delivering to `address`; "deliverable" is False with a reason if we can't"""
+        index = await self.index(db)
+        if not index.zones:
+            return {"deliverable": True, "zone": None, "fee": self.default_fee, "minimum_order": 0.0}
+
+        location = self.postcodes.resolve(address)
+        if location is None:
+            return {"deliverable": False, "reason": "Please include the suburb and postcode in the delivery address"}
+        place = {"suburb": location.suburb, "postcode": location.postcode}
+        zone = index.match(location)
+        if zone is None:
+            return {"deliverable": False, **place,
+                    "reason": f"Sorry, we don't deliver to {location.suburb} {location.postcode}"}
+
+        quote = {"deliverable": True, **place, "zone": zone["name"],
+                 "fee": zone["fee"], "minimum_order": zone.get("minimum_order", 0.0)}
+        if subtotal < quote["minimum_order"]:
+            quote["deliverable"] = False
+            quote["reason"] = (
+                f"Delivery to {location.suburb} needs a subtotal of at least ${quote['minimum_order']:.2f}"
+            )
+        return quote
@@ -2,7 +2,9 @@ import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import time
 from typing import Optional
+from metrics import smtp_send_duration_seconds, smtp_emails_total, smtp_sends_in_progress
 
 class EmailService:
     def __init__(self):
@@ -18,6 +20,7 @@ class EmailService:
             # If SMTP credentials not configured, skip email sending
             if not self.smtp_user or not self.smtp_password:
                 print(f"SMTP not configured. Email would have been sent to {to_email}")
+                smtp_emails_total.labels("skipped").inc()
                 return True
             
             message = MIMEMultipart('alternative')
@@ -35,17 +38,29 @@ class EmailService:
                 message.attach(part2)
             
             # Send email
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                username=self.smtp_user,
-                password=self.smtp_password,
-                start_tls=True,
-            )
+            start = time.perf_counter()
+            in_progress = smtp_sends_in_progress.labels()
+            in_progress.inc()
+            try:
+                await aiosmtplib.send(
+                    message,
+                    hostname=self.smtp_host,
+                    port=self.smtp_port,
+                    username=self.smtp_user,
+                    password=self.smtp_password,
+                    start_tls=True,
+                )
+            except Exception:
+                smtp_send_duration_seconds.labels("failed").observe(time.perf_counter() - start)
+                raise
+            finally:
+                in_progress.dec()
+            smtp_send_duration_seconds.labels("sent").observe(time.perf_counter() - start)
+            smtp_emails_total.labels("sent").inc()
             return True
         except Exception as e:
             print(f"Error sending email: {str(e)}")
+            smtp_emails_total.labels("failed").inc()
             return False
     
     async def send_contact_notification(self, admin_email: str, contact_data: dict):
@@ -0,0 +1,75 @@
+"""
+Server-sent event fan-out for live screens (kitchen stations, menu availability).
+
+Each connected client gets a bounded queue on a named channel. broadcast()
+encodes an event once and drops it into every queue on the channel; a client
+too far behind has its stream ended instead, and EventSource reconnects and
+starts again from a fresh snapshot. Idle streams get a comment line every
+`heartbeat` seconds so proxies don't time them out.
+
+These connections never end by themselves, and uvicorn waits for every
+connection before it shuts down, so close() has to be called when draining
+starts (server.py registers it with lifecycle.on_drain). After that, new
+streams end straight after their snapshot.
+"""
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Set
+
+from serialization import dumps
+
+# Events a client may fall behind by before its stream is closed
+BACKLOG = 256
+
+
+def encode_event(name: str, data) -> bytes:
+    return b"event: " + name.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+class EventHub:
+    def __init__(self, heartbeat: float = 15.0):
+        self.heartbeat = heartbeat
+        self.closed = False
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def broadcast(self, channel: str, name: str, data):
+        queues = self._subscribers.get(channel)
+        if not queues:
+            return
+        message = encode_event(name, data)
+        for queue in list(queues):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                queues.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def stream(self, channel: str, snapshot: Callable[[], dict]) -> AsyncIterator[bytes]:
+        """SSE body: a "snapshot" event, then the channel's events, with keep-alive comments"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=BACKLOG)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            yield b"retry: 3000\n" + encode_event("snapshot", snapshot())
+            if self.closed:
+                return
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self._subscribers.get(channel, set()).discard(queue)
+
+    def close(self):
+        """End every open stream, and any opened later, so shutdown isn't held up by clients"""
+        self.closed = True
+        for queues in self._subscribers.values():
+            for queue in list(queues):
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+            queues.clear()
@@ -0,0 +1,163 @@
+"""
+Per-dish demand forecast for kitchen prep.
+
+Curry bases and naan dough are prepped by gut feel. This module predicts
+how many of each dish will sell on each of the next FORECAST_HORIZON_DAYS
+days, and when during the day, from the recent order history.
+
+The method is a seasonal average, vectorized over every dish at once:
+
+  * quantities sold per dish per day over the last FORECAST_HISTORY_WEEKS
+    full weeks form a (weeks, 7, dishes) array
+  * each weekday's expected quantity is an exponentially weighted mean
+    across those weeks: the week k weeks before the most recent one is
+    weighted (1 - FORECAST_SMOOTHING)^k and the weights are normalised to
+    sum to 1, so a higher FORECAST_SMOOTHING makes older weeks fade faster
+    and a dish that has taken off recently counts for more
+  * that day's total is spread across hours using the dish's own hourly
+    pattern for the weekday, or the whole menu's pattern where the dish has
+    no history on that weekday
+
+Orders come from the ReportEngine's cached columns (see reports.py) and dish
+names and categories from the menu index. Dishes no longer on the menu are
+left out. The forecast is rebuilt every FORECAST_REFRESH_SECONDS and
+GET /api/admin/forecast serves the last result from memory.
+"""
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+
+from reports import OrderColumns, local_seconds
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+# Dishes and hours expected to sell less than this are left out of the response
+MIN_QUANTITY = 0.05
+
+
+def _weekday(days: np.ndarray) -> np.ndarray:
+    # 1970-01-01 (day 0) was a Thursday
+    return (days + 3) % 7
+
+
+def forecast_demand(cols: OrderColumns, menu: dict, tz_name: str, now: datetime,
+                    history_weeks: int = 8, smoothing: float = 0.3, horizon_days: int = 7) -> dict:
+    seconds = local_seconds(cols.created_at, tz_name)
+    order_days = np.floor_divide(seconds, 86400).astype(np.int64)
+    order_hours = (np.floor_divide(seconds, 3600) % 24).astype(np.int64)
+
+    today_ordinal = int(local_seconds(np.array([now.timestamp()]), tz_name)[0] // 86400)
+    today = date(1970, 1, 1) + timedelta(days=today_ordinal)
+    first_day = today_ordinal - history_weeks * 7    # whole weeks, ending yesterday
+    item_count = len(cols.item_ids)
+
+    line_days = order_days[cols.line_order]
+    in_window = (line_days >= first_day) & (line_days < today_ordinal)
+    days = line_days[in_window] - first_day
+    items = cols.line_item[in_window]
+    quantities = cols.line_quantity[in_window]
+
+    # (weeks, 7, dishes); position j within a week is weekday _weekday(first_day + j)
+    daily = np.bincount(
+        days * item_count + items, weights=quantities, minlength=history_weeks * 7 * item_count
+    ).reshape(history_weeks, 7, item_count)
+    weights = (1 - smoothing) ** np.arange(history_weeks - 1, -1, -1)
+    weights /= weights.sum()
+    by_position = np.tensordot(weights, daily, axes=1)        # (7, dishes)
+    by_weekday = np.empty_like(by_position)
+    by_weekday[_weekday(first_day + np.arange(7))] = by_position
+
+    # Hour-of-day shares per dish and weekday, falling back to the whole menu's shares
+    weekdays = _weekday(line_days[in_window])
+    hours = order_hours[cols.line_order][in_window]
+    hourly = np.bincount(
+        (items * 7 + weekdays) * 24 + hours, weights=quantities, minlength=item_count * 7 * 24
+    ).reshape(item_count, 7, 24)
+    menu_hourly = hourly.sum(axis=0, keepdims=True)
+    hourly = np.where(hourly.sum(axis=2, keepdims=True) > 0, hourly, menu_hourly)
+    totals = hourly.sum(axis=2, keepdims=True)
+    shares = np.divide(hourly, totals, out=np.zeros_like(hourly), where=totals > 0)
+
+    days_out = []
+    for offset in range(horizon_days):
+        day = today + timedelta(days=offset)
+        weekday = day.weekday()
+        dishes, categories = [], {}
+        for code in np.argsort(-by_weekday[weekday], kind="stable"):
+            expected = float(by_weekday[weekday, code])
+            item = menu.get(cols.item_ids[code])
+            if expected < MIN_QUANTITY:
+                break
+            if item is None:
+                continue
+            category = item.get("category")
+            categories[category] = categories.get(category, 0.0) + expected
+            dishes.append({
+                "menu_item_id": cols.item_ids[code],
+                "name": item.get("name"),
+                "category": category,
+                "expected": round(expected, 2),
+                "hours": {
+                    str(hour): round(expected * share, 2)
+                    for hour, share in enumerate(shares[code, weekday].tolist()) if expected * share >= MIN_QUANTITY
+                },
+            })
+        days_out.append({
+            "date": day.isoformat(),
+            "weekday": WEEKDAYS[weekday],
+            "items": dishes,
+            "categories": [
+                {"category": category, "expected": round(expected, 2)}
+                for category, expected in sorted(categories.items(), key=lambda entry: -entry[1])
+            ],
+        })
+
+    return {
+        "generated_at": now,
+        "timezone": tz_name,
+        "history_weeks": history_weeks,
+        "smoothing": smoothing,
+        "days": days_out,
+    }
+
+
+class DemandForecaster:
+    """Holds the latest forecast; refresh() rebuilds it from the report columns and menu index"""
+
+    def __init__(self, report_engine, menu_index, history_weeks: int = 8, smoothing: float = 0.3,
+                 horizon_days: int = 7):
+        self.report_engine = report_engine
+        self.menu_index = menu_index
+        self.history_weeks = history_weeks
+        self.smoothing = smoothing
+        self.horizon_days = horizon_days
+        self.result: Optional[dict] = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, db) -> dict:
+        async with self._lock:
+            cols = await self.report_engine.columns(db)
+            menu = await self.menu_index.items(db)
+            self.result = forecast_demand(
+                cols, menu, self.report_engine.tz_name, datetime.now(timezone.utc),
+                self.history_weeks, self.smoothing, self.horizon_days,
+            )
+            return self.result
+
+    async def get(self, db) -> dict:
+        return self.result or await self.refresh(db)
+
+    async def refresh_periodically(self, db, interval: float):
+        """Background task: rebuild now and then every `interval` seconds"""
+        while True:
+            try:
+                await self.refresh(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Demand forecast refresh failed: {str(e)}")
+            await asyncio.sleep(interval)
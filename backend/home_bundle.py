@@ -0,0 +1,44 @@
+"""
+Pre-composed payload for the home page.
+
+The home page used to make one request per section (banners, menu,
+testimonials, gallery, statistics) plus two for the header/footer settings.
+Everything on it changes only when an admin edits content, so we build the
+whole page once, keep the encoded JSON and its brotli/gzip variants in
+memory (see compression.py), and serve the same bytes to every visitor until
+an admin edit calls invalidate().
+"""
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from compression import CompressedPayload
+from serialization import dumps
+
+
+class HomeBundle:
+    def __init__(self, build: Callable[[], Awaitable[dict]]):
+        self._build = build
+        self._payload: Optional[CompressedPayload] = None
+        self._lock = asyncio.Lock()
+        self.version = 0
+
+    async def get(self) -> CompressedPayload:
+        payload = self._payload
+        if payload is not None:
+            return payload
+
+        async with self._lock:
+            if self._payload is None:
+                version = self.version
+                # Brotli at quality 11 takes long enough to stall other requests on the loop
+                built = await asyncio.to_thread(CompressedPayload, dumps(await self._build()))
+                # Content changed mid-build; serve this one but rebuild next time
+                if version != self.version:
+                    return built
+                self._payload = built
+            return self._payload
+
+    def invalidate(self):
+        self._payload = None
+        self.version += 1
+
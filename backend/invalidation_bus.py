@@ -0,0 +1,259 @@
+"""
+Cache invalidation bus for multi-worker deployments.
+
+The menu index and home bundle live in process memory, so with several
+uvicorn/gunicorn workers an admin edit handled by one worker would leave the
+others serving stale prices. Instead of calling invalidate() directly,
+server.py publishes a topic ("menu", "settings", "banners", ...) on the bus.
+The bus runs the local handlers at once, so the worker that made the edit is
+never stale, and then broadcasts the topic to every other worker.
+
+Backends, chosen with CACHE_BUS:
+
+  local  - single process; nothing to broadcast (default)
+  unix   - single host; each worker binds a datagram socket in
+           CACHE_BUS_SOCKET_DIR and publishes to all the others
+  mongo  - any number of hosts; events go through a capped collection and
+           are received with a change stream, or by tailing the capped
+           collection where change streams aren't available (standalone mongod)
+
+A subscriber that loses its connection can't know what it missed, so after
+any receive error it invalidates every topic before resuming. The unix
+backend can't queue for a peer whose socket buffer is full, so it remembers
+that peer and sends it a resync, which invalidates every topic, as soon as
+the peer is draining again.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from metrics import cache_invalidations_total
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ("menu", "settings", "banners", "testimonials", "gallery", "kitchen", "delivery_zones", "opening_hours",
+          "availability")
+
+# How often the unix backend retries a resync for a peer whose socket was full
+RESYNC_RETRY_SECONDS = 0.5
+
+
+class InvalidationBus:
+    """In-process bus; also the base class for the broadcasting backends"""
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Tuple[Callable[[], None], bool]]] = defaultdict(list)
+
+    def subscribe(self, topic: str, handler: Callable[[], None], remote_only: bool = False):
+        """remote_only handlers skip this worker's own publishes, for state it has already updated itself"""
+        if topic not in TOPICS:
+            raise ValueError(f"Unknown invalidation topic: {topic}")
+        self._handlers[topic].append((handler, remote_only))
+
+    def _dispatch(self, topic: str, source: str):
+        cache_invalidations_total.labels(topic, source).inc()
+        for handler, remote_only in self._handlers.get(topic, ()):
+            if not (remote_only and source == "local"):
+                handler()
+
+    def _dispatch_all(self):
+        for topic in TOPICS:
+            self._dispatch(topic, "resync")
+
+    def _receive(self, message: dict):
+        if message.get("origin") == self.origin:
+            return
+        if message.get("resync"):
+            self._dispatch_all()
+        elif message.get("topic") in TOPICS:
+            self._dispatch(message["topic"], "remote")
+
+    async def publish(self, topic: str):
+        self._dispatch(topic, "local")
+        try:
+            await self._broadcast({"topic": topic, "origin": self.origin})
+        except Exception as e:
+            # The edit itself succeeded; other workers catch up on their next resync
+            logger.error(f"Failed to broadcast {topic} invalidation: {str(e)}")
+
+    async def _broadcast(self, message: dict):
+        pass
+
+    async def start(self, db):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class UnixSocketBus(InvalidationBus):
+    """One datagram socket per worker in a shared directory; publishing sends to every peer"""
+
+    def __init__(self, socket_dir: str):
+        super().__init__()
+        self.socket_dir = Path(socket_dir)
+        self.path = self.socket_dir / f"{os.getpid()}-{self.origin[:8]}.sock"
+        self._transport = None
+        self._sender: Optional[socket.socket] = None
+        # Peers that missed an invalidation and are owed a resync
+        self._behind: Set[Path] = set()
+        self._retry: Optional[asyncio.Task] = None
+
+    async def start(self, db):
+        self.socket_dir.mkdir(parents=True, exist_ok=True)
+        bus = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                try:
+                    bus._receive(json.loads(data))
+                except ValueError:
+                    logger.warning("Ignoring malformed invalidation datagram")
+
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            Protocol, local_addr=str(self.path), family=socket.AF_UNIX
+        )
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+
+    async def _broadcast(self, message: dict):
+        if self._sender is None:
+            return
+        payload = json.dumps(message).encode("utf-8")
+        for peer in self.socket_dir.glob("*.sock"):
+            if peer != self.path:
+                # A resync covers this topic too, so a peer that is behind only needs that
+                self._send(peer, self._resync_payload() if peer in self._behind else payload)
+
+    def _resync_payload(self) -> bytes:
+        return json.dumps({"resync": True, "origin": self.origin}).encode("utf-8")
+
+    def _send(self, peer: Path, payload: bytes):
+        try:
+            self._sender.sendto(payload, str(peer))
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Left behind by a worker that died without cleaning up
+            peer.unlink(missing_ok=True)
+            self._behind.discard(peer)
+        except BlockingIOError:
+            if peer not in self._behind:
+                logger.warning(f"Invalidation bus peer {peer.name} is not draining its socket; it will be resynced")
+            self._behind.add(peer)
+            if self._retry is None or self._retry.done():
+                self._retry = asyncio.create_task(self._resync_behind())
+        else:
+            self._behind.discard(peer)
+
+    async def _resync_behind(self):
+        while self._behind and self._sender is not None:
+            await asyncio.sleep(RESYNC_RETRY_SECONDS)
+            payload = self._resync_payload()
+            for peer in list(self._behind):
+                self._send(peer, payload)
+
+    async def stop(self):
+        if self._retry is not None:
+            self._retry.cancel()
+        if self._transport is not None:
+            self._transport.close()
+        if self._sender is not None:
+            self._sender.close()
+        self.path.unlink(missing_ok=True)
+
+
+class MongoBus(InvalidationBus):
+    """Events in a capped collection, received by change stream or tailable cursor"""
+
+    def __init__(self, collection_name: str = "cache_invalidations", size_bytes: int = 1024 * 1024):
+        super().__init__()
+        self.collection_name = collection_name
+        self.size_bytes = size_bytes
+        self._collection = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, db):
+        try:
+            await db.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass
+        self._collection = db[self.collection_name]
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _broadcast(self, message: dict):
+        if self._collection is not None:
+            await self._collection.insert_one(dict(message))
+
+    async def _listen(self):
+        use_change_stream = True
+        delay = 0.5
+        resync = False
+        while True:
+            try:
+                if resync:
+                    self._dispatch_all()
+                    resync = False
+                if use_change_stream:
+                    await self._watch_change_stream()
+                else:
+                    await self._tail()
+                delay = 0.5
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if use_change_stream and e.code in (40573, 303):
+                    # Change streams need a replica set; a capped collection can be tailed anywhere
+                    logger.info("Change streams unavailable; tailing the invalidation collection instead")
+                    use_change_stream = False
+                    continue
+                logger.error(f"Invalidation bus listener failed: {str(e)}")
+                resync = True
+            except Exception as e:
+                logger.error(f"Invalidation bus listener failed: {str(e)}")
+                resync = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10)
+
+    async def _watch_change_stream(self):
+        async with self._collection.watch([{"$match": {"operationType": "insert"}}]) as stream:
+            async for change in stream:
+                self._receive(change["fullDocument"])
+
+    async def _tail(self):
+        # Start after the newest event so a restarted worker doesn't replay history
+        newest = await self._collection.find_one({}, sort=[("$natural", -1)])
+        last_id = newest["_id"] if newest else None
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+            cursor = self._collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                async for doc in cursor:
+                    last_id = doc["_id"]
+                    self._receive(doc)
+            # Tailable cursors on an empty collection die immediately; wait for the first event
+            await asyncio.sleep(0.5)
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+
+
+def create_bus(kind: str, socket_dir: Optional[str] = None) -> InvalidationBus:
+    if kind == "local":
+        return InvalidationBus()
+    if kind == "unix":
+        return UnixSocketBus(socket_dir or "/tmp/lakeside-cache-bus")
+    if kind == "mongo":
+        return MongoBus()
+    raise ValueError(f"Unknown CACHE_BUS '{kind}'. Choose from: local, unix, mongo")
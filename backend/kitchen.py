@@ -0,0 +1,252 @@
+"""
+Kitchen display queue: orders split into per-station tickets.
+
+The kitchen used to work from the admin orders page, reloading every order
+to spot new ones. Instead each order placed is split by menu category into
+one ticket per station (tandoor, curry, fryer, bar):
+
+  {"id": ..., "order_id": "ORD-1A2B3C4D", "station": "tandoor",
+   "items": [{"menu_item_id": ..., "name": "Garlic Naan", "quantity": 2}],
+   "customer_name": ..., "status": "open", "priority": 0,
+   "created_at": ..., "closed_at": None}
+
+Tickets live in kitchen_tickets; each worker also keeps the open ones per
+station in a list sorted by (-priority, created_at), so screens never query
+Mongo. Bumping a ticket closes it, recalling brings the last bumped ticket
+back at the front of the queue, and cancelling the order voids its tickets.
+Closed tickets expire after KITCHEN_TICKET_RETENTION_DAYS.
+
+Every station screen holds a server-sent event stream: a "snapshot" of its
+open tickets on connect, then "ticket", "bumped", "recalled" and "voided"
+events as they happen. Other workers hear about changes over the cache bus
+and reload open tickets from Mongo, sending their screens a fresh snapshot.
+
+Categories map to stations through DEFAULT_ROUTES, overridden by
+KITCHEN_STATION_ROUTES (JSON, e.g. {"Kids Menu": "fryer"}); anything
+unmapped goes to KITCHEN_DEFAULT_STATION.
+"""
+import asyncio
+import logging
+import uuid
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from event_stream import EventHub
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "kitchen_tickets"
+STATIONS = ("tandoor", "curry", "fryer", "bar")
+DEFAULT_ROUTES = {
+    "Bread": "tandoor",
+    "Breads": "tandoor",
+    "Tandoori Starter": "tandoor",
+    "Beef": "curry",
+    "Biryani": "curry",
+    "Chicken": "curry",
+    "Indo Chinese": "curry",
+    "Lamb": "curry",
+    "Main Course": "curry",
+    "Rice": "curry",
+    "Sea Food": "curry",
+    "Seafood": "curry",
+    "Side Dishes": "curry",
+    "Vegetarian Curries": "curry",
+    "Fried Entree": "fryer",
+    "Kids Menu": "fryer",
+    "Starters": "fryer",
+    "Desserts": "bar",
+    "Drinks": "bar",
+}
+# Recalled tickets jump ahead of everything placed normally
+RECALL_PRIORITY = 1
+
+
+def _timestamp(moment: datetime) -> float:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _sort_key(ticket: dict) -> Tuple[int, float, str]:
+    return -ticket["priority"], _timestamp(ticket["created_at"]), ticket["id"]
+
+
+class KitchenQueue:
+    """Open tickets per station, mirrored from kitchen_tickets, plus the stations' event streams"""
+
+    def __init__(self, routes: Optional[Dict[str, str]] = None, default_station: str = "curry",
+                 heartbeat: float = 15.0):
+        routes = {**DEFAULT_ROUTES, **(routes or {})}
+        for station in [*routes.values(), default_station]:
+            if station not in STATIONS:
+                raise ValueError(f"Unknown kitchen station: {station}")
+        self.routes = routes
+        self.default_station = default_station
+        self.events = EventHub(heartbeat)
+        self.loaded = False
+        self._tickets: Dict[str, dict] = {}
+        self._open: Dict[str, List[Tuple[int, float, str]]] = {station: [] for station in STATIONS}
+        # Held across each Mongo write and its in-memory update so a concurrent load() can't drop it
+        self._lock = asyncio.Lock()
+        self._reload_task: Optional[asyncio.Task] = None
+        self._reload_again = False
+
+    def station_for(self, category: Optional[str]) -> str:
+        return self.routes.get(category, self.default_station)
+
+    async def ensure_indexes(self, db):
+        await db[COLLECTION].create_index("id")
+        await db[COLLECTION].create_index("order_id")
+        await db[COLLECTION].create_index([("station", 1), ("status", 1), ("closed_at", -1)])
+
+    # ============= IN-MEMORY QUEUE =============
+
+    def _add(self, ticket: dict):
+        self._tickets[ticket["id"]] = ticket
+        insort(self._open[ticket["station"]], _sort_key(ticket))
+
+    def _remove(self, ticket_id: str) -> Optional[dict]:
+        ticket = self._tickets.pop(ticket_id, None)
+        if ticket is not None:
+            keys = self._open[ticket["station"]]
+            del keys[bisect_left(keys, _sort_key(ticket))]
+        return ticket
+
+    def open_tickets(self, station: str) -> List[dict]:
+        return [self._tickets[ticket_id] for _, _, ticket_id in self._open[station]]
+
+    async def load(self, db):
+        """Replace the in-memory queue with the open tickets in Mongo; screens get a fresh snapshot"""
+        async with self._lock:
+            docs = await db[COLLECTION].find({"status": "open"}, {"_id": 0}).to_list(None)
+            before = {station: list(keys) for station, keys in self._open.items()}
+            self._tickets = {}
+            self._open = {station: [] for station in STATIONS}
+            for doc in docs:
+                self._add(doc)
+            self.loaded = True
+            for station in STATIONS:
+                if self._open[station] != before[station]:
+                    self.events.broadcast(station, "snapshot", self._snapshot(station))
+
+    async def ensure_loaded(self, db):
+        if not self.loaded:
+            await self.load(db)
+
+    def schedule_reload(self, db):
+        """Cache-bus handler: another worker changed tickets, reload them (coalescing bursts)"""
+        if self._reload_task is not None and not self._reload_task.done():
+            self._reload_again = True
+            return
+        self._reload_task = asyncio.create_task(self._reload(db))
+
+    async def _reload(self, db):
+        while True:
+            self._reload_again = False
+            try:
+                await self.load(db)
+            except Exception as e:
+                logger.error(f"Kitchen ticket reload failed: {str(e)}")
+            if not self._reload_again:
+                return
+
+    # ============= TICKET OPERATIONS =============
+
+    async def add_order(self, db, order: dict, menu: Dict[str, dict]) -> List[dict]:
+        """Split a new order into one ticket per station; errors are logged, the order still stands"""
+        by_station: Dict[str, List[dict]] = {}
+        for line in order.get("items", []):
+            item = menu.get(line["menu_item_id"], {})
+            by_station.setdefault(self.station_for(item.get("category")), []).append({
+                "menu_item_id": line["menu_item_id"],
+                "name": item.get("name", line["menu_item_id"]),
+                "quantity": line["quantity"],
+            })
+        tickets = [
+            {
+                "id": str(uuid.uuid4()),
+                "order_id": order["order_id"],
+                "station": station,
+                "items": items,
+                "customer_name": order.get("customer_name"),
+                "status": "open",
+                "priority": 0,
+                "created_at": order["created_at"],
+                "closed_at": None,
+            }
+            for station, items in by_station.items()
+        ]
+        if not tickets:
+            return []
+        async with self._lock:
+            try:
+                # insert_many adds _id to what it is given, so hand it copies
+                await db[COLLECTION].insert_many([dict(ticket) for ticket in tickets])
+            except Exception as e:
+                logger.error(f"Failed to create kitchen tickets for order {order.get('order_id')}: {str(e)}")
+                return []
+            for ticket in tickets:
+                self._add(ticket)
+                self.events.broadcast(ticket["station"], "ticket", ticket)
+        return tickets
+
+    async def bump(self, db, ticket_id: str) -> Optional[dict]:
+        """Close an open ticket; None if there is no such open ticket"""
+        async with self._lock:
+            ticket = await db[COLLECTION].find_one_and_update(
+                {"id": ticket_id, "status": "open"},
+                {"$set": {"status": "bumped", "closed_at": datetime.now(timezone.utc)}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if ticket is not None:
+                ticket.pop("_id", None)
+                self._remove(ticket_id)
+                self.events.broadcast(ticket["station"], "bumped", {"id": ticket_id, "closed_at": ticket["closed_at"]})
+        return ticket
+
+    async def recall(self, db, station: str, ticket_id: Optional[str] = None) -> Optional[dict]:
+        """Reopen a bumped ticket (the station's most recently bumped by default) at the front of the queue"""
+        query = {"station": station, "status": "bumped"}
+        if ticket_id is not None:
+            query["id"] = ticket_id
+        async with self._lock:
+            ticket = await db[COLLECTION].find_one_and_update(
+                query,
+                {"$set": {"status": "open", "priority": RECALL_PRIORITY, "closed_at": None}},
+                sort=[("closed_at", -1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if ticket is not None:
+                ticket.pop("_id", None)
+                self._remove(ticket["id"])
+                self._add(ticket)
+                self.events.broadcast(station, "recalled", ticket)
+        return ticket
+
+    async def void_order(self, db, order_id: str) -> int:
+        """Close every open ticket of a cancelled order; returns how many there were"""
+        async with self._lock:
+            result = await db[COLLECTION].update_many(
+                {"order_id": order_id, "status": "open"},
+                {"$set": {"status": "voided", "closed_at": datetime.now(timezone.utc)}},
+            )
+            for ticket in [ticket for ticket in self._tickets.values() if ticket["order_id"] == order_id]:
+                self._remove(ticket["id"])
+                self.events.broadcast(ticket["station"], "voided", {"id": ticket["id"], "order_id": order_id})
+        return result.modified_count
+
+    # ============= EVENT STREAMS =============
+
+    def _snapshot(self, station: str) -> dict:
+        return {"station": station, "tickets": self.open_tickets(station)}
+
+    def stream(self, station: str) -> AsyncIterator[bytes]:
+        """SSE body for one station screen: a snapshot of its open tickets, then its events"""
+        return self.events.stream(station, lambda: self._snapshot(station))
+
+    def close_streams(self):
+        self.events.close()
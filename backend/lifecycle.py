@@ -0,0 +1,158 @@
+"""
+Process lifecycle helpers: Mongo pool configuration, readiness state and
+graceful draining.
+
+server.py's lifespan pings Mongo and warms the in-memory caches before
+marking the process ready.
+
+Draining has to start from the shutdown signal. By the time uvicorn runs
+the lifespan shutdown it has already waited for every connection to end,
+and open event streams would hold that up forever. drain_on_signal(),
+called from the lifespan startup, adds to whatever SIGTERM/SIGINT handler
+the server installed rather than replacing it: readiness flips to
+"draining", the on_drain() hooks end long-lived streams and requests on
+kept-alive connections get a 503, while the server's own handler stops
+accepting and waits for in-flight requests as usual.
+"""
+import asyncio
+import logging
+import os
+import signal
+import threading
+from typing import Callable, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# env var -> (Motor/PyMongo option, default). Defaults follow PyMongo except where
+# noted; unset values keep the default so an empty .env behaves as before.
+MONGO_POOL_SETTINGS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", 100),
+    # Keep a few sockets open so a quiet period doesn't make the next request pay for a handshake
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", 5),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", None),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", 10_000),
+    # Fail fast (PyMongo waits 30s) so readiness reports an unreachable primary promptly
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", 5_000),
+    "MONGO_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", None),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", None),
+}
+
+
+def mongo_client_options(environ: Mapping[str, str] = os.environ) -> dict:
+    options = {}
+    for env_name, (option, default) in MONGO_POOL_SETTINGS.items():
+        raw = environ.get(env_name)
+        value = int(raw) if raw else default
+        if value is not None:
+            options[option] = value
+    return options
+
+
+class Lifecycle:
+    """Readiness flag plus an in-flight request count used to drain on shutdown"""
+
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._drain_hooks: List[Callable[[], None]] = []
+
+    def on_drain(self, hook: Callable[[], None]):
+        """Run `hook` once when draining starts, e.g. to end event streams that would never finish"""
+        self._drain_hooks.append(hook)
+
+    def request_started(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def request_finished(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    def begin_drain(self):
+        """Stop reporting ready, turn new requests away and run the on_drain hooks (once)"""
+        self.ready = False
+        if self.draining:
+            return
+        self.draining = True
+        for hook in self._drain_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Drain hook failed: {str(e)}")
+
+    async def drain(self, timeout: float) -> bool:
+        """begin_drain() and wait for in-flight requests; False if the timeout hit first"""
+        self.begin_drain()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class DrainMiddleware:
+    """Counts in-flight HTTP requests and turns new ones away once draining has begun.
+
+    Health probes under `exempt_prefix` are always let through so the load
+    balancer can see the instance is going away.
+    """
+
+    def __init__(self, app, lifecycle: Lifecycle, exempt_prefix: Optional[str] = None):
+        self.app = app
+        self.lifecycle = lifecycle
+        self.exempt_prefix = exempt_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.lifecycle.draining and not (self.exempt_prefix and scope["path"].startswith(self.exempt_prefix)):
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"content-type", b"application/json"), (b"retry-after", b"1"),
+                            (b"connection", b"close")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server is shutting down"}'})
+            return
+
+        self.lifecycle.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.lifecycle.request_finished()
+
+
+def drain_on_signal(lifecycle: Lifecycle) -> Callable[[], None]:
+    """Begin draining `lifecycle` on SIGTERM/SIGINT, then run the handler that was already installed.
+
+    Call from the running loop. Signals the server doesn't handle itself are
+    left alone, as is everything outside the main thread (e.g. TestClient).
+    Returns a function that puts the previous handlers back.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return lambda: None
+
+    loop = asyncio.get_running_loop()
+    previous = {}
+
+    def handle(sig, frame):
+        # Hooks touch the loop's queues, so run them on the loop rather than mid-bytecode
+        loop.call_soon_threadsafe(lifecycle.begin_drain)
+        previous[sig](sig, frame)
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        # asyncio's own add_signal_handler() still fires: it's woken through the wakeup fd
+        if callable(signal.getsignal(sig)):
+            previous[sig] = signal.signal(sig, handle)
+
+    def restore():
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+
+    return restore
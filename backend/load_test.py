@@ -0,0 +1,372 @@
+"""
+Load-test benchmark harness for the Lakeside API.
+
+Starts the FastAPI app in process (no network hop) against either a local
+mongod or a mongomock-motor stand-in, seeds a synthetic data set and replays
+a weighted mix of realistic traffic:
+
+  browse  - home bundle, menu listing, categories, item detail, banners, settings
+  cart    - cart read, add, add, set quantity, remove, read
+  order   - order placement bursts
+  admin   - admin polling of orders, contacts and reservations
+
+Per-endpoint p50/p95/p99 latency and throughput are printed and can be saved
+as a baseline; later runs are compared against it and the script exits
+non-zero when an endpoint regresses beyond the tolerance.
+
+Usage:
+  python load_test.py --backend mongomock --duration 20
+  python load_test.py --backend mongod --mongo-url mongodb://localhost:27017
+  python load_test.py --save-baseline
+  python load_test.py --baseline load_test_baseline.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+DEFAULT_BASELINE = ROOT_DIR / "load_test_baseline.json"
+DEFAULT_MIX = "browse=60,cart=25,order=5,admin=10"
+CATEGORIES = ["Starters", "Tandoori", "Curries", "Biryani", "Breads", "Desserts", "Drinks"]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+# ============= DATA SEEDING =============
+
+def build_menu_items(count, rng):
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Dish {i}",
+            "description": "Slow-cooked with whole spices, finished with cream and fresh coriander. " * 2,
+            "price": round(rng.uniform(4, 30), 2),
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "menu_type": "dine-in" if i % 2 else "takeaway",
+            "image": f"/api/uploads/dish-{i}.jpg",
+            "featured": i % 10 == 0,
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+async def seed(db, args, rng):
+    for name in ("menu_items", "carts", "wishlists", "orders", "contact_forms", "reservations", "banners"):
+        await db[name].delete_many({})
+
+    menu_items = build_menu_items(args.menu_items, rng)
+    await db.menu_items.insert_many([dict(item) for item in menu_items])
+
+    now = datetime.now(timezone.utc)
+    await db.banners.insert_many([
+        {"id": str(uuid.uuid4()), "image": f"/api/uploads/banner-{i}.jpg", "title": f"Banner {i}",
+         "description": "Authentic flavours", "button_text": "Order", "button_link": "/menu",
+         "order": i, "active": True, "created_at": now}
+        for i in range(5)
+    ])
+    await db.contact_forms.insert_many([
+        {"id": str(uuid.uuid4()), "name": f"Guest {i}", "email": f"guest{i}@example.com",
+         "phone": "0400 000 000", "message": "Do you cater for events?",
+         "created_at": now - timedelta(hours=i)}
+        for i in range(args.history)
+    ])
+    await db.reservations.insert_many([
+        {"id": str(uuid.uuid4()), "name": f"Guest {i}", "email": f"guest{i}@example.com",
+         "phone": "0400 000 000", "date": "2025-12-24", "time": "19:00", "guests": 2 + i % 6,
+         "special_requests": None, "created_at": now - timedelta(hours=i)}
+        for i in range(args.history)
+    ])
+    await db.orders.insert_many([
+        {"id": str(uuid.uuid4()), "order_id": f"ORD-{i:08d}", "customer_name": f"Guest {i}",
+         "customer_email": f"guest{i}@example.com", "customer_phone": "0400 000 000",
+         "delivery_address": "1 Lake St", "payment_method": "Cash on Delivery", "status": "Delivered",
+         "items": [{"menu_item_id": rng.choice(menu_items)["id"], "quantity": rng.randint(1, 3)}],
+         "subtotal": 30.0, "tax": 2.4, "delivery_fee": 5.0, "total": 37.4,
+         "created_at": now - timedelta(hours=i)}
+        for i in range(args.history)
+    ])
+    return menu_items
+
+
+# ============= TRAFFIC SCENARIOS =============
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, http, label, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await http.request(method, url, **kwargs)
+            failed = response.status_code >= 400
+        except Exception:
+            failed = True
+        self.latencies[label].append(time.perf_counter() - start)
+        if failed:
+            self.errors[label] += 1
+
+
+async def browse(ctx):
+    rec, http, rng = ctx["recorder"], ctx["http"], ctx["rng"]
+    menu_type = rng.choice(["dine-in", "takeaway"])
+    await rec.call(http, "GET /api/home", "GET", "/api/home", headers={"Accept-Encoding": "gzip"})
+    await rec.call(http, "GET /api/settings", "GET", "/api/settings")
+    await rec.call(http, "GET /api/banners", "GET", "/api/banners")
+    await rec.call(http, "GET /api/menu", "GET", "/api/menu", params={"menu_type": menu_type})
+    await rec.call(http, "GET /api/categories", "GET", "/api/categories", params={"menu_type": menu_type})
+    item = rng.choice(ctx["menu_items"])
+    await rec.call(http, "GET /api/menu/{item_id}", "GET", f"/api/menu/{item['id']}")
+
+
+async def cart(ctx):
+    rec, http, rng = ctx["recorder"], ctx["http"], ctx["rng"]
+    user_id = f"bench-user-{rng.randrange(ctx['users'])}"
+    first, second = rng.sample(ctx["menu_items"], 2)
+    await rec.call(http, "GET /api/cart/{user_id}", "GET", f"/api/cart/{user_id}")
+    await rec.call(http, "POST /api/cart/{user_id}/add", "POST", f"/api/cart/{user_id}/add",
+                   json={"menu_item_id": first["id"], "quantity": 1})
+    await rec.call(http, "POST /api/cart/{user_id}/add", "POST", f"/api/cart/{user_id}/add",
+                   json={"menu_item_id": second["id"], "quantity": 2})
+    await rec.call(http, "PUT /api/cart/{user_id}/items/{menu_item_id}", "PUT",
+                   f"/api/cart/{user_id}/items/{second['id']}", json={"quantity": rng.randint(1, 4)})
+    await rec.call(http, "DELETE /api/cart/{user_id}/remove/{menu_item_id}", "DELETE",
+                   f"/api/cart/{user_id}/remove/{first['id']}")
+    await rec.call(http, "GET /api/cart/{user_id}", "GET", f"/api/cart/{user_id}")
+
+
+async def order(ctx):
+    rec, http, rng = ctx["recorder"], ctx["http"], ctx["rng"]
+    lines = rng.sample(ctx["menu_items"], rng.randint(1, 4))
+    subtotal = sum(item["price"] for item in lines)
+    tax = round(subtotal * 0.08, 2)
+    payload = {
+        "customer_name": "Load Test",
+        "customer_email": f"loadtest+{rng.randrange(ctx['users'])}@example.com",
+        "customer_phone": "0400 000 000",
+        "delivery_address": "1 Lake St",
+        "items": [{"menu_item_id": item["id"], "quantity": 1} for item in lines],
+        "subtotal": subtotal,
+        "tax": tax,
+        "delivery_fee": 5.0,
+        "total": subtotal + tax + 5.0,
+        "payment_method": "Cash on Delivery",
+    }
+    # Orders come from many customers, so spread them over client IPs as a proxy would report them
+    client_ip = f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+    await rec.call(http, "POST /api/orders", "POST", "/api/orders", json=payload,
+                   headers={"X-Forwarded-For": client_ip})
+
+
+async def admin(ctx):
+    rec, http = ctx["recorder"], ctx["http"]
+    headers = ctx["admin_headers"]
+    await rec.call(http, "GET /api/orders", "GET", "/api/orders", headers=headers)
+    await rec.call(http, "GET /api/admin/contacts", "GET", "/api/admin/contacts", headers=headers)
+    await rec.call(http, "GET /api/admin/reservations", "GET", "/api/admin/reservations", headers=headers)
+
+
+SCENARIOS = {"browse": browse, "cart": cart, "order": order, "admin": admin}
+
+
+# ============= RUNNER =============
+
+async def virtual_user(ctx, weights, deadline):
+    names = list(weights)
+    values = [weights[name] for name in names]
+    while time.perf_counter() < deadline:
+        scenario = ctx["rng"].choices(names, values)[0]
+        await SCENARIOS[scenario](ctx)
+
+
+def summarize(recorder, elapsed):
+    results = {}
+    for label, samples in sorted(recorder.latencies.items()):
+        ordered = sorted(samples)
+        results[label] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(label, 0),
+            "throughput_rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        }
+    return results
+
+
+def print_report(results, elapsed):
+    header = f"{'endpoint':<52}{'reqs':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for label, row in results.items():
+        print(f"{label:<52}{row['requests']:>8}{row['errors']:>6}{row['throughput_rps']:>10.1f}"
+              f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}")
+    total = sum(row["requests"] for row in results.values())
+    print("-" * len(header))
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against the stored baseline"""
+    regressions = []
+    for label, base in baseline.get("endpoints", {}).items():
+        current = results.get(label)
+        if current is None:
+            continue
+        # p99 is too noisy on short runs to gate on; it is reported only
+        if base["p95_ms"] > 0 and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {base['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+        if base["throughput_rps"] > 0 and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{label}: throughput {base['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s"
+            )
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{label}: errors {base.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def load_app(args):
+    """Import server.py with its database pointed at the benchmark target"""
+    os.environ.setdefault("MONGO_URL", args.mongo_url)
+    os.environ.setdefault("DB_NAME", args.db_name)
+    sys.path.insert(0, str(ROOT_DIR))
+    import server
+    from rate_limit import BucketPolicy
+
+    if args.backend == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+        server.db = AsyncMongoMockClient()[args.db_name]
+    else:
+        server.db = server.client[args.db_name]
+
+    # Never deliver real email from a load test
+    server.email_service.smtp_user = ""
+    server.email_service.smtp_password = ""
+    # A few hundred synthetic customers place orders far faster than real ones would;
+    # keep the per-IP limit realistic but take the per-email limit out of the measurement
+    server.write_guard.trust_forwarded = True
+    server.write_guard.email_policy = BucketPolicy(rate=1e6, burst=1e6)
+    # httpx logs every request at INFO, which would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return server
+
+
+async def run(args):
+    import httpx
+    from auth import create_access_token
+
+    server = load_app(args)
+    rng = random.Random(args.seed)
+    menu_items = await seed(server.db, args, rng)
+
+    weights = parse_mix(args.mix)
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=server.app)
+    # ASGITransport doesn't send lifespan events, so run startup (ping, indexes, cache warmup) ourselves
+    async with server.app.router.lifespan_context(server.app):
+        while not server.lifecycle.ready:
+            await asyncio.sleep(0.05)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as http:
+            ctx_base = {
+                "http": http,
+                "recorder": recorder,
+                "menu_items": menu_items,
+                "users": args.users,
+                "admin_headers": {"Authorization": f"Bearer {create_access_token(data={'sub': 'admin'})}"},
+            }
+            # Email and SMTP-skip messages would drown the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                deadline = start + args.duration
+                await asyncio.gather(*[
+                    virtual_user({**ctx_base, "rng": random.Random(args.seed + worker)}, weights, deadline)
+                    for worker in range(args.concurrency)
+                ])
+                elapsed = time.perf_counter() - start
+
+        if args.backend == "mongod":
+            await server.client.drop_database(args.db_name)
+    return summarize(recorder, elapsed), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Lakeside API")
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="lakeside_load_test",
+                        help="Scratch database; it is wiped before and dropped after a mongod run")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of traffic to replay")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent virtual users")
+    parser.add_argument("--users", type=int, default=200, help="Distinct cart owners to spread churn over")
+    parser.add_argument("--menu-items", type=int, default=150)
+    parser.add_argument("--history", type=int, default=500, help="Seeded orders, contacts and reservations")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=None, help="Compare against this baseline file")
+    parser.add_argument("--save-baseline", nargs="?", type=Path, const=DEFAULT_BASELINE, default=None,
+                        help=f"Store this run as the baseline (default: {DEFAULT_BASELINE.name})")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed fractional slowdown before a regression is reported")
+    parser.add_argument("--json", type=Path, default=None, help="Also write raw results to this file")
+    args = parser.parse_args()
+
+    results, elapsed = asyncio.run(run(args))
+    print_report(results, elapsed)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {key: getattr(args, key) for key in
+                   ("backend", "duration", "concurrency", "users", "menu_items", "history", "mix", "seed")},
+        "endpoints": results,
+    }
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(report, indent=2))
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    baseline_path = args.baseline or (DEFAULT_BASELINE if DEFAULT_BASELINE.exists() and not args.save_baseline else None)
+    if baseline_path:
+        baseline = json.loads(Path(baseline_path).read_text())
+        if baseline.get("config") != report["config"]:
+            print("\n⚠️  Baseline was recorded with a different configuration; comparison may be misleading")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {baseline_path}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {baseline_path} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
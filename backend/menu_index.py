@@ -0,0 +1,42 @@
+"""
+In-memory index of menu items keyed by id.
+
+Cart and order pricing only ever needs a handful of items by id, so rather
+than querying Mongo (or shipping the whole menu to the browser) on every
+request we keep one dict of the full menu per process. Admin menu edits call
+invalidate(); the next reader reloads it.
+"""
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+
+class MenuIndex:
+    def __init__(self):
+        self._items: Optional[Dict[str, dict]] = None
+        self._lock = asyncio.Lock()
+        # Bumped on every invalidation so derived caches can tell they are stale
+        self.version = 0
+
+    async def items(self, db) -> Dict[str, dict]:
+        items = self._items
+        if items is not None:
+            return items
+
+        async with self._lock:
+            if self._items is None:
+                version = self.version
+                docs = await db.menu_items.find({}, {"_id": 0}).to_list(length=None)
+                loaded = {doc["id"]: doc for doc in docs}
+                # An admin edit landed while we were loading; serve it but don't keep it
+                if version != self.version:
+                    return loaded
+                self._items = loaded
+            return self._items
+
+    async def get_many(self, db, item_ids: Iterable[str]) -> List[dict]:
+        items = await self.items(db)
+        return [items[item_id] for item_id in item_ids if item_id in items]
+
+    def invalidate(self):
+        self._items = None
+        self.version += 1
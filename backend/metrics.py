@@ -0,0 +1,376 @@
+"""Prometheus instrumentation for the Lakeside API.
+
+Metrics are held in process and rendered in the Prometheus text exposition
+format by ``render_latest()``, which ``server.py`` serves at ``/metrics``.
+Recording a sample is a dict lookup, a bisect and a locked add, so the
+middleware is cheap enough to leave enabled in production.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+
+    def register(self, metric: "_Metric"):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        registry.register(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _snapshot(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _ValueChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self, lock: threading.Lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _ValueChild(self._lock)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in self._snapshot()
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+
+class Ewma:
+    """Exponentially weighted moving average, used as a cheap live latency signal.
+
+    With `half_life` (seconds) the average also decays towards zero while no
+    samples arrive, so one slow spike doesn't keep reading high once traffic
+    goes quiet.
+    """
+
+    def __init__(self, alpha: float = 0.1, half_life: Optional[float] = None):
+        self.alpha = alpha
+        self.half_life = half_life
+        self._value = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _decayed(self, now: float) -> float:
+        if self.half_life is None:
+            return self._value
+        return self._value * 0.5 ** ((now - self._updated) / self.half_life)
+
+    @property
+    def value(self) -> float:
+        return self._decayed(time.monotonic())
+
+    def observe(self, sample: float):
+        with self._lock:
+            now = time.monotonic()
+            value = self._decayed(now)
+            self._value = value + self.alpha * (sample - value)
+            self._updated = now
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_buckets", "counts", "sum")
+
+    def __init__(self, lock: threading.Lock, buckets: Tuple[float, ...]):
+        self._lock = lock
+        self._buckets = buckets
+        # One slot per finite bucket plus the +Inf overflow slot
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Registry = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self._lock, self.buckets)
+
+    def samples(self) -> List[str]:
+        lines = []
+        bucket_labels = self.labelnames + ("le",)
+        for values, child in self._snapshot():
+            with self._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                label_str = _format_labels(bucket_labels, values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+# ============= METRIC DEFINITIONS =============
+
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests by route, method and status code.",
+    ("method", "route", "status"),
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.",
+    ("method", "route"),
+)
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served.",
+    ("method",),
+)
+http_request_size_bytes = Histogram(
+    "http_request_size_bytes", "HTTP request body size by route.",
+    ("method", "route"), buckets=SIZE_BUCKETS,
+)
+http_response_size_bytes = Histogram(
+    "http_response_size_bytes", "HTTP response body size by route.",
+    ("method", "route"), buckets=SIZE_BUCKETS,
+)
+http_response_compression_ratio = Histogram(
+    "http_response_compression_ratio", "Compressed / original body size, precomputed or per request.",
+    ("encoding", "mode"), buckets=(0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.7, 0.9, 1.0),
+)
+mongo_command_duration_seconds = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by command and collection.",
+    ("command", "collection"),
+)
+mongo_command_failures_total = Counter(
+    "mongo_command_failures_total", "MongoDB commands that returned an error.",
+    ("command", "collection"),
+)
+smtp_send_duration_seconds = Histogram(
+    "smtp_send_duration_seconds", "Time spent delivering a message over SMTP.",
+    ("outcome",),
+)
+smtp_sends_in_progress = Gauge(
+    "smtp_sends_in_progress", "SMTP sessions currently open.",
+)
+smtp_emails_total = Counter(
+    "smtp_emails_total", "Outgoing emails by outcome (sent, failed, skipped).",
+    ("outcome",),
+)
+cache_invalidations_total = Counter(
+    "cache_invalidations_total", "In-memory cache invalidations by topic and source (local, remote, resync).",
+    ("topic", "source"),
+)
+http_requests_shed_total = Counter(
+    "http_requests_shed_total", "Public write requests rejected by rate limiting or load shedding.",
+    ("route", "reason"),
+)
+cart_compaction_documents_total = Counter(
+    "cart_compaction_documents_total", "Carts and wishlists expired or pruned by the compaction job.",
+    ("collection", "action"),
+)
+cart_compaction_reclaimed_bytes_total = Counter(
+    "cart_compaction_reclaimed_bytes_total", "Document bytes freed by the compaction job.",
+    ("collection",),
+)
+
+
+# Recent round-trip time in seconds of the Mongo writes the public forms make, read by the load
+# shedder (see MongoCommandListener). Decays while idle so a past spike doesn't keep shedding.
+mongo_latency_ewma = Ewma(half_life=5.0)
+LATENCY_SIGNAL_COMMANDS = frozenset({"insert", "update", "delete", "findAndModify"})
+
+
+def render_latest() -> str:
+    return REGISTRY.render()
+
+
+# ============= HTTP MIDDLEWARE =============
+
+def _route_label(scope) -> str:
+    """Use the route template rather than the raw path to keep label cardinality bounded."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # Mounted sub-applications (e.g. /uploads static files)
+        return scope.get("root_path") or "/"
+    return "<unmatched>"
+
+
+def _content_length(scope) -> int:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+    return 0
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware recording latency, status, in-flight and payload metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = http_requests_in_progress.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            route = _route_label(scope)
+            http_requests_total.labels(method, route, str(status_code)).inc()
+            http_request_duration_seconds.labels(method, route).observe(elapsed)
+            http_request_size_bytes.labels(method, route).observe(_content_length(scope))
+            http_response_size_bytes.labels(method, route).observe(response_bytes)
+
+
+# ============= MONGO COMMAND MONITORING =============
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command Motor sends; pass via ``event_listeners`` on the client.
+
+    PyMongo invokes listeners from Motor's worker threads, so the pending map
+    is only touched with single (GIL-atomic) dict operations.
+
+    Only writes to `latency_collections` feed mongo_latency_ewma, so admin
+    report scans, rollup backfills, cart compaction and index builds can't
+    make the load shedder turn customers away.
+    """
+
+    def __init__(self, latency_collections: Sequence[str] = ()):
+        self._pending: Dict[Tuple[object, int], str] = {}
+        self.latency_collections = frozenset(latency_collections)
+
+    def started(self, event):
+        if event.command_name == "getMore":
+            collection = event.command.get("collection", "")
+        else:
+            collection = event.command.get(event.command_name, "")
+        if not isinstance(collection, str):
+            collection = ""
+        self._pending[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        collection = self._record(event)
+        mongo_command_failures_total.labels(event.command_name, collection).inc()
+
+    def _record(self, event) -> str:
+        collection = self._pending.pop((event.connection_id, event.request_id), "")
+        duration = event.duration_micros / 1_000_000
+        mongo_command_duration_seconds.labels(event.command_name, collection).observe(duration)
+        if event.command_name in LATENCY_SIGNAL_COMMANDS and collection in self.latency_collections:
+            mongo_latency_ewma.observe(duration)
+        return collection
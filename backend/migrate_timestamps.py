@@ -0,0 +1,147 @@
+"""
+One-time migration: convert ISO-string timestamps to native BSON dates.
+
+Older versions of server.py stored created_at/updated_at as ISO strings,
+which sort lexically and cannot use range queries. This script rewrites
+them in batches and is safe to interrupt: progress is checkpointed in the
+`migrations` collection and only documents still holding a string are
+touched, so re-running simply picks up where the last run stopped.
+
+It also merges carts and wishlists that share a user_id (see
+cart_compaction.merge_duplicates), so the unique user_id indexes server.py
+creates can be built.
+
+Usage:
+  python migrate_timestamps.py                 # migrate everything
+  python migrate_timestamps.py --dry-run       # count what would change
+  python migrate_timestamps.py --batch-size 200 --pause 0.05
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+MIGRATION_ID = "timestamps_to_bson_dates"
+
+# collection -> timestamp fields written by server.py
+TIMESTAMP_FIELDS = {
+    "admin_users": ["created_at"],
+    "menu_items": ["created_at"],
+    "carts": ["updated_at"],
+    "wishlists": ["updated_at"],
+    "contact_forms": ["created_at"],
+    "reservations": ["created_at"],
+    "banners": ["created_at"],
+    "orders": ["created_at"],
+}
+
+
+def parse_timestamp(value: str):
+    """Parse an ISO string as written by datetime.isoformat(); naive values are UTC"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+async def migrate_field(db, collection_name: str, field: str, batch_size: int, pause: float, dry_run: bool):
+    collection = db[collection_name]
+    # Dots would nest under $set, so use a flat key
+    checkpoint_key = f"{collection_name}:{field}"
+    checkpoint = await db.migrations.find_one({"id": MIGRATION_ID}, {"_id": 0, "checkpoints": 1}) or {}
+    last_id = checkpoint.get("checkpoints", {}).get(checkpoint_key)
+
+    query = {field: {"$type": "string"}}
+    if dry_run:
+        remaining = await collection.count_documents(query)
+        print(f"  {collection_name}.{field}: {remaining} string timestamps to convert")
+        return remaining
+
+    converted = 0
+    skipped = 0
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        docs = await collection.find(batch_query, {"_id": 1, field: 1}).sort("_id", 1).to_list(batch_size)
+        if not docs:
+            break
+
+        operations = []
+        for doc in docs:
+            parsed = parse_timestamp(doc[field])
+            if parsed is None:
+                skipped += 1
+                continue
+            # Match on the old value so a concurrent write from the API always wins
+            operations.append(UpdateOne({"_id": doc["_id"], field: doc[field]}, {"$set": {field: parsed}}))
+
+        if operations:
+            result = await collection.bulk_write(operations, ordered=False)
+            converted += result.modified_count
+
+        last_id = docs[-1]["_id"]
+        await db.migrations.update_one(
+            {"id": MIGRATION_ID},
+            {"$set": {f"checkpoints.{checkpoint_key}": last_id, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        if pause:
+            # Give the primary room to serve live traffic between batches
+            await asyncio.sleep(pause)
+
+    print(f"  {collection_name}.{field}: converted {converted}, unparseable {skipped}")
+    return converted
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    # cart_compaction imports parse_timestamp from here
+    from cart_compaction import merge_duplicates
+
+    load_dotenv(Path(__file__).parent / '.env')
+    parser = argparse.ArgumentParser(description="Convert string timestamps to BSON dates")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved checkpoints and rescan")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    print("Migrating string timestamps to BSON dates...")
+    if args.restart and not args.dry_run:
+        await db.migrations.delete_one({"id": MIGRATION_ID})
+
+    total = 0
+    for collection_name, fields in TIMESTAMP_FIELDS.items():
+        for field in fields:
+            total += await migrate_field(db, collection_name, field, args.batch_size, args.pause, args.dry_run)
+
+    if not args.dry_run:
+        for collection_name in ("carts", "wishlists"):
+            merged = await merge_duplicates(db, collection_name)
+            print(f"  {collection_name}: merged {merged} duplicate documents")
+
+    if args.dry_run:
+        print(f"Dry run: {total} timestamps would be converted")
+    else:
+        await db.migrations.update_one(
+            {"id": MIGRATION_ID},
+            {"$set": {"completed_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        print(f"✅ Migration complete: {total} timestamps converted")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,270 @@
+"""
+Opening hours: whether the restaurant is open, and when it next opens.
+
+The settings page only ever held display strings ("5:00 PM - 10:00 PM"), so
+orders and reservations were accepted at any hour. Hours are now kept as a
+structured document in the opening_hours collection:
+
+  {"id": "hours",
+   "weekly": {"monday": [{"open": "17:00", "close": "22:00"}], ...},
+   "overrides": [{"date": "2025-12-25", "ranges": [], "note": "Christmas"}],
+   "last_order_minutes": 0, "last_seating_minutes": 60}
+
+A range whose close is at or before its open runs past midnight. An override
+replaces that date's weekly ranges; no ranges means closed all day. Until
+the document exists the hours are parsed from admin_settings.opening_hours,
+and with neither the restaurant is treated as always open.
+
+The hours are compiled into a Timeline: sorted, merged [open, close)
+intervals in epoch seconds, from yesterday through HOURS_HORIZON_DAYS
+ahead, in RESTAURANT_TIMEZONE (default Australia/Melbourne, where the
+restaurant is; hours read as UTC would refuse orders all evening). "Open now", "next opening" and slot checks
+are then a bisect over those intervals. The timeline is recompiled after
+each local midnight and whenever the hours or settings change.
+"""
+import asyncio
+import logging
+import re
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "opening_hours"
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+# Days listed for the week ahead on the public endpoint
+UPCOMING_DAYS = 7
+# The restaurant's own timezone (Hawthorn VIC), used when none is configured
+DEFAULT_TIMEZONE = "Australia/Melbourne"
+
+_TIME = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$")
+
+
+def parse_time(text: str) -> int:
+    """Minutes after midnight for "17:30", "5:30 PM", "5 PM" or "24:00"; ValueError otherwise"""
+    match = _TIME.match(text)
+    if not match:
+        raise ValueError(f"Invalid time: {text!r}")
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Invalid time: {text!r}")
+        hour = hour % 12 + (12 if meridiem.upper() == "PM" else 0)
+    if minute > 59 or hour > 24 or (hour == 24 and minute):
+        raise ValueError(f"Invalid time: {text!r}")
+    return hour * 60 + minute
+
+
+def timezone_name(environ) -> str:
+    """RESTAURANT_TIMEZONE, else ANALYTICS_TIMEZONE, else DEFAULT_TIMEZONE"""
+    return environ.get("RESTAURANT_TIMEZONE") or environ.get("ANALYTICS_TIMEZONE") or DEFAULT_TIMEZONE
+
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def from_legacy(opening_hours: dict) -> Dict[str, List[dict]]:
+    """Weekly ranges from display strings keyed like "monday_thursday", "friday_saturday" or "sunday" """
+    weekly: Dict[str, List[dict]] = {day: [] for day in WEEKDAYS}
+    for key, text in opening_hours.items():
+        days = key.lower().split("_")
+        if not days or any(day not in WEEKDAYS for day in days):
+            raise ValueError(f"Unknown opening hours key: {key!r}")
+        first, last = WEEKDAYS.index(days[0]), WEEKDAYS.index(days[-1])
+        ranges = []
+        if text.strip().lower() != "closed":
+            for part in text.split(","):
+                opens, _, closes = part.partition("-")
+                ranges.append({"open": format_minutes(parse_time(opens)), "close": format_minutes(parse_time(closes))})
+        for index in range(first, last + 1):
+            weekly[WEEKDAYS[index]] = ranges
+    return weekly
+
+
+def _local(day: date, minutes: int, tz: ZoneInfo) -> float:
+    return datetime.combine(day + timedelta(days=minutes // 1440), time(*divmod(minutes % 1440, 60)), tz).timestamp()
+
+
+class Timeline:
+    """Sorted, merged open intervals; hours after covers_until are unknown, and expires_at is the next local midnight"""
+
+    def __init__(self, intervals: List[Tuple[float, float]], covers_until: float, expires_at: float):
+        merged: List[List[float]] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            elif end > start:
+                merged.append([start, end])
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+        self.covers_until = covers_until
+        self.expires_at = expires_at
+
+    def interval_at(self, moment: float) -> Optional[Tuple[float, float]]:
+        index = bisect_right(self.starts, moment) - 1
+        if index >= 0 and moment < self.ends[index]:
+            return self.starts[index], self.ends[index]
+        return None
+
+    def next_opening(self, moment: float) -> Optional[float]:
+        index = bisect_right(self.starts, moment)
+        return self.starts[index] if index < len(self.starts) else None
+
+    def accepts(self, moment: float, minutes_before_close: int) -> bool:
+        """Open at `moment` with at least `minutes_before_close` to go"""
+        interval = self.interval_at(moment)
+        return interval is not None and moment <= interval[1] - minutes_before_close * 60
+
+    def between(self, lower: float, upper: float) -> List[Tuple[float, float]]:
+        first = max(bisect_right(self.starts, lower) - 1, 0)
+        last = bisect_right(self.starts, upper)
+        return [(s, e) for s, e in zip(self.starts[first:last], self.ends[first:last]) if e > lower]
+
+
+def compile_timeline(config: dict, tz: ZoneInfo, today: date, horizon_days: int) -> Timeline:
+    overrides = {override["date"]: override.get("ranges", []) for override in config.get("overrides", [])}
+    intervals = []
+    for offset in range(-1, horizon_days):
+        day = today + timedelta(days=offset)
+        ranges = overrides.get(day.isoformat(), config["weekly"].get(WEEKDAYS[day.weekday()], []))
+        for entry in ranges:
+            opens, closes = parse_time(entry["open"]), parse_time(entry["close"])
+            if closes <= opens:
+                closes += 1440
+            intervals.append((_local(day, opens, tz), _local(day, closes, tz)))
+    return Timeline(
+        intervals,
+        covers_until=_local(today, horizon_days * 1440, tz),
+        expires_at=_local(today, 1440, tz),
+    )
+
+
+class OpeningHours:
+    """The compiled timeline for this worker, rebuilt lazily after invalidate() or midnight"""
+
+    def __init__(self, tz_name: str = DEFAULT_TIMEZONE, horizon_days: int = 90):
+        self.tz_name = tz_name
+        self.tz = ZoneInfo(tz_name)
+        self.horizon_days = horizon_days
+        self._compiled: Optional[Tuple[Optional[dict], Optional[Timeline]]] = None
+        self._public: Optional[Tuple[float, dict]] = None
+        self._lock = asyncio.Lock()
+        self.version = 0
+
+    def invalidate(self):
+        self._compiled = None
+        self._public = None
+        self.version += 1
+
+    async def config(self, db) -> Optional[dict]:
+        """The structured hours, falling back to the settings page's strings; None if neither is set"""
+        stored = await db[COLLECTION].find_one({"id": "hours"}, {"_id": 0})
+        if stored is not None:
+            return stored
+        settings = await db.admin_settings.find_one({"id": "settings"}, {"_id": 0, "opening_hours": 1})
+        if settings and settings.get("opening_hours"):
+            try:
+                weekly = from_legacy(settings["opening_hours"])
+            except ValueError as e:
+                # Better to take orders at odd hours than to refuse them all
+                logger.warning(f"Can't read opening hours from settings ({str(e)}); treating as always open")
+                return None
+            return {"weekly": weekly, "overrides": [], "last_order_minutes": 0, "last_seating_minutes": 60}
+        return None
+
+    async def timeline(self, db, now: float) -> Tuple[Optional[dict], Optional[Timeline]]:
+        compiled = self._compiled
+        if compiled is not None and (compiled[1] is None or now < compiled[1].expires_at):
+            return compiled
+
+        async with self._lock:
+            compiled = self._compiled
+            if compiled is None or (compiled[1] is not None and now >= compiled[1].expires_at):
+                version = self.version
+                config = await self.config(db)
+                today = datetime.fromtimestamp(now, self.tz).date()
+                timeline = None if config is None else compile_timeline(config, self.tz, today, self.horizon_days)
+                compiled = (config, timeline)
+                # Hours were edited while we were loading; use them but don't keep them
+                if version == self.version:
+                    self._compiled = compiled
+            return compiled
+
+    def _describe(self, moment: float) -> str:
+        local = datetime.fromtimestamp(moment, self.tz)
+        return f"{local:%A} {local.hour % 12 or 12}:{local:%M} {'PM' if local.hour >= 12 else 'AM'}"
+
+    async def check_order(self, db, now: datetime) -> Optional[str]:
+        """None if an order can be placed now, otherwise why not"""
+        moment = now.timestamp()
+        config, timeline = await self.timeline(db, moment)
+        if timeline is None or timeline.accepts(moment, config.get("last_order_minutes", 0)):
+            return None
+        opening = timeline.next_opening(moment)
+        if opening is None:
+            return "Sorry, we're not taking orders right now"
+        return f"Sorry, we're not taking orders right now. We open again {self._describe(opening)}"
+
+    async def check_reservation(self, db, day: str, slot: str, now: datetime) -> Optional[str]:
+        """None if a table can be booked for `slot` on `day` (restaurant time), otherwise why not"""
+        try:
+            moment = _local(date.fromisoformat(day), parse_time(slot), self.tz)
+        except ValueError:
+            return "Please choose a valid date and time"
+        if moment <= now.timestamp():
+            return "Please choose a time in the future"
+        config, timeline = await self.timeline(db, now.timestamp())
+        if timeline is None:
+            return None
+        if moment >= timeline.covers_until:
+            return f"Reservations can be made up to {self.horizon_days} days ahead"
+        if not timeline.accepts(moment, config.get("last_seating_minutes", 0)):
+            return "Sorry, we can't seat you at that time. Please choose a time within our opening hours"
+        return None
+
+    async def public(self, db, now: datetime) -> Tuple[dict, float]:
+        """Payload for GET /opening-hours and the epoch second it stays valid until"""
+        moment = now.timestamp()
+        cached = self._public
+        if cached is not None and moment < cached[0]:
+            return cached[1], cached[0]
+
+        version = self.version
+        config, timeline = await self.timeline(db, moment)
+        if timeline is None:
+            payload = {"timezone": self.tz_name, "configured": False, "open_now": True,
+                       "closes_at": None, "next_opening": None, "weekly": None, "upcoming": []}
+            valid_until = moment + 300
+        else:
+            current = timeline.interval_at(moment)
+            opening = timeline.next_opening(moment)
+            today = datetime.fromtimestamp(moment, self.tz).date()
+            upcoming = []
+            for offset in range(UPCOMING_DAYS):
+                day = today + timedelta(days=offset)
+                lower, upper = _local(day, 0, self.tz), _local(day, 1440, self.tz)
+                upcoming.append({
+                    "date": day.isoformat(),
+                    "intervals": [
+                        {"open": datetime.fromtimestamp(s, self.tz), "close": datetime.fromtimestamp(e, self.tz)}
+                        for s, e in timeline.between(lower, upper) if s >= lower
+                    ],
+                })
+            payload = {
+                "timezone": self.tz_name,
+                "configured": True,
+                "open_now": current is not None,
+                "closes_at": datetime.fromtimestamp(current[1], self.tz) if current else None,
+                "next_opening": datetime.fromtimestamp(opening, self.tz) if opening is not None else None,
+                "weekly": config["weekly"],
+                "upcoming": upcoming,
+            }
+            # The answer holds until the next opening or closing, or midnight when the days shift
+            boundaries = [timeline.expires_at, *(t for t in (current and current[1], opening) if t)]
+            valid_until = min(boundaries)
+        if version == self.version:
+            self._public = (valid_until, payload)
+        return payload, valid_until
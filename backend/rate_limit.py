@@ -0,0 +1,201 @@
+"""
+Throttling for the public write endpoints (contact, reservation, orders).
+
+Each of those requests inserts into Mongo and holds an SMTP session open, so
+a bot posting in a loop can tie up the database and the mail relay. Two
+layers protect them:
+
+  * token buckets keyed by client IP and by submitted email address, per
+    endpoint. A client that runs dry gets 429 with Retry-After. Buckets live
+    in process by default; RATE_LIMIT_STORE=mongo shares them between workers
+    and hosts through the rate_limits collection.
+  * a load shedder that caps concurrent public writes and rejects new ones
+    with 503 and Retry-After while Mongo latency or open SMTP sessions are
+    above their thresholds.
+
+Neither layer touches the read endpoints, so browsing the menu stays fast
+while a form is being abused.
+"""
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pymongo import ReturnDocument
+
+from metrics import http_requests_shed_total, mongo_latency_ewma, smtp_sends_in_progress
+
+
+@dataclass
+class BucketPolicy:
+    rate: float      # tokens added per second
+    burst: float     # bucket capacity
+
+    @classmethod
+    def per_minute(cls, count: float, burst: float):
+        return cls(rate=count / 60, burst=burst)
+
+    @classmethod
+    def per_hour(cls, count: float, burst: float):
+        return cls(rate=count / 3600, burst=burst)
+
+    def retry_after(self, tokens: float) -> float:
+        return (1 - tokens) / self.rate
+
+
+class MemoryBucketStore:
+    """Buckets in a bounded LRU dict; idle keys beyond max_keys are forgotten (i.e. refilled)"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, policy: BucketPolicy) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (policy.burst, now))
+        tokens = min(policy.burst, tokens + (now - updated) * policy.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else policy.retry_after(tokens)
+
+
+class MongoBucketStore:
+    """Buckets shared across workers; refill and take happen in one atomic pipeline update"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("key", unique=True)
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def take(self, key: str, policy: BucketPolicy) -> Tuple[bool, float]:
+        now = datetime.now(timezone.utc)
+        # A full bucket carries no state, so the document can expire once it would have refilled
+        expires_at = now + timedelta(seconds=policy.burst / policy.rate)
+        elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [
+            policy.burst,
+            {"$add": [{"$ifNull": ["$tokens", policy.burst]}, {"$multiply": [elapsed_seconds, policy.rate]}]}
+        ]}
+        doc = await self.collection.find_one_and_update(
+            {"key": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now, "expires_at": expires_at}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                }},
+            ],
+            projection={"_id": 0, "tokens": 1, "allowed": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        allowed = doc["allowed"]
+        return allowed, 0.0 if allowed else policy.retry_after(doc["tokens"])
+
+
+class LoadShedder:
+    """Caps concurrent public writes and refuses new ones while dependencies are slow"""
+
+    def __init__(self, max_concurrent: int, max_db_latency: float, max_smtp_sessions: int):
+        self.max_concurrent = max_concurrent
+        self.max_db_latency = max_db_latency
+        self.max_smtp_sessions = max_smtp_sessions
+        self.active = 0
+
+    def overload_reason(self) -> Optional[str]:
+        if self.active >= self.max_concurrent:
+            return "concurrency"
+        if mongo_latency_ewma.value > self.max_db_latency:
+            return "db_latency"
+        if smtp_sends_in_progress.labels().value >= self.max_smtp_sessions:
+            return "smtp_backlog"
+        return None
+
+    def acquire(self) -> Optional[str]:
+        """Take a slot unless overloaded; returns why it was refused.
+
+        Checking and counting with no await in between keeps a burst from all
+        passing the check before any of them is counted.
+        """
+        reason = self.overload_reason()
+        if reason is None:
+            self.active += 1
+        return reason
+
+    def release(self):
+        self.active -= 1
+
+
+def client_ip(request: Request, trust_forwarded: bool) -> str:
+    if trust_forwarded:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # The right-most entry is the one our own proxy appended; earlier ones are client-supplied
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _retry_after_header(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class WriteGuard:
+    """FastAPI dependency factory: `dependencies=[Depends(guard("contact", "email"))]`"""
+
+    def __init__(self, store, ip_policy: BucketPolicy, email_policy: BucketPolicy, shedder: LoadShedder,
+                 trust_forwarded: bool = False, shed_retry_after: float = 5):
+        self.store = store
+        self.ip_policy = ip_policy
+        self.email_policy = email_policy
+        self.shedder = shedder
+        self.trust_forwarded = trust_forwarded
+        self.shed_retry_after = shed_retry_after
+
+    def __call__(self, route: str, email_field: str):
+        async def dependency(request: Request):
+            reason = self.shedder.acquire()
+            if reason:
+                http_requests_shed_total.labels(route, reason).inc()
+                raise HTTPException(
+                    status_code=503, detail="Server is busy, please try again shortly",
+                    headers=_retry_after_header(self.shed_retry_after),
+                )
+
+            try:
+                await self._take(route, "ip", client_ip(request, self.trust_forwarded), self.ip_policy)
+                email = await self._email(request, email_field)
+                if email:
+                    await self._take(route, "email", email, self.email_policy)
+                yield
+            finally:
+                self.shedder.release()
+
+        return dependency
+
+    async def _take(self, route: str, kind: str, value: str, policy: BucketPolicy):
+        allowed, retry_after = await self.store.take(f"{route}:{kind}:{value}", policy)
+        if not allowed:
+            http_requests_shed_total.labels(route, f"{kind}_rate").inc()
+            raise HTTPException(
+                status_code=429, detail="Too many requests, please try again later",
+                headers=_retry_after_header(retry_after),
+            )
+
+    @staticmethod
+    async def _email(request: Request, field: str) -> Optional[str]:
+        try:
+            body = await request.json()
+        except ValueError:
+            # Malformed bodies are rejected by validation right after this
+            return None
+        value = body.get(field) if isinstance(body, dict) else None
+        return value.strip().lower() if isinstance(value, str) else None
@@ -0,0 +1,321 @@
+"""
+Vectorized reports over the full order history.
+
+The daily rollups (analytics.py) answer per-day questions; these reports need
+every order at once: period-over-period revenue, basket-size distributions,
+item mix per period and customer cohort repeat rates. Looping over order
+dicts in Python takes seconds at a few hundred thousand orders, so
+load_columns() streams orders out of Mongo in batches into flat NumPy arrays
+(one row per order, one row per order line), and each report is a handful of
+bincount/unique calls over those arrays.
+
+ReportEngine keeps the loaded columns and every computed report for
+REPORTS_CACHE_SECONDS, so the admin endpoints answer from memory and the
+history is read from Mongo at most once per window. Cancelled orders are
+left out, as in the rollups.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analytics import EXCLUDED_STATUSES
+
+BATCH_SIZE = 5000
+ORDER_PROJECTION = {"_id": 0, "created_at": 1, "total": 1, "customer_email": 1, "items": 1}
+
+# API name -> pandas period frequency; weeks run Monday to Sunday
+PERIODS = {"day": "D", "week": "W-SUN", "month": "M"}
+
+BASKET_SIZE_BUCKETS = 10
+ORDER_VALUE_PERCENTILES = (25, 50, 75, 90)
+
+
+@dataclass
+class OrderColumns:
+    """Order history as parallel arrays; line_order indexes into the per-order arrays"""
+    created_at: np.ndarray      # float64 epoch seconds, UTC
+    total: np.ndarray           # float64
+    customer: np.ndarray        # int64 code into customers
+    line_order: np.ndarray      # int64 row of the line's order
+    line_item: np.ndarray       # int64 code into item_ids
+    line_quantity: np.ndarray   # int64
+    customers: List[str]
+    item_ids: List[str]
+    _ordinals: Dict[tuple, np.ndarray] = field(default_factory=dict, repr=False)
+
+    @property
+    def order_count(self) -> int:
+        return len(self.total)
+
+    def period_ordinals(self, freq: str, tz_name: str) -> np.ndarray:
+        """Per-order period ordinals, computed once per loaded history"""
+        key = (freq, tz_name)
+        if key not in self._ordinals:
+            self._ordinals[key] = _period_ordinals(self.created_at, freq, tz_name)
+        return self._ordinals[key]
+
+
+def _epoch(moment: datetime) -> float:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class _ColumnBuilder:
+    def __init__(self):
+        self.created_at, self.total, self.customer = [], [], []
+        self.line_order, self.line_item, self.line_quantity = [], [], []
+        self.customer_codes: Dict[str, int] = {}
+        self.item_codes: Dict[str, int] = {}
+        self.rows = 0
+
+    def add_batch(self, docs: List[dict]):
+        """Append one batch, converting it to arrays straight away so Python objects don't pile up"""
+        customers, items, quantities, line_orders = [], [], [], []
+        for offset, doc in enumerate(docs):
+            email = (doc.get("customer_email") or "").lower()
+            customers.append(self.customer_codes.setdefault(email, len(self.customer_codes)))
+            for line in doc.get("items", ()):
+                line_orders.append(self.rows + offset)
+                items.append(self.item_codes.setdefault(line["menu_item_id"], len(self.item_codes)))
+                quantities.append(line["quantity"])
+        self.created_at.append(np.fromiter((_epoch(doc["created_at"]) for doc in docs), np.float64, len(docs)))
+        self.total.append(np.fromiter((doc.get("total", 0.0) for doc in docs), np.float64, len(docs)))
+        self.customer.append(np.asarray(customers, dtype=np.int64))
+        self.line_order.append(np.asarray(line_orders, dtype=np.int64))
+        self.line_item.append(np.asarray(items, dtype=np.int64))
+        self.line_quantity.append(np.asarray(quantities, dtype=np.int64))
+        self.rows += len(docs)
+
+    def build(self) -> OrderColumns:
+        def join(parts, dtype):
+            return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+        return OrderColumns(
+            created_at=join(self.created_at, np.float64),
+            total=join(self.total, np.float64),
+            customer=join(self.customer, np.int64),
+            line_order=join(self.line_order, np.int64),
+            line_item=join(self.line_item, np.int64),
+            line_quantity=join(self.line_quantity, np.int64),
+            customers=list(self.customer_codes),
+            item_ids=list(self.item_codes),
+        )
+
+
+def columns_from_docs(docs: List[dict], batch_size: int = BATCH_SIZE) -> OrderColumns:
+    builder = _ColumnBuilder()
+    for start in range(0, len(docs), batch_size):
+        builder.add_batch(docs[start:start + batch_size])
+    return builder.build()
+
+
+async def load_columns(db, batch_size: int = BATCH_SIZE) -> OrderColumns:
+    builder = _ColumnBuilder()
+    cursor = db.orders.find({"status": {"$nin": EXCLUDED_STATUSES}}, ORDER_PROJECTION).batch_size(batch_size)
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            builder.add_batch(batch)
+            batch = []
+    if batch:
+        builder.add_batch(batch)
+    return builder.build()
+
+
+# ============= REPORTS =============
+
+def local_seconds(epoch_seconds: np.ndarray, tz_name: str) -> np.ndarray:
+    """Epoch seconds shifted to wall-clock time in tz_name (DST-aware)"""
+    if tz_name == "UTC":
+        return epoch_seconds
+    local = pd.to_datetime(epoch_seconds, unit="s", utc=True).tz_convert(tz_name).tz_localize(None)
+    return local.asi8 / 1e9
+
+
+def _period_ordinals(epoch_seconds: np.ndarray, freq: str, tz_name: str) -> np.ndarray:
+    """pandas Period ordinals for each timestamp, by integer arithmetic on local days.
+
+    Equivalent to DatetimeIndex.to_period(freq).asi8, which is several times
+    slower than the report that uses it.
+    """
+    days = np.floor_divide(local_seconds(epoch_seconds, tz_name), 86400).astype(np.int64)
+    if freq == "D":
+        return days
+    if freq == "W-SUN":
+        # 1970-01-01 was a Thursday, in week 1 (29 Dec - 4 Jan)
+        return (days + 3) // 7 + 1
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def _current_ordinal(now: datetime, freq: str, tz_name: str) -> int:
+    return int(_period_ordinals(np.array([_epoch(now)]), freq, tz_name)[0])
+
+
+def _period_bounds(ordinal: int, freq: str) -> dict:
+    period = pd.Period(ordinal=ordinal, freq=freq)
+    return {"start": period.start_time.date().isoformat(), "end": period.end_time.date().isoformat()}
+
+
+def revenue_by_period(cols: OrderColumns, tz_name: str, now: datetime,
+                      period: str = "month", periods: int = 12) -> dict:
+    """Revenue and orders for the last `periods` periods, each against the one before"""
+    freq = PERIODS[period]
+    current = _current_ordinal(now, freq, tz_name)
+    first = current - periods    # one extra period so the oldest row has a comparison
+    ordinals = cols.period_ordinals(freq, tz_name)
+    in_window = (ordinals >= first) & (ordinals <= current)
+    index = ordinals[in_window] - first
+    revenue = np.bincount(index, weights=cols.total[in_window], minlength=periods + 1)
+    orders = np.bincount(index, minlength=periods + 1)
+
+    rows = []
+    for offset in range(1, periods + 1):
+        previous = revenue[offset - 1]
+        rows.append({
+            **_period_bounds(first + offset, freq),
+            "revenue": round(float(revenue[offset]), 2),
+            "orders": int(orders[offset]),
+            "previous_revenue": round(float(previous), 2),
+            "change_pct": round(float((revenue[offset] - previous) / previous * 100), 1) if previous else None,
+        })
+    return {"period": period, "rows": rows}
+
+
+def basket_sizes(cols: OrderColumns, tz_name: str, now: datetime) -> dict:
+    """Distribution of items per order, plus order value percentiles"""
+    if cols.order_count == 0:
+        return {"orders": 0, "distribution": [], "mean_items": 0.0, "median_items": 0.0,
+                "order_value": {}}
+    sizes = np.bincount(cols.line_order, weights=cols.line_quantity, minlength=cols.order_count).astype(np.int64)
+    counts = np.bincount(np.clip(sizes, 0, BASKET_SIZE_BUCKETS), minlength=BASKET_SIZE_BUCKETS + 1)
+    distribution = [
+        {"items": f"{size}+" if size == BASKET_SIZE_BUCKETS else str(size), "orders": int(counts[size])}
+        for size in range(1, BASKET_SIZE_BUCKETS + 1)
+    ]
+    percentiles = np.percentile(cols.total, ORDER_VALUE_PERCENTILES)
+    return {
+        "orders": cols.order_count,
+        "distribution": distribution,
+        "mean_items": round(float(sizes.mean()), 2),
+        "median_items": float(np.median(sizes)),
+        "order_value": {
+            "mean": round(float(cols.total.mean()), 2),
+            **{f"p{p}": round(float(value), 2) for p, value in zip(ORDER_VALUE_PERCENTILES, percentiles)},
+        },
+    }
+
+
+def item_mix(cols: OrderColumns, tz_name: str, now: datetime,
+             period: str = "month", periods: int = 6, limit: int = 20) -> dict:
+    """Quantity sold per item per period and each item's share of the period, top `limit` items"""
+    freq = PERIODS[period]
+    current = _current_ordinal(now, freq, tz_name)
+    first = current - periods + 1
+    line_ordinals = cols.period_ordinals(freq, tz_name)[cols.line_order]
+    in_window = (line_ordinals >= first) & (line_ordinals <= current)
+    item_count = len(cols.item_ids)
+    cells = (line_ordinals[in_window] - first) * item_count + cols.line_item[in_window]
+    matrix = np.bincount(
+        cells, weights=cols.line_quantity[in_window], minlength=periods * item_count
+    ).reshape(periods, item_count)
+
+    period_totals = matrix.sum(axis=1, keepdims=True)
+    shares = np.divide(matrix, period_totals, out=np.zeros_like(matrix), where=period_totals > 0)
+    top = np.argsort(-matrix.sum(axis=0), kind="stable")[:limit]
+    return {
+        "period": period,
+        "periods": [_period_bounds(first + offset, freq) for offset in range(periods)],
+        "items": [
+            {
+                "menu_item_id": cols.item_ids[code],
+                "quantities": matrix[:, code].astype(np.int64).tolist(),
+                "shares": np.round(shares[:, code], 4).tolist(),
+            }
+            for code in top if matrix[:, code].any()
+        ],
+    }
+
+
+def cohort_repeat_rates(cols: OrderColumns, tz_name: str, now: datetime, cohorts: int = 6) -> dict:
+    """For customers grouped by the month of their first order, the share ordering again k months later"""
+    current = _current_ordinal(now, "M", tz_name)
+    first_cohort = current - cohorts + 1
+    if cols.order_count == 0:
+        months = np.empty(0, dtype=np.int64)
+        first_month = np.empty(0, dtype=np.int64)
+    else:
+        months = cols.period_ordinals("M", tz_name)
+        first_month = np.full(len(cols.customers), np.iinfo(np.int64).max)
+        np.minimum.at(first_month, cols.customer, months)
+
+    offsets = months - first_month[cols.customer]
+    # Each customer counts once per month they ordered in
+    pairs = np.unique(cols.customer * (cohorts + 1) + np.minimum(offsets, cohorts))
+    pair_customer, pair_offset = np.divmod(pairs, cohorts + 1)
+    pair_cohort = first_month[pair_customer]
+    keep = (pair_cohort >= first_cohort) & (pair_offset < cohorts)
+    returning = np.bincount(
+        (pair_cohort[keep] - first_cohort) * cohorts + pair_offset[keep], minlength=cohorts * cohorts
+    ).reshape(cohorts, cohorts)
+
+    rows = []
+    for index in range(cohorts):
+        size = int(returning[index, 0])
+        elapsed = cohorts - 1 - index      # months between this cohort and now
+        rows.append({
+            "cohort": pd.Period(ordinal=first_cohort + index, freq="M").strftime("%Y-%m"),
+            "customers": size,
+            "repeat_rates": [
+                round(float(returning[index, k] / size), 4) if size else None
+                for k in range(1, elapsed + 1)
+            ],
+        })
+    return {"cohorts": rows}
+
+
+REPORTS: Dict[str, Callable[..., dict]] = {
+    "revenue": revenue_by_period,
+    "basket-sizes": basket_sizes,
+    "item-mix": item_mix,
+    "cohorts": cohort_repeat_rates,
+}
+
+
+class ReportEngine:
+    """Loaded columns and computed reports, both kept for `ttl` seconds"""
+
+    def __init__(self, tz_name: str = "UTC", ttl: float = 300, batch_size: int = BATCH_SIZE):
+        self.tz_name = tz_name
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self._columns: Optional[OrderColumns] = None
+        self._loaded_at = 0.0
+        self._results: Dict[tuple, dict] = {}
+        self._lock = asyncio.Lock()
+
+    async def columns(self, db) -> OrderColumns:
+        if self._columns is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return self._columns
+        async with self._lock:
+            if self._columns is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self._columns = await load_columns(db, self.batch_size)
+                self._loaded_at = time.monotonic()
+                self._results = {}
+            return self._columns
+
+    async def run(self, db, name: str, **params) -> dict:
+        cols = await self.columns(db)
+        key = (name, tuple(sorted(params.items())))
+        result = self._results.get(key)
+        if result is None:
+            result = REPORTS[name](cols, self.tz_name, datetime.now(timezone.utc), **params)
+            result["generated_at"] = datetime.now(timezone.utc)
+            self._results[key] = result
+        return result
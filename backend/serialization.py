@@ -0,0 +1,88 @@
+"""
+JSON encoding for API responses.
+
+FastAPI's default path runs every response through jsonable_encoder, a pure
+Python walk over each dict, list and datetime, and then stdlib json. orjson
+encodes dicts, lists, datetimes and UUIDs natively in C; Pydantic models and
+anything else orjson doesn't know fall back to _default.
+
+Datetimes are written with a trailing "Z" (OPT_UTC_Z), the same form Pydantic
+uses for the tz-aware values Motor returns, so switching encoders doesn't
+change what the frontend receives.
+
+Documents the API wrote itself were validated on the way in, so reads don't
+validate them again. The response shape response_model used to enforce is
+kept more cheaply: read_projection() asks Mongo for the model's fields only,
+and fill_defaults() adds any field an older document predates, calling
+default_factory where the model has one (e.g. a seeded dish without `id` or
+`created_at`) just as validation would.
+"""
+from functools import lru_cache
+from typing import Any, List, Tuple, Type
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic.fields import FieldInfo
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    encoded = jsonable_encoder(obj)
+    if encoded is obj:
+        raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+    return encoded
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """The app's default response class.
+
+    Returning one directly from a route also skips FastAPI's response_model
+    validation, which is what trusted database reads do (see list_response
+    in server.py).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def read_projection(model: Type[BaseModel]) -> dict:
+    """Mongo projection returning exactly the model's fields, so unknown keys never leave the database"""
+    projection = {"_id": 0}
+    projection.update({name: 1 for name in model.model_fields})
+    return projection
+
+
+@lru_cache(maxsize=None)
+def _optional_fields(model: Type[BaseModel]) -> Tuple[Tuple[str, FieldInfo], ...]:
+    return tuple((name, field) for name, field in model.model_fields.items() if not field.is_required())
+
+
+def fill_defaults(model: Type[BaseModel], docs: List[dict]) -> List[dict]:
+    """Add fields older documents predate, as validation would have; edits docs in place"""
+    fields = _optional_fields(model)
+    for doc in docs:
+        for name, field in fields:
+            if name not in doc:
+                # A fresh value per document: factories are called and mutable defaults copied
+                doc[name] = field.get_default(call_default_factory=True, validated_data=doc)
+    return docs
+
+
+def construct_all(model: Type[BaseModel], docs: List[dict]) -> List[BaseModel]:
+    """Models for documents loaded from Mongo; nothing is validated"""
+    return [model.model_construct(**doc) for doc in docs]
+
+
+def dump_trusted(model: Type[BaseModel], docs: List[dict]) -> bytes:
+    """JSON for a list of stored documents, shaped like `model` but never validated against it"""
+    return dumps(fill_defaults(model, docs))
@@ -1,37 +1,200 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Body, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Body, UploadFile, File, Query, Request
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import Response, JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+import asyncio
+import hmac
+import json
 import os
 import logging
 from pathlib import Path
+from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Literal, Tuple, Union
 import uuid
-from datetime import datetime, timezone, timedelta
-from auth import verify_password, get_password_hash, create_access_token, verify_token
+from datetime import date, datetime, timezone, timedelta
+from auth import verify_password, get_password_hash, create_access_token, verify_token, verify_stream_token
+from auth import security, username_from_token
+from fastapi.security import HTTPAuthorizationCredentials
+from auth import create_stream_token, RedactQueryString, STREAM_TOKEN_EXPIRE_SECONDS
 from email_service import EmailService
+from menu_index import MenuIndex
+from home_bundle import HomeBundle
+from compression import CompressedPayload, CompressionMiddleware, ResponseCache, payload_response
+from serialization import FastJSONResponse, construct_all, dump_trusted, dumps, fill_defaults, read_projection
+from invalidation_bus import create_bus
+from rate_limit import BucketPolicy, LoadShedder, MemoryBucketStore, MongoBucketStore, WriteGuard
+import dashboard_stats
+import analytics
+from reports import ReportEngine
+from forecast import DemandForecaster
+import kitchen
+from delivery_zones import DeliveryZones, PostcodeTable
+from opening_hours import WEEKDAYS, OpeningHours, parse_time, timezone_name as opening_hours_timezone
+from availability import Availability, SoldOut, encode_fragment, splice
+import cart_compaction
+from lifecycle import Lifecycle, DrainMiddleware, drain_on_signal, mongo_client_options
+from metrics import PrometheusMiddleware, MongoCommandListener, render_latest, CONTENT_TYPE_LATEST
 import aiofiles
 import shutil
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+# uvicorn has configured its loggers by the time it imports the app
+logging.getLogger("uvicorn.access").addFilter(RedactQueryString())
+
+# MongoDB connection (every command is timed for /metrics). Pool size and
+# timeouts come from MONGO_* environment variables, see lifecycle.py. Writes to the
+# collections the public forms use are what the load shedder watches.
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url, tz_aware=True,
+    event_listeners=[MongoCommandListener(
+        latency_collections=("orders", "contact_forms", "reservations", "rate_limits", "menu_stock")
+    )],
+    **mongo_client_options()
+)
 db = client[os.environ['DB_NAME']]
 
 # Email service
 email_service = EmailService()
 
+# In-memory menu lookup used to price carts without shipping the whole menu
+menu_index = MenuIndex()
+
+# Sold-out flags and stock counts (see availability.py); other workers' changes arrive over the cache bus
+menu_availability = Availability()
+
+# /menu and /menu/summary: each item pre-encoded per menu_index.version, and the
+# compressed bodies with availability spliced in per (menu, availability) version
+menu_fragments = ResponseCache(compress=False)
+menu_responses = ResponseCache()
+
+# Tells every worker process to drop its in-memory caches after an admin edit
+# (CACHE_BUS=local|unix|mongo, see invalidation_bus.py)
+cache_bus = create_bus(os.environ.get('CACHE_BUS', 'local'), os.environ.get('CACHE_BUS_SOCKET_DIR'))
+cache_bus.subscribe("menu", menu_index.invalidate)
+cache_bus.subscribe("availability", lambda: menu_availability.schedule_reload(db), remote_only=True)
+
+# Carts and wishlists untouched for this long are removed by a TTL index
+CART_TTL_DAYS = float(os.environ.get('CART_TTL_DAYS', '30'))
+
+# Seconds between cart/wishlist compaction passes
+CART_COMPACTION_INTERVAL_SECONDS = float(os.environ.get('CART_COMPACTION_INTERVAL_SECONDS', '3600'))
+
+# Seconds between dashboard counter reconciliations
+DASHBOARD_RECONCILE_SECONDS = float(os.environ.get('DASHBOARD_RECONCILE_SECONDS', '900'))
+
+# Daily sales rollups behind /admin/analytics (see analytics.py); days and hours in ANALYTICS_TIMEZONE
+sales_rollups = analytics.Rollups(os.environ.get('ANALYTICS_TIMEZONE', 'UTC'))
+ANALYTICS_REFRESH_SECONDS = float(os.environ.get('ANALYTICS_REFRESH_SECONDS', '600'))
+ANALYTICS_MAX_DAYS = 366
+
+# Order history reports (see reports.py), recomputed at most once per REPORTS_CACHE_SECONDS
+report_engine = ReportEngine(
+    os.environ.get('ANALYTICS_TIMEZONE', 'UTC'), float(os.environ.get('REPORTS_CACHE_SECONDS', '300'))
+)
+
+# Per-dish prep forecast (see forecast.py), rebuilt every FORECAST_REFRESH_SECONDS
+demand_forecaster = DemandForecaster(
+    report_engine, menu_index,
+    history_weeks=int(os.environ.get('FORECAST_HISTORY_WEEKS', '8')),
+    smoothing=float(os.environ.get('FORECAST_SMOOTHING', '0.3')),
+    horizon_days=int(os.environ.get('FORECAST_HORIZON_DAYS', '7')),
+)
+FORECAST_REFRESH_SECONDS = float(os.environ.get('FORECAST_REFRESH_SECONDS', '3600'))
+
+# Per-station kitchen display tickets (see kitchen.py); other workers' changes arrive over the cache bus
+kitchen_queue = kitchen.KitchenQueue(
+    routes=json.loads(os.environ.get('KITCHEN_STATION_ROUTES', '{}')),
+    default_station=os.environ.get('KITCHEN_DEFAULT_STATION', 'curry'),
+)
+cache_bus.subscribe("kitchen", lambda: kitchen_queue.schedule_reload(db), remote_only=True)
+
+# Open/closed timeline behind orders, reservations and /opening-hours (see opening_hours.py);
+# the legacy hours strings live in settings, so settings edits recompile it too
+restaurant_hours = OpeningHours(
+    opening_hours_timezone(os.environ),
+    horizon_days=int(os.environ.get('HOURS_HORIZON_DAYS', '90')),
+)
+cache_bus.subscribe("opening_hours", restaurant_hours.invalidate)
+cache_bus.subscribe("settings", restaurant_hours.invalidate)
+
+# Bumped and voided kitchen tickets are removed by a TTL index after this long
+KITCHEN_TICKET_RETENTION_DAYS = float(os.environ.get('KITCHEN_TICKET_RETENTION_DAYS', '7'))
+
+# Throttling for POST /contact, /reservation and /orders (see rate_limit.py)
+write_guard = WriteGuard(
+    store=(MongoBucketStore(db.rate_limits) if os.environ.get('RATE_LIMIT_STORE') == 'mongo'
+           else MemoryBucketStore()),
+    ip_policy=BucketPolicy.per_minute(
+        float(os.environ.get('RATE_LIMIT_IP_PER_MINUTE', '10')), float(os.environ.get('RATE_LIMIT_IP_BURST', '5'))
+    ),
+    email_policy=BucketPolicy.per_hour(
+        float(os.environ.get('RATE_LIMIT_EMAIL_PER_HOUR', '10')), float(os.environ.get('RATE_LIMIT_EMAIL_BURST', '3'))
+    ),
+    shedder=LoadShedder(
+        max_concurrent=int(os.environ.get('WRITE_CONCURRENCY_LIMIT', '20')),
+        max_db_latency=float(os.environ.get('SHED_DB_LATENCY_MS', '500')) / 1000,
+        max_smtp_sessions=int(os.environ.get('SHED_SMTP_SESSIONS', '10')),
+    ),
+    trust_forwarded=os.environ.get('RATE_LIMIT_TRUST_FORWARDED', '').lower() in ('1', 'true', 'yes'),
+)
+
+TAX_RATE = 0.08
+# Charged everywhere while no delivery zones are defined, and shown on carts before an address is known
+DELIVERY_FEE = 5.00
+
+# Delivery fee and minimum per zone, resolved from the address (see delivery_zones.py)
+delivery_zones = DeliveryZones(
+    PostcodeTable.from_csv(Path(os.environ.get('POSTCODE_TABLE') or ROOT_DIR / 'postcodes.csv')), DELIVERY_FEE
+)
+cache_bus.subscribe("delivery_zones", delivery_zones.invalidate)
+
 # Create uploads directory if it doesn't exist
 UPLOADS_DIR = ROOT_DIR / "uploads"
 UPLOADS_DIR.mkdir(exist_ok=True)
 
+# Seconds the lifespan shutdown waits for in-flight requests. uvicorn waits for open
+# connections before that without a limit unless --timeout-graceful-shutdown is set
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get('SHUTDOWN_DRAIN_SECONDS', '10'))
+
+lifecycle = Lifecycle()
+# Station screens and menu pages hold their streams open indefinitely; end them as soon as draining starts
+lifecycle.on_drain(kitchen_queue.close_streams)
+lifecycle.on_drain(menu_availability.close_streams)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve liveness probes straight away; readiness waits for bootstrap()
+    app.state.background_tasks = [asyncio.create_task(bootstrap())]
+    # Start draining as soon as SIGTERM arrives, not once uvicorn has waited for every stream to end
+    restore_signals = drain_on_signal(lifecycle)
+    yield
+
+    restore_signals()
+    # Usually already drained by the time the server gets here; this covers signals it didn't see
+    if not await lifecycle.drain(SHUTDOWN_DRAIN_SECONDS):
+        logger.warning(f"Shutting down with {lifecycle.in_flight} request(s) still in flight")
+    for task in app.state.background_tasks:
+        task.cancel()
+    await asyncio.gather(*app.state.background_tasks, return_exceptions=True)
+    await cache_bus.stop()
+    client.close()
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Mount static files for uploads
 app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
@@ -86,8 +249,21 @@ class MenuItem(BaseModel):
     menu_type: str  # 'dine-in' or 'takeaway'
     image: Optional[str] = ""
     featured: bool = False
+    available: bool = True  # not stored; merged in from menu_availability
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class MenuItemSummary(BaseModel):
+    """Lightweight menu row for listings that only show names and prices"""
+    model_config = ConfigDict(extra="ignore")
+
+    id: str
+    name: str
+    price: float
+    category: str
+    menu_type: str
+    featured: bool = False
+    available: bool = True
+
 class MenuItemCreate(BaseModel):
     name: str
     description: str
@@ -106,10 +282,15 @@ class MenuItemUpdate(BaseModel):
     image: Optional[str] = None
     featured: Optional[bool] = None
 
+class AvailabilityUpdate(BaseModel):
+    """Fields left out are unchanged; "stock": null stops counting the dish"""
+    available: Optional[bool] = None
+    stock: Optional[int] = Field(default=None, ge=0)
+
 # Cart Models
 class CartItem(BaseModel):
     menu_item_id: str
-    quantity: int
+    quantity: int = Field(gt=0)
 
 class Cart(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -119,6 +300,39 @@ class Cart(BaseModel):
     items: List[CartItem]
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class CartQuantityUpdate(BaseModel):
+    quantity: int = Field(ge=0)
+
+class CartLineUpdate(BaseModel):
+    menu_item_id: str
+    quantity: int = Field(ge=0)
+
+class CartBatchUpdate(BaseModel):
+    items: List[CartLineUpdate] = Field(min_length=1)
+
+class CartLine(BaseModel):
+    menu_item_id: str
+    quantity: int
+    name: str
+    price: float
+    category: str
+    image: Optional[str] = ""
+    available: bool = True
+    line_subtotal: float
+
+class HydratedCart(BaseModel):
+    """Cart with each line priced from the menu and order totals computed"""
+    id: str
+    user_id: str
+    items: List[CartLine]
+    missing_item_ids: List[str] = []
+    item_count: int
+    subtotal: float
+    tax: float
+    delivery_fee: float
+    total: float
+    updated_at: datetime
+
 # Wishlist Models
 class Wishlist(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -128,6 +342,14 @@ class Wishlist(BaseModel):
     menu_item_ids: List[str]
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class HydratedWishlist(BaseModel):
+    """Wishlist with the full menu record for every id still on the menu"""
+    id: str
+    user_id: str
+    menu_item_ids: List[str]
+    items: List[MenuItem]
+    updated_at: datetime
+
 # Contact Form Models
 class ContactForm(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -231,10 +453,61 @@ class BannerUpdate(BaseModel):
     active: Optional[bool] = None
 
 
+# Opening Hours Models
+class TimeRange(BaseModel):
+    open: str   # "17:00" or "5:00 PM"
+    close: str  # at or before `open` means after midnight
+
+class HoursOverride(BaseModel):
+    date: str  # YYYY-MM-DD
+    ranges: List[TimeRange] = []  # none: closed all day
+    note: Optional[str] = None
+
+class OpeningHoursConfig(BaseModel):
+    weekly: Dict[Literal[WEEKDAYS], List[TimeRange]]
+    overrides: List[HoursOverride] = []
+    last_order_minutes: int = Field(0, ge=0)
+    last_seating_minutes: int = Field(60, ge=0)
+
+
+# Delivery Zone Models
+class DeliveryZone(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    fee: float
+    minimum_order: float = 0.0
+    postcodes: List[str] = []
+    polygon: Optional[List[Tuple[float, float]]] = None  # [longitude, latitude] points
+    active: bool = True
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class DeliveryZoneCreate(BaseModel):
+    name: str
+    fee: float = Field(ge=0)
+    minimum_order: float = Field(0.0, ge=0)
+    postcodes: List[str] = []
+    polygon: Optional[List[Tuple[float, float]]] = None
+    active: bool = True
+
+class DeliveryZoneUpdate(BaseModel):
+    name: Optional[str] = None
+    fee: Optional[float] = Field(None, ge=0)
+    minimum_order: Optional[float] = Field(None, ge=0)
+    postcodes: Optional[List[str]] = None
+    polygon: Optional[List[Tuple[float, float]]] = None
+    active: Optional[bool] = None
+
+class DeliveryQuoteRequest(BaseModel):
+    delivery_address: str
+    subtotal: float = 0.0
+
+
 # Order Models
 class OrderItem(BaseModel):
     menu_item_id: str
-    quantity: int
+    quantity: int = Field(gt=0)
 
 class Order(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -249,9 +522,12 @@ class Order(BaseModel):
     subtotal: float
     tax: float
     delivery_fee: float
+    delivery_zone: Optional[str] = None
     total: float
     payment_method: str
     status: str = "Pending"  # Pending, Confirmed, Preparing, Out for Delivery, Delivered, Cancelled
+    # Portions taken from counted stock (menu_item_id -> quantity), returned if the order is cancelled
+    reserved_stock: Dict[str, int] = Field(default_factory=dict)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class OrderCreate(BaseModel):
@@ -259,11 +535,12 @@ class OrderCreate(BaseModel):
     customer_email: EmailStr
     customer_phone: str
     delivery_address: str
-    items: List[OrderItem]
-    subtotal: float
-    tax: float
-    delivery_fee: float
-    total: float
+    items: List[OrderItem] = Field(min_length=1)
+    # Ignored: prices come from the menu and the fee from the delivery zone
+    subtotal: float = 0.0
+    tax: float = 0.0
+    delivery_fee: float = 0.0
+    total: float = 0.0
     payment_method: str
     status: str = "Pending"
 
@@ -271,6 +548,202 @@ class OrderUpdate(BaseModel):
     status: Optional[str] = None
 
 
+# ============= QUERY HELPERS =============
+
+def parse_fields(fields: Optional[str], model) -> Optional[dict]:
+    """Turn ?fields=name,price into a Mongo projection restricted to the model's fields"""
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+    projection = {"_id": 0}
+    projection.update({name: 1 for name in requested})
+    return projection
+
+def parse_sort(sort: Optional[str], model) -> Optional[list]:
+    """Turn ?sort=-created_at,name into a Mongo sort spec (leading '-' means descending)"""
+    if not sort:
+        return None
+    spec = []
+    for key in sort.split(","):
+        key = key.strip()
+        if not key:
+            continue
+        direction = -1 if key.startswith("-") else 1
+        name = key.lstrip("-+ ")
+        if name not in model.model_fields:
+            raise HTTPException(status_code=400, detail=f"Cannot sort by '{name}'")
+        spec.append((name, direction))
+    return spec or None
+
+async def find_list(collection, query: dict, model, fields: Optional[str] = None, sort: Optional[str] = None,
+                    limit: Optional[int] = None, default_sort: Optional[list] = None, max_length: Optional[int] = 1000):
+    """Run a list query with projection, sort and limit pushed down to Mongo"""
+    projection = parse_fields(fields, model) or read_projection(model)
+    cursor = collection.find(query, projection)
+    sort_spec = parse_sort(sort, model) or default_sort
+    if sort_spec:
+        cursor = cursor.sort(sort_spec)
+    if limit:
+        cursor = cursor.limit(limit)
+    return await cursor.to_list(limit or max_length)
+
+def list_response(docs: list, model=None, fields: Optional[str] = None):
+    """Documents we wrote ourselves skip response_model revalidation.
+
+    find_list already projected them onto the model's fields; full documents
+    get the model's defaults filled in, partial ones (?fields=) are sent as stored.
+    """
+    if model is None or fields:
+        return FastJSONResponse(docs)
+    return Response(dump_trusted(model, docs), media_type="application/json")
+
+async def hydrate_cart(cart: dict) -> HydratedCart:
+    """Join cart lines onto the in-memory menu index and compute totals"""
+    menu = await menu_index.items(db)
+    await menu_availability.ensure_loaded(db)
+    lines = []
+    missing = []
+    for line in cart.get('items', []):
+        item = menu.get(line['menu_item_id'])
+        if item is None:
+            missing.append(line['menu_item_id'])
+            continue
+        lines.append(CartLine(
+            menu_item_id=item['id'],
+            quantity=line['quantity'],
+            name=item['name'],
+            price=item['price'],
+            category=item['category'],
+            image=item.get('image') or "",
+            available=menu_availability.is_available(item['id']),
+            line_subtotal=round(item['price'] * line['quantity'], 2),
+        ))
+
+    subtotal = round(sum(line.line_subtotal for line in lines), 2)
+    tax = round(subtotal * TAX_RATE, 2)
+    delivery_fee = DELIVERY_FEE if lines else 0.0
+    return HydratedCart(
+        id=cart['id'],
+        user_id=cart['user_id'],
+        items=lines,
+        missing_item_ids=missing,
+        item_count=sum(line.quantity for line in lines),
+        subtotal=subtotal,
+        tax=tax,
+        delivery_fee=delivery_fee,
+        total=round(subtotal + tax + delivery_fee, 2),
+        updated_at=cart['updated_at'],
+    )
+
+async def hydrate_wishlist(wishlist: dict) -> HydratedWishlist:
+    """Look wishlisted ids up in the menu index, pruning ids for deleted dishes"""
+    menu = await menu_index.items(db)
+    ids = wishlist.get('menu_item_ids', [])
+    live = [item_id for item_id in ids if item_id in menu]
+    stale = [item_id for item_id in ids if item_id not in menu]
+    if stale:
+        # $pull rather than $set so an add that raced this read is kept
+        await db.wishlists.update_one(
+            {"user_id": wishlist['user_id']},
+            {"$pull": {"menu_item_ids": {"$in": stale}}}
+        )
+    return HydratedWishlist(
+        id=wishlist['id'],
+        user_id=wishlist['user_id'],
+        menu_item_ids=live,
+        items=[menu[item_id] for item_id in live],
+        updated_at=wishlist['updated_at'],
+    )
+
+def cart_line_stage(menu_item_id: str, quantity: int) -> dict:
+    """Pipeline stage setting one cart line to an absolute quantity (0 removes it)"""
+    items = {"$ifNull": ["$items", []]}
+    # $literal keeps a client-supplied id such as "$foo" from being read as a field path
+    item_id = {"$literal": menu_item_id}
+    others = {"$filter": {"input": items, "cond": {"$ne": ["$$this.menu_item_id", item_id]}}}
+    if quantity == 0:
+        return {"$set": {"items": others}}
+
+    # Ids reaching this point were checked against the menu, so the stored value can be plain
+    line = {"menu_item_id": menu_item_id, "quantity": quantity}
+    replaced = {"$map": {"input": items, "in": {
+        "$cond": [{"$eq": ["$$this.menu_item_id", item_id]}, line, "$$this"]
+    }}}
+    return {"$set": {"items": {"$cond": [
+        {"$in": [item_id, {"$map": {"input": items, "in": "$$this.menu_item_id"}}]},
+        replaced,
+        {"$concatArrays": [items, [line]]}
+    ]}}}
+
+def cart_add_stage(menu_item_id: str, quantity: int) -> dict:
+    """Pipeline stage adding quantity to one cart line, appending the line if it isn't there yet"""
+    items = {"$ifNull": ["$items", []]}
+    item_id = {"$literal": menu_item_id}
+    added = {"$map": {"input": items, "in": {"$cond": [
+        {"$eq": ["$$this.menu_item_id", item_id]},
+        {"menu_item_id": "$$this.menu_item_id", "quantity": {"$add": ["$$this.quantity", quantity]}},
+        "$$this"
+    ]}}}
+    return {"$set": {"items": {"$cond": [
+        {"$in": [item_id, {"$map": {"input": items, "in": "$$this.menu_item_id"}}]},
+        added,
+        # Ids reaching this point were checked against the menu, so the stored value can be plain
+        {"$concatArrays": [items, [{"menu_item_id": menu_item_id, "quantity": quantity}]]}
+    ]}}}
+
+async def update_cart(user_id: str, stages: List[dict], upsert: bool) -> dict:
+    """Run cart stages as one atomic pipeline update; the unique user_id index makes the upsert create one cart"""
+    pipeline = stages + [{"$set": {
+        "id": {"$ifNull": ["$id", str(uuid.uuid4())]},
+        # The user id comes from the URL; like menu ids it mustn't be read as a field path
+        "user_id": {"$literal": user_id},
+        "updated_at": datetime.now(timezone.utc)
+    }}]
+    try:
+        cart = await db.carts.find_one_and_update(
+            {"user_id": user_id},
+            pipeline,
+            projection={"_id": 0},
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # A concurrent first add created the cart between our match and insert; it matches now
+        cart = await db.carts.find_one_and_update(
+            {"user_id": user_id},
+            pipeline,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+    if not cart:
+        cart = Cart(user_id=user_id, items=[]).model_dump()
+    return cart
+
+async def set_cart_lines(user_id: str, lines: List[CartLineUpdate]) -> dict:
+    """Apply absolute line quantities in a single atomic pipeline update, creating the cart if something is added"""
+    menu = await menu_index.items(db)
+    unknown = [line.menu_item_id for line in lines if line.quantity > 0 and line.menu_item_id not in menu]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Menu item not found: {', '.join(unknown)}")
+
+    # Removals alone have nothing to store for a user without a cart
+    adds = any(line.quantity > 0 for line in lines)
+    return await update_cart(user_id, [cart_line_stage(line.menu_item_id, line.quantity) for line in lines], adds)
+
+def menu_query(category: Optional[str], featured: Optional[bool], menu_type: Optional[str]) -> dict:
+    query = {}
+    if category:
+        query['category'] = category
+    if featured is not None:
+        query['featured'] = featured
+    if menu_type:
+        query['menu_type'] = menu_type
+    return query
+
+
 # ============= ADMIN ROUTES =============
 
 @api_router.post("/admin/login")
@@ -294,6 +767,130 @@ async def admin_login(credentials: AdminLogin):
 async def verify_admin(username: str = Depends(verify_token)):
     return {"username": username, "authenticated": True}
 
+@api_router.get("/admin/dashboard/stats")
+async def get_dashboard_stats(username: str = Depends(verify_token)):
+    """Totals, today and this-week counts and order revenue from the counter document"""
+    return await dashboard_stats.get_stats(db)
+
+def analytics_range(start: Optional[date], end: Optional[date]) -> tuple:
+    """Default to the 30 days ending today; ranges are inclusive and capped at ANALYTICS_MAX_DAYS"""
+    end = end or sales_rollups.local_day(datetime.now(timezone.utc))
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days + 1 > ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {ANALYTICS_MAX_DAYS} days")
+    return start, end
+
+@api_router.get("/admin/analytics/sales")
+async def get_sales_analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    username: str = Depends(verify_token)
+):
+    """Revenue, order count and average order value per day, from the daily rollups"""
+    start, end = analytics_range(start, end)
+    days = await sales_rollups.daily_sales(db, start, end)
+    orders = sum(day["orders"] for day in days)
+    revenue = round(sum(day["revenue"] for day in days), 2)
+    return {
+        "start": start,
+        "end": end,
+        "days": days,
+        "totals": {
+            "orders": orders,
+            "revenue": revenue,
+            "average_order_value": round(revenue / orders, 2) if orders else 0.0,
+        },
+    }
+
+@api_router.get("/admin/analytics/top-items")
+async def get_top_items(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(10, ge=1, le=100),
+    username: str = Depends(verify_token)
+):
+    """Best-selling dishes by quantity; names come from the menu index, not from orders"""
+    start, end = analytics_range(start, end)
+    totals = await sales_rollups.item_totals(db, start, end)
+    menu = await menu_index.items(db)
+    ranked = sorted(totals.items(), key=lambda entry: entry[1], reverse=True)[:limit]
+    items = []
+    for menu_item_id, quantity in ranked:
+        item = menu.get(menu_item_id, {})
+        items.append({
+            "menu_item_id": menu_item_id,
+            # Deleted dishes keep their sales history
+            "name": item.get("name", "Removed item"),
+            "category": item.get("category"),
+            "quantity": quantity,
+        })
+    return {"start": start, "end": end, "items": items}
+
+@api_router.get("/admin/analytics/hours")
+async def get_hourly_analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    username: str = Depends(verify_token)
+):
+    """Orders per hour of day across the range, and the busiest hour"""
+    start, end = analytics_range(start, end)
+    hours = await sales_rollups.hourly_orders(db, start, end)
+    busiest = max(range(24), key=lambda hour: hours[hour]) if any(hours) else None
+    return {
+        "start": start,
+        "end": end,
+        "timezone": sales_rollups.tz_name,
+        "hours": [{"hour": hour, "orders": count} for hour, count in enumerate(hours)],
+        "busiest_hour": busiest,
+    }
+
+ReportPeriod = Literal["day", "week", "month"]
+
+@api_router.get("/admin/reports/revenue")
+async def get_revenue_report(
+    period: ReportPeriod = "month",
+    periods: int = Query(12, ge=1, le=366),
+    username: str = Depends(verify_token)
+):
+    """Revenue and order count per period, compared with the period before"""
+    return await report_engine.run(db, "revenue", period=period, periods=periods)
+
+@api_router.get("/admin/reports/basket-sizes")
+async def get_basket_size_report(username: str = Depends(verify_token)):
+    """How many items orders contain, and order value percentiles"""
+    return await report_engine.run(db, "basket-sizes")
+
+@api_router.get("/admin/reports/item-mix")
+async def get_item_mix_report(
+    period: ReportPeriod = "month",
+    periods: int = Query(6, ge=1, le=52),
+    limit: int = Query(20, ge=1, le=200),
+    username: str = Depends(verify_token)
+):
+    """Each dish's quantity and share of sales per period"""
+    report = await report_engine.run(db, "item-mix", period=period, periods=periods, limit=limit)
+    menu = await menu_index.items(db)
+    items = [
+        {**item, "name": menu.get(item["menu_item_id"], {}).get("name", "Removed item")}
+        for item in report["items"]
+    ]
+    return {**report, "items": items}
+
+@api_router.get("/admin/reports/cohorts")
+async def get_cohort_report(
+    cohorts: int = Query(6, ge=1, le=24),
+    username: str = Depends(verify_token)
+):
+    """Share of each month's new customers who ordered again 1, 2, ... months later"""
+    return await report_engine.run(db, "cohorts", cohorts=cohorts)
+
+@api_router.get("/admin/forecast")
+async def get_forecast(username: str = Depends(verify_token)):
+    """Expected quantity per dish, per day and hour, for the coming week (precomputed)"""
+    return await demand_forecaster.get(db)
+
 @api_router.get("/admin/settings")
 async def get_admin_settings(username: str = Depends(verify_token)):
     settings = await db.admin_settings.find_one({"id": "settings"}, {"_id": 0})
@@ -321,8 +918,37 @@ async def update_admin_settings(settings: AdminSettings, username: str = Depends
         {"$set": settings_dict},
         upsert=True
     )
+    await cache_bus.publish("settings")
     return {"message": "Settings updated successfully"}
 
+@api_router.get("/admin/opening-hours")
+async def get_admin_opening_hours(username: str = Depends(verify_token)):
+    """Structured hours; derived from the settings strings until they are first saved here"""
+    config = await restaurant_hours.config(db)
+    return config or {"weekly": {day: [] for day in WEEKDAYS}, "overrides": [],
+                      "last_order_minutes": 0, "last_seating_minutes": 60}
+
+@api_router.put("/admin/opening-hours")
+async def update_opening_hours(hours: OpeningHoursConfig, username: str = Depends(verify_token)):
+    config = hours.model_dump()
+    try:
+        for entry in [*(r for ranges in config["weekly"].values() for r in ranges),
+                      *(r for override in config["overrides"] for r in override["ranges"])]:
+            parse_time(entry["open"])
+            parse_time(entry["close"])
+        for override in config["overrides"]:
+            date.fromisoformat(override["date"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    await db.opening_hours.update_one(
+        {"id": "hours"},
+        {"$set": {**config, "id": "hours", "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    await cache_bus.publish("opening_hours")
+    return {"message": "Opening hours updated successfully"}
+
 @api_router.post("/admin/settings/upload-logo")
 async def upload_logo(file: UploadFile = File(...), logo_type: str = "header", username: str = Depends(verify_token)):
     """Upload header or footer logo"""
@@ -368,6 +994,33 @@ async def upload_logo(file: UploadFile = File(...), logo_type: str = "header", u
 async def root():
     return {"message": "Lakeside Indian Restaurant API"}
 
+# Health Probes
+@api_router.get("/health/live")
+async def liveness():
+    """The process is up and the event loop is responsive"""
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Mongo answered and caches are warm; 503 while starting up or draining"""
+    if not lifecycle.ready:
+        status = "draining" if lifecycle.draining else "starting"
+        return JSONResponse(status_code=503, content={"status": status})
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=2)
+    except Exception as e:
+        # Probes are unauthenticated; the reason belongs in the log, not the response
+        logger.warning(f"Readiness ping failed: {str(e)}")
+        return JSONResponse(status_code=503, content={"status": "unavailable"})
+    return {"status": "ready", "in_flight": lifecycle.in_flight}
+
+@api_router.get("/opening-hours")
+async def get_opening_hours():
+    """Open now, when it closes or next opens, and the week ahead; cached until the next change"""
+    payload, valid_until = await restaurant_hours.public(db, datetime.now(timezone.utc))
+    max_age = int(max(0, min(60, valid_until - datetime.now(timezone.utc).timestamp())))
+    return FastJSONResponse(payload, headers={"Cache-Control": f"public, max-age={max_age}"})
+
 # Settings Route (Public - for getting contact info)
 @api_router.get("/settings")
 async def get_public_settings():
@@ -391,27 +1044,87 @@ async def get_public_settings():
     }
 
 # Menu Routes (Public)
+async def spliced_menu(key: tuple, load: Callable[[], Awaitable[List[Tuple[str, dict]]]],
+                       precomputed: bool = True) -> CompressedPayload:
+    """Menu list body: items encoded once per menu version, "available" spliced in per availability version"""
+    async def fragments():
+        return [(item_id, encode_fragment(doc)) for item_id, doc in await load()]
+
+    async def build():
+        return splice(await menu_fragments.get(menu_index.version, key, fragments), menu_availability.sold_out)
+
+    await menu_availability.ensure_loaded(db)
+    return await menu_responses.get((menu_index.version, menu_availability.version), key, build, precomputed)
+
 @api_router.get("/menu", response_model=List[MenuItem])
 async def get_menu_items(
+    request: Request,
     category: Optional[str] = None,
     featured: Optional[bool] = None,
-    menu_type: Optional[str] = None
+    menu_type: Optional[str] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000)
 ):
-    query = {}
-    if category:
-        query['category'] = category
-    if featured is not None:
-        query['featured'] = featured
-    if menu_type:
-        query['menu_type'] = menu_type
-    
-    menu_items = await db.menu_items.find(query, {"_id": 0}).to_list(1000)
-    
-    for item in menu_items:
-        if isinstance(item.get('created_at'), str):
-            item['created_at'] = datetime.fromisoformat(item['created_at'])
-    
-    return menu_items
+    key = ("menu", category, featured, menu_type, fields, sort, limit)
+    # Only the plain listings the site itself requests are worth the slow, small encodings
+    canonical = fields is None and sort is None and limit is None
+    requested = parse_fields(fields, MenuItem)
+    if requested is not None and "available" not in requested:
+        async def build():
+            menu_items = await find_list(
+                db.menu_items, menu_query(category, featured, menu_type), MenuItem, fields, sort, limit
+            )
+            return dumps(menu_items)
+
+        return payload_response(request, await menu_responses.get(menu_index.version, key, build, canonical))
+
+    async def load():
+        # The item id is what availability is matched on, so fetch it even if it wasn't asked for
+        menu_items = await find_list(
+            db.menu_items, menu_query(category, featured, menu_type), MenuItem, fields and f"{fields},id", sort, limit
+        )
+        if requested is None:
+            return [(item["id"], item) for item in fill_defaults(MenuItem, menu_items)]
+        return [(item["id"] if "id" in requested else item.pop("id"), item) for item in menu_items]
+
+    return payload_response(request, await spliced_menu(key, load, canonical))
+
+@api_router.get("/menu/summary", response_model=List[MenuItemSummary])
+async def get_menu_summary(
+    request: Request,
+    category: Optional[str] = None,
+    featured: Optional[bool] = None,
+    menu_type: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000)
+):
+    """Names and prices only - no descriptions or images"""
+    async def load():
+        fields = ",".join(MenuItemSummary.model_fields)
+        summaries = await find_list(
+            db.menu_items, menu_query(category, featured, menu_type), MenuItem, fields, sort, limit
+        )
+        return [(item["id"], item) for item in fill_defaults(MenuItemSummary, summaries)]
+
+    key = ("summary", category, featured, menu_type, sort, limit)
+    return payload_response(request, await spliced_menu(key, load, sort is None and limit is None))
+
+@api_router.get("/menu/availability")
+async def get_menu_availability():
+    """Ids of dishes currently sold out; everything else on the menu can be ordered"""
+    await menu_availability.ensure_loaded(db)
+    return {"sold_out": sorted(menu_availability.sold_out)}
+
+@api_router.get("/menu/availability/stream")
+async def stream_menu_availability():
+    """Server-sent events: a snapshot of sold-out ids, then "availability" events as dishes sell out or return"""
+    await menu_availability.ensure_loaded(db)
+    return StreamingResponse(
+        menu_availability.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @api_router.get("/menu/{item_id}", response_model=MenuItem)
 async def get_menu_item(item_id: str):
@@ -419,9 +1132,8 @@ async def get_menu_item(item_id: str):
     if not item:
         raise HTTPException(status_code=404, detail="Menu item not found")
     
-    if isinstance(item.get('created_at'), str):
-        item['created_at'] = datetime.fromisoformat(item['created_at'])
-    
+    await menu_availability.ensure_loaded(db)
+    item["available"] = menu_availability.is_available(item_id)
     return item
 
 @api_router.get("/categories")
@@ -437,9 +1149,10 @@ async def get_categories(menu_type: Optional[str] = None):
 async def create_menu_item(item: MenuItemCreate, username: str = Depends(verify_token)):
     menu_item = MenuItem(**item.model_dump())
     doc = menu_item.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
     await db.menu_items.insert_one(doc)
+    await dashboard_stats.record(db, "menu_items")
+    await cache_bus.publish("menu")
     return menu_item
 
 @api_router.put("/admin/menu/{item_id}")
@@ -457,6 +1170,7 @@ async def update_menu_item(item_id: str, item: MenuItemUpdate, username: str = D
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Menu item not found")
     
+    await cache_bus.publish("menu")
     return {"message": "Menu item updated successfully"}
 
 @api_router.delete("/admin/menu/{item_id}")
@@ -466,104 +1180,117 @@ async def delete_menu_item(item_id: str, username: str = Depends(verify_token)):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Menu item not found")
     
+    await dashboard_stats.record(db, "menu_items", -1)
+    await cache_bus.publish("menu")
     return {"message": "Menu item deleted successfully"}
 
+@api_router.get("/admin/availability")
+async def get_stock_levels(username: str = Depends(verify_token)):
+    """Every dish with an availability switch or stock count set"""
+    docs = await db.menu_stock.find({}, {"_id": 0}).to_list(None)
+    menu = await menu_index.items(db)
+    return [{**doc, "name": menu.get(doc["menu_item_id"], {}).get("name")} for doc in docs]
+
+@api_router.put("/admin/menu/{item_id}/availability")
+async def update_availability(item_id: str, update: AvailabilityUpdate, username: str = Depends(verify_token)):
+    changes = {key: getattr(update, key) for key in update.model_fields_set}
+    if changes.get("available", True) is None:
+        raise HTTPException(status_code=400, detail="available must be true or false")
+    if not changes:
+        raise HTTPException(status_code=400, detail="No update data provided")
+    if item_id not in await menu_index.items(db):
+        raise HTTPException(status_code=404, detail="Menu item not found")
+    
+    await menu_availability.ensure_loaded(db)
+    doc = await menu_availability.update(db, item_id, changes)
+    await cache_bus.publish("availability")
+    return doc
+
 # Cart Routes
-@api_router.get("/cart/{user_id}", response_model=Cart)
-async def get_cart(user_id: str):
+@api_router.get("/cart/{user_id}", response_model=Union[HydratedCart, Cart])
+async def get_cart(user_id: str, expand: Optional[Literal["items"]] = None):
     cart = await db.carts.find_one({"user_id": user_id}, {"_id": 0})
     if not cart:
-        cart = Cart(user_id=user_id, items=[])
-        doc = cart.model_dump()
-        doc['updated_at'] = doc['updated_at'].isoformat()
-        await db.carts.insert_one(doc)
-    else:
-        if isinstance(cart.get('updated_at'), str):
-            cart['updated_at'] = datetime.fromisoformat(cart['updated_at'])
+        # Don't persist anything until the first mutation; most visitors never add an item
+        cart = Cart(user_id=user_id, items=[]).model_dump()
     
+    if expand == "items":
+        return await hydrate_cart(cart)
     return cart
 
 @api_router.post("/cart/{user_id}/add")
 async def add_to_cart(user_id: str, item: CartItem):
-    cart = await db.carts.find_one({"user_id": user_id}, {"_id": 0})
-    
-    if not cart:
-        cart = Cart(user_id=user_id, items=[item])
-        doc = cart.model_dump()
-        doc['updated_at'] = doc['updated_at'].isoformat()
-        await db.carts.insert_one(doc)
-    else:
-        items = cart.get('items', [])
-        found = False
-        for cart_item in items:
-            if cart_item['menu_item_id'] == item.menu_item_id:
-                cart_item['quantity'] += item.quantity
-                found = True
-                break
-        
-        if not found:
-            items.append(item.model_dump())
-        
-        await db.carts.update_one(
-            {"user_id": user_id},
-            {"$set": {"items": items, "updated_at": datetime.now(timezone.utc).isoformat()}}
-        )
-    
-    return {"message": "Item added to cart"}
+    if item.menu_item_id not in await menu_index.items(db):
+        raise HTTPException(status_code=404, detail=f"Menu item not found: {item.menu_item_id}")
+    # One upsert, so two quick first adds can't each create a cart
+    cart = await update_cart(user_id, [cart_add_stage(item.menu_item_id, item.quantity)], upsert=True)
+    return {"message": "Item added to cart", "cart": await hydrate_cart(cart)}
 
 @api_router.delete("/cart/{user_id}/remove/{menu_item_id}")
 async def remove_from_cart(user_id: str, menu_item_id: str):
-    cart = await db.carts.find_one({"user_id": user_id}, {"_id": 0})
-    
-    if cart:
-        items = [item for item in cart.get('items', []) if item['menu_item_id'] != menu_item_id]
-        await db.carts.update_one(
-            {"user_id": user_id},
-            {"$set": {"items": items, "updated_at": datetime.now(timezone.utc).isoformat()}}
-        )
+    cart = await db.carts.find_one_and_update(
+        {"user_id": user_id},
+        {
+            "$pull": {"items": {"menu_item_id": menu_item_id}},
+            "$set": {"updated_at": datetime.now(timezone.utc)}
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not cart:
+        cart = Cart(user_id=user_id, items=[]).model_dump()
     
-    return {"message": "Item removed from cart"}
+    return {"message": "Item removed from cart", "cart": await hydrate_cart(cart)}
+
+@api_router.put("/cart/{user_id}/items/{menu_item_id}")
+async def set_cart_item_quantity(user_id: str, menu_item_id: str, update: CartQuantityUpdate):
+    """Set an absolute quantity for one line; 0 removes it"""
+    cart = await set_cart_lines(user_id, [CartLineUpdate(menu_item_id=menu_item_id, quantity=update.quantity)])
+    return {"message": "Cart updated", "cart": await hydrate_cart(cart)}
+
+@api_router.put("/cart/{user_id}/items")
+async def set_cart_item_quantities(user_id: str, update: CartBatchUpdate):
+    """Apply several line changes in one request and one atomic update"""
+    cart = await set_cart_lines(user_id, update.items)
+    return {"message": "Cart updated", "cart": await hydrate_cart(cart)}
 
 @api_router.delete("/cart/{user_id}/clear")
 async def clear_cart(user_id: str):
-    await db.carts.update_one(
+    cart = await db.carts.find_one_and_update(
         {"user_id": user_id},
-        {"$set": {"items": [], "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"items": [], "updated_at": datetime.now(timezone.utc)}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
-    return {"message": "Cart cleared"}
+    if not cart:
+        cart = Cart(user_id=user_id, items=[]).model_dump()
+    return {"message": "Cart cleared", "cart": await hydrate_cart(cart)}
 
 # Wishlist Routes
-@api_router.get("/wishlist/{user_id}", response_model=Wishlist)
-async def get_wishlist(user_id: str):
+@api_router.get("/wishlist/{user_id}", response_model=Union[HydratedWishlist, Wishlist])
+async def get_wishlist(user_id: str, expand: Optional[Literal["items"]] = None):
     wishlist = await db.wishlists.find_one({"user_id": user_id}, {"_id": 0})
     if not wishlist:
-        wishlist = Wishlist(user_id=user_id, menu_item_ids=[])
-        doc = wishlist.model_dump()
-        doc['updated_at'] = doc['updated_at'].isoformat()
-        await db.wishlists.insert_one(doc)
-    else:
-        if isinstance(wishlist.get('updated_at'), str):
-            wishlist['updated_at'] = datetime.fromisoformat(wishlist['updated_at'])
+        # Created by the first add, like carts
+        wishlist = Wishlist(user_id=user_id, menu_item_ids=[]).model_dump()
     
+    if expand == "items":
+        return await hydrate_wishlist(wishlist)
     return wishlist
 
 @api_router.post("/wishlist/{user_id}/add/{menu_item_id}")
 async def add_to_wishlist(user_id: str, menu_item_id: str):
-    wishlist = await db.wishlists.find_one({"user_id": user_id}, {"_id": 0})
-    
-    if not wishlist:
-        wishlist = Wishlist(user_id=user_id, menu_item_ids=[menu_item_id])
-        doc = wishlist.model_dump()
-        doc['updated_at'] = doc['updated_at'].isoformat()
-        await db.wishlists.insert_one(doc)
-    else:
-        menu_item_ids = wishlist.get('menu_item_ids', [])
-        if menu_item_id not in menu_item_ids:
-            menu_item_ids.append(menu_item_id)
-            await db.wishlists.update_one(
-                {"user_id": user_id},
-                {"$set": {"menu_item_ids": menu_item_ids, "updated_at": datetime.now(timezone.utc).isoformat()}}
-            )
+    update = {
+        "$addToSet": {"menu_item_ids": menu_item_id},
+        "$set": {"updated_at": datetime.now(timezone.utc)},
+        "$setOnInsert": {"id": str(uuid.uuid4())},
+    }
+    try:
+        # One upsert, so two quick first adds can't each create a wishlist
+        await db.wishlists.update_one({"user_id": user_id}, update, upsert=True)
+    except DuplicateKeyError:
+        # A concurrent first add created it between our match and insert; it matches now
+        await db.wishlists.update_one({"user_id": user_id}, update)
     
     return {"message": "Item added to wishlist"}
 
@@ -575,19 +1302,19 @@ async def remove_from_wishlist(user_id: str, menu_item_id: str):
         menu_item_ids = [item_id for item_id in wishlist.get('menu_item_ids', []) if item_id != menu_item_id]
         await db.wishlists.update_one(
             {"user_id": user_id},
-            {"$set": {"menu_item_ids": menu_item_ids, "updated_at": datetime.now(timezone.utc).isoformat()}}
+            {"$set": {"menu_item_ids": menu_item_ids, "updated_at": datetime.now(timezone.utc)}}
         )
     
     return {"message": "Item removed from wishlist"}
 
 # Contact Form Routes
-@api_router.post("/contact", response_model=ContactForm)
+@api_router.post("/contact", response_model=ContactForm, dependencies=[Depends(write_guard("contact", "email"))])
 async def submit_contact_form(form: ContactFormCreate):
     contact = ContactForm(**form.model_dump())
     doc = contact.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
     await db.contact_forms.insert_one(doc)
+    await dashboard_stats.record(db, "contacts", created_at=contact.created_at)
     
     # Send email notification to admin
     settings = await db.admin_settings.find_one({"id": "settings"}, {"_id": 0})
@@ -600,23 +1327,30 @@ async def submit_contact_form(form: ContactFormCreate):
     return contact
 
 @api_router.get("/admin/contacts", response_model=List[ContactForm])
-async def get_all_contacts(username: str = Depends(verify_token)):
-    contacts = await db.contact_forms.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    
-    for contact in contacts:
-        if isinstance(contact.get('created_at'), str):
-            contact['created_at'] = datetime.fromisoformat(contact['created_at'])
-    
-    return contacts
+async def get_all_contacts(
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    username: str = Depends(verify_token)
+):
+    contacts = await find_list(
+        db.contact_forms, {}, ContactForm, fields, sort, limit, default_sort=[("created_at", -1)]
+    )
+    return list_response(contacts, ContactForm, fields)
 
 # Reservation Routes
-@api_router.post("/reservation", response_model=Reservation)
+@api_router.post("/reservation", response_model=Reservation, dependencies=[Depends(write_guard("reservation", "email"))])
 async def create_reservation(reservation: ReservationCreate):
+    reason = await restaurant_hours.check_reservation(
+        db, reservation.date, reservation.time, datetime.now(timezone.utc)
+    )
+    if reason:
+        raise HTTPException(status_code=400, detail=reason)
     reservation_obj = Reservation(**reservation.model_dump())
     doc = reservation_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
     await db.reservations.insert_one(doc)
+    await dashboard_stats.record(db, "reservations", created_at=reservation_obj.created_at)
     
     # Send email notification to admin
     settings = await db.admin_settings.find_one({"id": "settings"}, {"_id": 0})
@@ -629,26 +1363,34 @@ async def create_reservation(reservation: ReservationCreate):
     return reservation_obj
 
 @api_router.get("/admin/reservations", response_model=List[Reservation])
-async def get_all_reservations(username: str = Depends(verify_token)):
-    reservations = await db.reservations.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    
-    for reservation in reservations:
-        if isinstance(reservation.get('created_at'), str):
-            reservation['created_at'] = datetime.fromisoformat(reservation['created_at'])
-    
-    return reservations
+async def get_all_reservations(
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    username: str = Depends(verify_token)
+):
+    reservations = await find_list(
+        db.reservations, {}, Reservation, fields, sort, limit, default_sort=[("created_at", -1)]
+    )
+    return list_response(reservations, Reservation, fields)
 
 # Testimonials Routes
 @api_router.get("/testimonials", response_model=List[Testimonial])
-async def get_testimonials():
-    testimonials = await db.testimonials.find({}, {"_id": 0}).to_list(100)
-    return testimonials
+async def get_testimonials(
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100)
+):
+    testimonials = await find_list(db.testimonials, {}, Testimonial, fields, sort, limit, max_length=100)
+    return list_response(testimonials, Testimonial, fields)
 
 @api_router.post("/admin/testimonials", response_model=Testimonial)
 async def create_testimonial(testimonial: TestimonialCreate, username: str = Depends(verify_token)):
     testimonial_obj = Testimonial(**testimonial.model_dump())
     doc = testimonial_obj.model_dump()
     await db.testimonials.insert_one(doc)
+    await dashboard_stats.record(db, "testimonials")
+    await cache_bus.publish("testimonials")
     return testimonial_obj
 
 @api_router.put("/admin/testimonials/{testimonial_id}")
@@ -662,6 +1404,7 @@ async def update_testimonial(testimonial_id: str, testimonial: TestimonialCreate
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Testimonial not found")
     
+    await cache_bus.publish("testimonials")
     return {"message": "Testimonial updated successfully"}
 
 @api_router.delete("/admin/testimonials/{testimonial_id}")
@@ -671,19 +1414,26 @@ async def delete_testimonial(testimonial_id: str, username: str = Depends(verify
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Testimonial not found")
     
+    await dashboard_stats.record(db, "testimonials", -1)
+    await cache_bus.publish("testimonials")
     return {"message": "Testimonial deleted successfully"}
 
 # Gallery Routes
 @api_router.get("/gallery", response_model=List[GalleryImage])
-async def get_gallery_images():
-    images = await db.gallery_images.find({}, {"_id": 0}).to_list(100)
-    return images
+async def get_gallery_images(
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100)
+):
+    images = await find_list(db.gallery_images, {}, GalleryImage, fields, sort, limit, max_length=100)
+    return list_response(images, GalleryImage, fields)
 
 @api_router.post("/admin/gallery", response_model=GalleryImage)
 async def create_gallery_image(image: GalleryImageCreate, username: str = Depends(verify_token)):
     gallery_image = GalleryImage(**image.model_dump())
     doc = gallery_image.model_dump()
     await db.gallery_images.insert_one(doc)
+    await cache_bus.publish("gallery")
     return gallery_image
 
 @api_router.delete("/admin/gallery/{image_id}")
@@ -693,6 +1443,7 @@ async def delete_gallery_image(image_id: str, username: str = Depends(verify_tok
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Gallery image not found")
     
+    await cache_bus.publish("gallery")
     return {"message": "Gallery image deleted successfully"}
 
 @api_router.post("/admin/gallery/upload")
@@ -770,33 +1521,36 @@ async def get_statistics():
 
 # Banner Routes (Public)
 @api_router.get("/banners", response_model=List[Banner])
-async def get_banners():
-    banners = await db.banners.find({"active": True}, {"_id": 0}).sort("order", 1).to_list(100)
-    
-    for banner in banners:
-        if isinstance(banner.get('created_at'), str):
-            banner['created_at'] = datetime.fromisoformat(banner['created_at'])
-    
-    return banners
+async def get_banners(
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100)
+):
+    banners = await find_list(
+        db.banners, {"active": True}, Banner, fields, sort, limit, default_sort=[("order", 1)], max_length=100
+    )
+    return list_response(banners, Banner, fields)
 
 # Banner Routes (Admin)
 @api_router.get("/admin/banners", response_model=List[Banner])
-async def get_all_banners(username: str = Depends(verify_token)):
-    banners = await db.banners.find({}, {"_id": 0}).sort("order", 1).to_list(100)
-    
-    for banner in banners:
-        if isinstance(banner.get('created_at'), str):
-            banner['created_at'] = datetime.fromisoformat(banner['created_at'])
-    
-    return banners
+async def get_all_banners(
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    username: str = Depends(verify_token)
+):
+    banners = await find_list(
+        db.banners, {}, Banner, fields, sort, limit, default_sort=[("order", 1)], max_length=100
+    )
+    return list_response(banners, Banner, fields)
 
 @api_router.post("/admin/banners", response_model=Banner)
 async def create_banner(banner: BannerCreate, username: str = Depends(verify_token)):
     banner_obj = Banner(**banner.model_dump())
     doc = banner_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
     await db.banners.insert_one(doc)
+    await cache_bus.publish("banners")
     return banner_obj
 
 @api_router.put("/admin/banners/{banner_id}")
@@ -814,6 +1568,7 @@ async def update_banner(banner_id: str, banner: BannerUpdate, username: str = De
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Banner not found")
     
+    await cache_bus.publish("banners")
     return {"message": "Banner updated successfully"}
 
 @api_router.delete("/admin/banners/{banner_id}")
@@ -823,6 +1578,7 @@ async def delete_banner(banner_id: str, username: str = Depends(verify_token)):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Banner not found")
     
+    await cache_bus.publish("banners")
     return {"message": "Banner deleted successfully"}
 
 @api_router.post("/admin/banners/upload")
@@ -859,12 +1615,88 @@ async def upload_banner_image(file: UploadFile = File(...), username: str = Depe
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
 
 
+# Home Page Bundle (Public)
+HOME_FEATURED_LIMIT = 6
+HOME_GALLERY_LIMIT = 6
+
+async def build_home_payload() -> dict:
+    """Everything the home page, header and footer render, in one document"""
+    menu = await menu_index.items(db)
+    await menu_availability.ensure_loaded(db)
+    featured = [item for item in menu.values() if item.get("menu_type") == "dine-in"][:HOME_FEATURED_LIMIT]
+    featured = [{**item, "available": menu_availability.is_available(item["id"])} for item in featured]
+    banners = await db.banners.find({"active": True}, {"_id": 0}).sort("order", 1).to_list(100)
+    testimonials = await db.testimonials.find({}, {"_id": 0}).to_list(100)
+    gallery = await db.gallery_images.find({}, {"_id": 0}).to_list(HOME_GALLERY_LIMIT)
+    return {
+        "banners": construct_all(Banner, banners),
+        "featured_items": construct_all(MenuItem, featured),
+        "testimonials": construct_all(Testimonial, testimonials),
+        "gallery": construct_all(GalleryImage, gallery),
+        "statistics": await get_statistics(),
+        "settings": await get_public_settings(),
+    }
+
+home_bundle = HomeBundle(build_home_payload)
+for topic in ("menu", "settings", "banners", "testimonials", "gallery"):
+    cache_bus.subscribe(topic, home_bundle.invalidate)
+menu_availability.on_change(home_bundle.invalidate)
+
+@api_router.get("/home")
+async def get_home(request: Request):
+    # Admin edits must show up immediately, so clients always revalidate; the ETag makes that a 304
+    return payload_response(request, await home_bundle.get())
+
+
 # ============= ORDER ROUTES =============
 
-@api_router.post("/orders")
+async def reserve_portions(lines: Iterable[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """Take counted stock for an order's (menu_item_id, quantity) lines; 409 naming the dish that is short"""
+    quantities: Dict[str, int] = {}
+    for menu_item_id, quantity in lines:
+        quantities[menu_item_id] = quantities.get(menu_item_id, 0) + quantity
+    await menu_availability.ensure_loaded(db)
+    try:
+        return await menu_availability.reserve(db, quantities)
+    except SoldOut as e:
+        name = (await menu_index.items(db)).get(e.menu_item_id, {}).get("name", "one of the dishes")
+        raise HTTPException(status_code=409, detail=f"Sorry, there isn't enough {name} left for this order")
+
+@api_router.post("/orders", dependencies=[Depends(write_guard("orders", "customer_email"))])
 async def create_order(order_data: OrderCreate):
     """Create a new order"""
     try:
+        # 400 is kept for problems with the delivery address; the rest of the order's refusals are 409
+        reason = await restaurant_hours.check_order(db, datetime.now(timezone.utc))
+        if reason:
+            raise HTTPException(status_code=409, detail=reason)
+        
+        # Prices come from the menu and the fee from the zone the address falls in, whatever the browser sent
+        menu = await menu_index.items(db)
+        unknown = [item.menu_item_id for item in order_data.items if item.menu_item_id not in menu]
+        if unknown:
+            raise HTTPException(status_code=409, detail="Some dishes in your order are no longer on the menu")
+        item_details = [
+            {
+                "name": menu[item.menu_item_id]['name'],
+                "quantity": item.quantity,
+                "price": menu[item.menu_item_id]['price'],
+                "subtotal": round(menu[item.menu_item_id]['price'] * item.quantity, 2),
+            }
+            for item in order_data.items
+        ]
+        subtotal = round(sum(line["subtotal"] for line in item_details), 2)
+        tax = round(subtotal * TAX_RATE, 2)
+        
+        quote = await delivery_zones.quote(db, order_data.delivery_address, subtotal)
+        if not quote["deliverable"]:
+            raise HTTPException(status_code=400, detail=quote["reason"])
+        delivery_fee = quote["fee"]
+        total = round(subtotal + tax + delivery_fee, 2)
+        
+        # Take the portions now, so two orders can't both get the last one
+        taken = await reserve_portions((item.menu_item_id, item.quantity) for item in order_data.items)
+        
         # Generate order ID
         order_id = f"ORD-{str(uuid.uuid4())[:8].upper()}"
         
@@ -876,37 +1708,31 @@ async def create_order(order_data: OrderCreate):
             customer_phone=order_data.customer_phone,
             delivery_address=order_data.delivery_address,
             items=order_data.items,
-            subtotal=order_data.subtotal,
-            tax=order_data.tax,
-            delivery_fee=order_data.delivery_fee,
-            total=order_data.total,
+            subtotal=subtotal,
+            tax=tax,
+            delivery_fee=delivery_fee,
+            delivery_zone=quote["zone"],
+            total=total,
             payment_method=order_data.payment_method,
             status=order_data.status,
+            reserved_stock=dict(taken),
             created_at=datetime.now(timezone.utc)
         )
         
-        # Prepare for MongoDB (convert datetime to ISO string)
         order_dict = order.model_dump()
-        order_dict['created_at'] = order_dict['created_at'].isoformat()
         
         # Insert into database
-        await db.orders.insert_one(order_dict)
-        
-        # Fetch menu items for order details
-        menu_item_ids = [item.menu_item_id for item in order_data.items]
-        menu_items = await db.menu_items.find({"id": {"$in": menu_item_ids}}, {"_id": 0}).to_list(length=None)
-        
-        # Create item details for email
-        item_details = []
-        for item in order_data.items:
-            menu_item = next((m for m in menu_items if m['id'] == item.menu_item_id), None)
-            if menu_item:
-                item_details.append({
-                    "name": menu_item['name'],
-                    "quantity": item.quantity,
-                    "price": menu_item['price'],
-                    "subtotal": menu_item['price'] * item.quantity
-                })
+        try:
+            await db.orders.insert_one(order_dict)
+        except Exception:
+            await menu_availability.release(db, taken)
+            raise
+        if taken:
+            await cache_bus.publish("availability")
+        await dashboard_stats.record(db, "orders", created_at=order.created_at, revenue=order.total)
+        await sales_rollups.record_order(db, order_dict)
+        if await kitchen_queue.add_order(db, order_dict, menu):
+            await cache_bus.publish("kitchen")
         
         # Send confirmation email to customer
         try:
@@ -915,10 +1741,10 @@ async def create_order(order_data: OrderCreate):
                 customer_name=order_data.customer_name,
                 order_id=order_id,
                 items=item_details,
-                subtotal=order_data.subtotal,
-                tax=order_data.tax,
-                delivery_fee=order_data.delivery_fee,
-                total=order_data.total,
+                subtotal=subtotal,
+                tax=tax,
+                delivery_fee=delivery_fee,
+                total=total,
                 delivery_address=order_data.delivery_address,
                 payment_method=order_data.payment_method
             )
@@ -936,7 +1762,7 @@ async def create_order(order_data: OrderCreate):
                     customer_name=order_data.customer_name,
                     customer_phone=order_data.customer_phone,
                     items=item_details,
-                    total=order_data.total,
+                    total=total,
                     delivery_address=order_data.delivery_address
                 )
         except Exception as e:
@@ -945,24 +1771,43 @@ async def create_order(order_data: OrderCreate):
         return {
             "message": "Order placed successfully",
             "order_id": order_id,
+            "subtotal": subtotal,
+            "tax": tax,
+            "delivery_fee": delivery_fee,
+            "total": total,
             "status": "success"
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating order: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error creating order: {str(e)}")
 
 
+@api_router.post("/delivery/quote")
+async def quote_delivery(request: DeliveryQuoteRequest):
+    """Delivery fee and minimum order for an address, as create_order will charge them"""
+    return await delivery_zones.quote(db, request.delivery_address, request.subtotal)
+
+
 @api_router.get("/orders", dependencies=[Depends(verify_token)])
-async def get_orders():
+async def get_orders(
+    status: Optional[str] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000)
+):
     """Get all orders (Admin only)"""
     try:
-        orders = await db.orders.find({}, {"_id": 0}).to_list(length=None)
-        
-        # Sort by created_at descending (newest first)
-        orders.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        
-        return orders
+        query = {"status": status} if status else {}
+        # Newest first by default, served from the created_at index
+        orders = await find_list(
+            db.orders, query, Order, fields, sort, limit, default_sort=[("created_at", -1)], max_length=None
+        )
+        return list_response(orders)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching orders: {str(e)}")
 
@@ -974,7 +1819,7 @@ async def get_order(order_id: str):
         order = await db.orders.find_one({"order_id": order_id}, {"_id": 0})
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
-        return order
+        return FastJSONResponse(order)
     except HTTPException:
         raise
     except Exception as e:
@@ -990,13 +1835,56 @@ async def update_order_status(order_id: str, order_update: OrderUpdate):
         if not update_data:
             raise HTTPException(status_code=400, detail="No fields to update")
         
-        result = await db.orders.update_one(
-            {"order_id": order_id},
-            {"$set": update_data}
+        query = {"order_id": order_id}
+        update = {"$set": update_data}
+        taken: List[Tuple[str, int]] = []
+        if update_data.get("status") == "Cancelled":
+            # Cleared in the same write, so cancelling twice can't return the stock twice
+            update["$unset"] = {"reserved_stock": ""}
+        elif "status" in update_data:
+            current = await db.orders.find_one({"order_id": order_id}, {"_id": 0, "status": 1, "items": 1})
+            if current is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+            if current.get("status") == "Cancelled":
+                # Restoring a cancelled order takes its portions again, or is refused if they're gone
+                taken = await reserve_portions((item["menu_item_id"], item["quantity"]) for item in current["items"])
+                update["$set"] = {**update_data, "reserved_stock": dict(taken)}
+                query["status"] = "Cancelled"
+        
+        previous = await db.orders.find_one_and_update(
+            query,
+            update,
+            projection={"_id": 0, "status": 1, "created_at": 1, "total": 1, "reserved_stock": 1}
         )
         
-        if result.matched_count == 0:
+        if previous is None:
+            if taken:
+                await menu_availability.release(db, taken)
+            if "status" in query:
+                raise HTTPException(status_code=409, detail="The order changed while updating it; please try again")
             raise HTTPException(status_code=404, detail="Order not found")
+        if taken:
+            await cache_bus.publish("availability")
+        
+        # Cancelling (or restoring) an order takes it out of (or puts it back into) its day's rollup
+        # and the dashboard revenue
+        excluded = analytics.EXCLUDED_STATUSES
+        if "status" in update_data and (previous.get("status") in excluded) != (update_data["status"] in excluded):
+            await sales_rollups.rollup_day(db, sales_rollups.local_day(previous["created_at"]))
+            revenue = previous.get("total", 0.0)
+            await dashboard_stats.record(
+                db, "orders", 0, created_at=previous["created_at"],
+                revenue=-revenue if update_data["status"] in excluded else revenue
+            )
+        
+        # A cancelled order comes off the kitchen screens
+        if update_data.get("status") == "Cancelled" and await kitchen_queue.void_order(db, order_id):
+            await cache_bus.publish("kitchen")
+        
+        # ...and its portions go back into stock
+        if update_data.get("status") == "Cancelled" and previous.get("reserved_stock"):
+            await menu_availability.release(db, previous["reserved_stock"].items())
+            await cache_bus.publish("availability")
         
         return {"message": "Order updated successfully"}
     except HTTPException:
@@ -1005,6 +1893,118 @@ async def update_order_status(order_id: str, order_update: OrderUpdate):
         raise HTTPException(status_code=500, detail=f"Error updating order: {str(e)}")
 
 
+# ============= DELIVERY ZONE ROUTES =============
+
+def check_zone_shape(postcodes: Optional[List[str]], polygon: Optional[List[Tuple[float, float]]]):
+    if polygon is not None and len(polygon) < 3:
+        raise HTTPException(status_code=400, detail="A zone polygon needs at least 3 points")
+    if postcodes is not None and not all(len(p) == 4 and p.isdigit() for p in postcodes):
+        raise HTTPException(status_code=400, detail="Postcodes must be 4 digits")
+
+@api_router.get("/admin/delivery-zones", response_model=List[DeliveryZone])
+async def get_delivery_zones(username: str = Depends(verify_token)):
+    zones = await db.delivery_zones.find({}, {"_id": 0}).sort("fee", 1).to_list(None)
+    return list_response(zones, DeliveryZone)
+
+@api_router.post("/admin/delivery-zones", response_model=DeliveryZone)
+async def create_delivery_zone(zone: DeliveryZoneCreate, username: str = Depends(verify_token)):
+    check_zone_shape(zone.postcodes, zone.polygon)
+    if not zone.postcodes and not zone.polygon:
+        raise HTTPException(status_code=400, detail="A zone needs postcodes or a polygon")
+    zone_obj = DeliveryZone(**zone.model_dump())
+    
+    await db.delivery_zones.insert_one(zone_obj.model_dump())
+    await cache_bus.publish("delivery_zones")
+    return zone_obj
+
+@api_router.put("/admin/delivery-zones/{zone_id}")
+async def update_delivery_zone(zone_id: str, zone: DeliveryZoneUpdate, username: str = Depends(verify_token)):
+    update_data = {k: v for k, v in zone.model_dump().items() if v is not None}
+    
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No update data provided")
+    check_zone_shape(update_data.get("postcodes"), update_data.get("polygon"))
+    
+    result = await db.delivery_zones.update_one({"id": zone_id}, {"$set": update_data})
+    
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Delivery zone not found")
+    
+    await cache_bus.publish("delivery_zones")
+    return {"message": "Delivery zone updated successfully"}
+
+@api_router.delete("/admin/delivery-zones/{zone_id}")
+async def delete_delivery_zone(zone_id: str, username: str = Depends(verify_token)):
+    result = await db.delivery_zones.delete_one({"id": zone_id})
+    
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Delivery zone not found")
+    
+    await cache_bus.publish("delivery_zones")
+    return {"message": "Delivery zone deleted successfully"}
+
+
+# ============= KITCHEN DISPLAY ROUTES =============
+
+def kitchen_station(station: str) -> str:
+    if station not in kitchen.STATIONS:
+        raise HTTPException(status_code=404, detail="Unknown station")
+    return station
+
+@api_router.get("/kitchen/stations", dependencies=[Depends(verify_token)])
+async def get_kitchen_stations():
+    """Stations with their open ticket counts and the categories routed to them"""
+    await kitchen_queue.ensure_loaded(db)
+    return [
+        {
+            "station": station,
+            "open_tickets": len(kitchen_queue.open_tickets(station)),
+            "categories": sorted(c for c, s in kitchen_queue.routes.items() if s == station),
+        }
+        for station in kitchen.STATIONS
+    ]
+
+@api_router.get("/kitchen/stations/{station}/tickets", dependencies=[Depends(verify_token)])
+async def get_kitchen_tickets(station: str = Depends(kitchen_station)):
+    """Open tickets for a station, in the order they should be cooked"""
+    await kitchen_queue.ensure_loaded(db)
+    return FastJSONResponse(kitchen_queue.open_tickets(station))
+
+@api_router.post("/kitchen/stream-token")
+async def issue_stream_token(username: str = Depends(verify_token)):
+    """A short-lived token for ?token= on the stream endpoints, which EventSource can't send headers to"""
+    return {"token": create_stream_token(username), "expires_in": STREAM_TOKEN_EXPIRE_SECONDS}
+
+@api_router.get("/kitchen/stations/{station}/stream", dependencies=[Depends(verify_stream_token)])
+async def stream_kitchen_tickets(station: str = Depends(kitchen_station)):
+    """Server-sent events for a station screen; pass a token from /kitchen/stream-token as ?token= from EventSource"""
+    await kitchen_queue.ensure_loaded(db)
+    return StreamingResponse(
+        kitchen_queue.stream(station),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.post("/kitchen/tickets/{ticket_id}/bump", dependencies=[Depends(verify_token)])
+async def bump_kitchen_ticket(ticket_id: str):
+    await kitchen_queue.ensure_loaded(db)
+    ticket = await kitchen_queue.bump(db, ticket_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Open ticket not found")
+    await cache_bus.publish("kitchen")
+    return FastJSONResponse(ticket)
+
+@api_router.post("/kitchen/stations/{station}/recall", dependencies=[Depends(verify_token)])
+async def recall_kitchen_ticket(station: str = Depends(kitchen_station), ticket_id: Optional[str] = None):
+    """Reopen the station's most recently bumped ticket, or ?ticket_id= a specific one"""
+    await kitchen_queue.ensure_loaded(db)
+    ticket = await kitchen_queue.recall(db, station, ticket_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="No bumped ticket to recall")
+    await cache_bus.publish("kitchen")
+    return FastJSONResponse(ticket)
+
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -1016,13 +2016,118 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+app.add_middleware(CompressionMiddleware)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+app.add_middleware(DrainMiddleware, lifecycle=lifecycle, exempt_prefix="/api/health")
+
+# Added last so it wraps every other middleware and times the full request
+app.add_middleware(PrometheusMiddleware)
+
+# Bearer token Prometheus scrapes /metrics with, since it can't renew a 24-hour admin token.
+# Unset, only admin tokens are accepted
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+def verify_metrics_scraper(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """verify_token for /metrics, also accepting METRICS_TOKEN"""
+    if METRICS_TOKEN and hmac.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        return "prometheus"
+    return username_from_token(credentials.credentials)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(scraper: str = Depends(verify_metrics_scraper)):
+    """Prometheus scrape endpoint; route names, latencies and Mongo collections aren't for the public"""
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
+
+async def ensure_ttl_index(collection, field: str, expire_after_seconds: int):
+    """Create a TTL index, or retune it in place if CART_TTL_DAYS has changed"""
+    try:
+        await collection.create_index(field, expireAfterSeconds=expire_after_seconds)
+    except OperationFailure as e:
+        if e.code not in (85, 86):  # IndexOptionsConflict / IndexKeySpecsConflict
+            raise
+        await db.command(
+            "collMod", collection.name,
+            index={"keyPattern": {field: 1}, "expireAfterSeconds": expire_after_seconds}
+        )
+
+async def ensure_unique_user_index(collection):
+    """One cart/wishlist per user, merging any duplicates made before the index was unique"""
+    try:
+        await collection.create_index("user_id", unique=True)
+    except OperationFailure as e:
+        if e.code in (85, 86):  # the old non-unique index
+            await collection.drop_index("user_id_1")
+        elif e.code != 11000:  # duplicate key
+            raise
+        await cart_compaction.merge_duplicates(db, collection.name)
+        await collection.create_index("user_id", unique=True)
+
+async def ensure_indexes():
+    """Indexes backing the date-sorted admin listings and per-user lookups"""
+    try:
+        await db.contact_forms.create_index([("created_at", -1)])
+        await db.reservations.create_index([("created_at", -1)])
+        await db.orders.create_index([("created_at", -1)])
+        await db.orders.create_index("order_id")
+        await db.menu_items.create_index("id")
+        # Lets distinct("category") on /categories run as an index scan
+        await db.menu_items.create_index([("menu_type", 1), ("category", 1)])
+        await db.menu_items.create_index("category")
+        await db.banners.create_index([("active", 1), ("order", 1)])
+        await ensure_unique_user_index(db.carts)
+        await ensure_unique_user_index(db.wishlists)
+        await ensure_ttl_index(db.carts, "updated_at", int(CART_TTL_DAYS * 86400))
+        await ensure_ttl_index(db.wishlists, "updated_at", int(CART_TTL_DAYS * 86400))
+        await sales_rollups.ensure_indexes(db)
+        await kitchen_queue.ensure_indexes(db)
+        await menu_availability.ensure_indexes(db)
+        await ensure_ttl_index(db[kitchen.COLLECTION], "closed_at", int(KITCHEN_TICKET_RETENTION_DAYS * 86400))
+    except Exception as e:
+        logger.error(f"Failed to create indexes: {str(e)}")
+
+async def wait_for_mongo():
+    """Ping until the primary answers, backing off up to 10s between attempts"""
+    delay = 0.5
+    while True:
+        try:
+            await db.command("ping")
+            return
+        except Exception as e:
+            logger.warning(f"MongoDB not reachable yet ({str(e)}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10)
+
+async def warm_caches():
+    """Load the menu index, availability, home bundle (banners, settings, statistics), open kitchen tickets and delivery zones before taking traffic"""
+    await menu_index.items(db)
+    await menu_availability.load(db)
+    await home_bundle.get()
+    await kitchen_queue.load(db)
+    await delivery_zones.index(db)
+
+async def bootstrap():
+    await wait_for_mongo()
+    try:
+        await cache_bus.start(db)
+    except Exception as e:
+        # Without the bus this worker would serve stale caches, so never report ready
+        logger.error(f"Cache invalidation bus failed to start: {str(e)}")
+        raise
+    await ensure_indexes()
+    if isinstance(write_guard.store, MongoBucketStore):
+        await write_guard.store.ensure_indexes()
+    try:
+        await warm_caches()
+    except Exception as e:
+        # Cold caches only cost latency; they fill on first use
+        logger.error(f"Cache warmup failed: {str(e)}")
+    app.state.background_tasks += [
+        asyncio.create_task(dashboard_stats.reconcile_periodically(db, DASHBOARD_RECONCILE_SECONDS)),
+        asyncio.create_task(cart_compaction.compact_periodically(
+            db, CART_COMPACTION_INTERVAL_SECONDS, CART_TTL_DAYS
+        )),
+        asyncio.create_task(sales_rollups.refresh_periodically(db, ANALYTICS_REFRESH_SECONDS)),
+        asyncio.create_task(demand_forecaster.refresh_periodically(db, FORECAST_REFRESH_SECONDS)),
+    ]
+    lifecycle.ready = True
+    logger.info("Startup complete; ready for traffic")
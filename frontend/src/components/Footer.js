@@ -1,10 +1,9 @@
 import { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { Facebook, Instagram, Phone, Mail, MapPin } from 'lucide-react';
-import axios from 'axios';
+import { fetchSiteSettings } from '@/lib/siteData';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
 const DEFAULT_LOGO = 'https://customer-assets.emergentagent.com/job_spice-harbor-1/artifacts/j7td7vej_WhatsApp_Image_2025-10-21_at_11.56.02__1_-removebg-preview.png';
 
 const Footer = () => {
@@ -16,11 +15,11 @@ const Footer = () => {
 
   const fetchSettings = async () => {
     try {
-      const response = await axios.get(`${API}/settings`);
-      if (response.data.footer_logo) {
-        const logoUrl = response.data.footer_logo.startsWith('http') 
-          ? response.data.footer_logo 
-          : `${BACKEND_URL}${response.data.footer_logo.startsWith('/api/') ? response.data.footer_logo : '/api' + response.data.footer_logo}`;
+      const settings = await fetchSiteSettings();
+      if (settings.footer_logo) {
+        const logoUrl = settings.footer_logo.startsWith('http') 
+          ? settings.footer_logo 
+          : `${BACKEND_URL}${settings.footer_logo.startsWith('/api/') ? settings.footer_logo : '/api' + settings.footer_logo}`;
         setFooterLogo(logoUrl);
       }
     } catch (error) {
@@ -3,10 +3,9 @@ import { Link, useLocation } from 'react-router-dom';
 import { ShoppingCart, Heart, Menu, X } from 'lucide-react';
 import { useCart } from '@/context/CartContext';
 import { useWishlist } from '@/context/WishlistContext';
-import axios from 'axios';
+import { fetchSiteSettings } from '@/lib/siteData';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
 const DEFAULT_LOGO = 'https://customer-assets.emergentagent.com/job_spice-harbor-1/artifacts/j7td7vej_WhatsApp_Image_2025-10-21_at_11.56.02__1_-removebg-preview.png';
 
 const Header = () => {
@@ -22,11 +21,11 @@ const Header = () => {
 
   const fetchSettings = async () => {
     try {
-      const response = await axios.get(`${API}/settings`);
-      if (response.data.header_logo) {
-        const logoUrl = response.data.header_logo.startsWith('http') 
-          ? response.data.header_logo 
-          : `${BACKEND_URL}${response.data.header_logo.startsWith('/api/') ? response.data.header_logo : '/api' + response.data.header_logo}`;
+      const settings = await fetchSiteSettings();
+      if (settings.header_logo) {
+        const logoUrl = settings.header_logo.startsWith('http') 
+          ? settings.header_logo 
+          : `${BACKEND_URL}${settings.header_logo.startsWith('/api/') ? settings.header_logo : '/api' + settings.header_logo}`;
         setHeaderLogo(logoUrl);
       }
     } catch (error) {
@@ -14,12 +14,13 @@ if (!USER_ID) {
 }
 
 export const CartProvider = ({ children }) => {
-  const [cart, setCart] = useState({ items: [] });
+  const [cart, setCart] = useState({ items: [], subtotal: 0, tax: 0, delivery_fee: 0, total: 0 });
   const [loading, setLoading] = useState(false);
 
   const fetchCart = async () => {
     try {
-      const response = await axios.get(`${API}/cart/${USER_ID}`);
+      // expand=items returns priced lines and totals, so pages never need the full menu
+      const response = await axios.get(`${API}/cart/${USER_ID}`, { params: { expand: 'items' } });
       setCart(response.data);
     } catch (error) {
       console.error('Error fetching cart:', error);
@@ -33,11 +34,11 @@ export const CartProvider = ({ children }) => {
   const addToCart = async (menuItemId, quantity = 1) => {
     setLoading(true);
     try {
-      await axios.post(`${API}/cart/${USER_ID}/add`, {
+      const response = await axios.post(`${API}/cart/${USER_ID}/add`, {
         menu_item_id: menuItemId,
         quantity: quantity
       });
-      await fetchCart();
+      setCart(response.data.cart);
     } catch (error) {
       console.error('Error adding to cart:', error);
     }
@@ -47,8 +48,8 @@ export const CartProvider = ({ children }) => {
   const removeFromCart = async (menuItemId) => {
     setLoading(true);
     try {
-      await axios.delete(`${API}/cart/${USER_ID}/remove/${menuItemId}`);
-      await fetchCart();
+      const response = await axios.delete(`${API}/cart/${USER_ID}/remove/${menuItemId}`);
+      setCart(response.data.cart);
     } catch (error) {
       console.error('Error removing from cart:', error);
     }
@@ -58,8 +59,8 @@ export const CartProvider = ({ children }) => {
   const clearCart = async () => {
     setLoading(true);
     try {
-      await axios.delete(`${API}/cart/${USER_ID}/clear`);
-      await fetchCart();
+      const response = await axios.delete(`${API}/cart/${USER_ID}/clear`);
+      setCart(response.data.cart);
     } catch (error) {
       console.error('Error clearing cart:', error);
     }
@@ -75,18 +76,11 @@ export const CartProvider = ({ children }) => {
     
     setLoading(true);
     try {
-      // Remove the item first
-      await axios.delete(`${API}/cart/${USER_ID}/remove/${menuItemId}`);
-      
-      // Add it back with new quantity if greater than 0
-      if (newQuantity > 0) {
-        await axios.post(`${API}/cart/${USER_ID}/add`, {
-          menu_item_id: menuItemId,
-          quantity: newQuantity
-        });
-      }
-      
-      await fetchCart();
+      // One atomic server-side update instead of remove + re-add
+      const response = await axios.put(`${API}/cart/${USER_ID}/items/${menuItemId}`, {
+        quantity: newQuantity
+      });
+      setCart(response.data.cart);
     } catch (error) {
       console.error('Error updating quantity:', error);
     }
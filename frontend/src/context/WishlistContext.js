@@ -14,10 +14,11 @@ export const WishlistProvider = ({ children }) => {
 
   const fetchWishlist = async () => {
     try {
-      const response = await axios.get(`${API}/wishlist/${USER_ID}`);
+      const response = await axios.get(`${API}/wishlist/${USER_ID}`, { params: { expand: 'items' } });
       setWishlist(response.data);
     } catch (error) {
       console.error('Error fetching wishlist:', error);
+      setWishlist((current) => ({ ...current, items: current.items || [] }));
     }
   };
 
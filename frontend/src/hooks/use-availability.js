@@ -0,0 +1,29 @@
+import { useState, useEffect } from 'react';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+
+// Whether a dish can be ordered, kept current while the page is open.
+// Until the stream's snapshot arrives, the menu response's `available` flag is used.
+const useAvailability = () => {
+  const [soldOut, setSoldOut] = useState(null);
+
+  useEffect(() => {
+    // Dishes selling out (or coming back) while the page is open
+    const events = new EventSource(`${API}/menu/availability/stream`);
+    events.addEventListener('snapshot', (e) => setSoldOut(new Set(JSON.parse(e.data).sold_out)));
+    events.addEventListener('availability', (e) => {
+      const { menu_item_id, available } = JSON.parse(e.data);
+      setSoldOut((current) => {
+        const next = new Set(current || []);
+        if (available) next.delete(menu_item_id); else next.add(menu_item_id);
+        return next;
+      });
+    });
+    return () => events.close();
+  }, []);
+
+  return (item) => (soldOut ? !soldOut.has(item.id) : item.available !== false);
+};
+
+export default useAvailability;
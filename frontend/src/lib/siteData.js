@@ -0,0 +1,29 @@
+import axios from 'axios';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+
+// One in-flight request per resource, shared by every component on the page
+let homePromise = null;
+let settingsPromise = null;
+
+export function fetchHomeBundle() {
+  if (!homePromise) {
+    homePromise = axios.get(`${API}/home`).then((response) => response.data);
+    // Let the next page visit refetch (the ETag makes that cheap) instead of caching a failure
+    homePromise.finally(() => { homePromise = null; }).catch(() => {});
+  }
+  return homePromise;
+}
+
+export function fetchSiteSettings() {
+  // On the home page the bundle already carries the settings, so don't ask twice
+  if (window.location.pathname === '/') {
+    return fetchHomeBundle().then((bundle) => bundle.settings);
+  }
+  if (!settingsPromise) {
+    settingsPromise = axios.get(`${API}/settings`).then((response) => response.data);
+    settingsPromise.catch(() => { settingsPromise = null; });
+  }
+  return settingsPromise;
+}
@@ -1,61 +1,10 @@
-import { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { Trash2, ShoppingBag, Plus, Minus } from 'lucide-react';
-import axios from 'axios';
 import { useCart } from '@/context/CartContext';
 
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
-
 const Cart = () => {
   const { cart, removeFromCart, clearCart, updateQuantity } = useCart();
   const navigate = useNavigate();
-  const [menuItems, setMenuItems] = useState([]);
-  const [loading, setLoading] = useState(true);
-
-  useEffect(() => {
-    fetchMenuItems();
-  }, [cart.items.length]); // Re-fetch when cart items change
-
-  const fetchMenuItems = async () => {
-    if (cart.items.length === 0) {
-      setLoading(false);
-      return;
-    }
-
-    try {
-      const response = await axios.get(`${API}/menu`);
-      const allItems = response.data;
-      const cartItemIds = cart.items.map(item => item.menu_item_id);
-      const cartMenuItems = allItems.filter(item => cartItemIds.includes(item.id));
-      setMenuItems(cartMenuItems);
-      setLoading(false);
-    } catch (error) {
-      console.error('Error fetching menu items:', error);
-      setLoading(false);
-    }
-  };
-
-  const getItemQuantity = (itemId) => {
-    const cartItem = cart.items.find(item => item.menu_item_id === itemId);
-    return cartItem ? cartItem.quantity : 0;
-  };
-
-  const calculateSubtotal = (item) => {
-    return item.price * getItemQuantity(item.id);
-  };
-
-  const calculateTotal = () => {
-    return menuItems.reduce((total, item) => total + calculateSubtotal(item), 0);
-  };
-
-  if (loading) {
-    return (
-      <div className="min-h-screen flex items-center justify-center">
-        <div className="text-2xl font-semibold">Loading cart...</div>
-      </div>
-    );
-  }
 
   return (
     <div className="bg-gray-50 min-h-screen py-8 px-4">
@@ -81,11 +30,11 @@ const Cart = () => {
           <div className="grid grid-cols-1 lg:grid-cols-3 gap-8">
             {/* Cart Items */}
             <div className="lg:col-span-2 space-y-4">
-              {menuItems.map((item) => (
+              {cart.items.map((item) => (
                 <div
-                  key={item.id}
+                  key={item.menu_item_id}
                   className="bg-white rounded-lg shadow-md p-6 flex items-center space-x-6"
-                  data-testid={`cart-item-${item.id}`}
+                  data-testid={`cart-item-${item.menu_item_id}`}
                 >
                   <div className="flex-grow">
                     <h3 className="text-xl font-bold mb-2">{item.name}</h3>
@@ -95,17 +44,17 @@ const Cart = () => {
                   
                   <div className="flex items-center space-x-3">
                     <button
-                      onClick={() => updateQuantity(item.id, getItemQuantity(item.id) - 1)}
+                      onClick={() => updateQuantity(item.menu_item_id, item.quantity - 1)}
                       className="bg-gray-200 hover:bg-gray-300 p-2 rounded-lg transition-colors"
-                      data-testid={`decrease-quantity-${item.id}`}
+                      data-testid={`decrease-quantity-${item.menu_item_id}`}
                     >
                       <Minus className="w-4 h-4" />
                     </button>
-                    <span className="text-2xl font-bold w-12 text-center">{getItemQuantity(item.id)}</span>
+                    <span className="text-2xl font-bold w-12 text-center">{item.quantity}</span>
                     <button
-                      onClick={() => updateQuantity(item.id, getItemQuantity(item.id) + 1)}
+                      onClick={() => updateQuantity(item.menu_item_id, item.quantity + 1)}
                       className="bg-gray-200 hover:bg-gray-300 p-2 rounded-lg transition-colors"
-                      data-testid={`increase-quantity-${item.id}`}
+                      data-testid={`increase-quantity-${item.menu_item_id}`}
                     >
                       <Plus className="w-4 h-4" />
                     </button>
@@ -113,13 +62,13 @@ const Cart = () => {
                   
                   <div className="text-right">
                     <p className="text-sm text-gray-600 mb-2">Subtotal</p>
-                    <p className="text-2xl font-bold text-red-600">${calculateSubtotal(item).toFixed(2)}</p>
+                    <p className="text-2xl font-bold text-red-600">${item.line_subtotal.toFixed(2)}</p>
                   </div>
                   
                   <button
-                    onClick={() => removeFromCart(item.id)}
+                    onClick={() => removeFromCart(item.menu_item_id)}
                     className="text-red-600 hover:text-red-700 transition-colors"
-                    data-testid={`remove-item-${item.id}`}
+                    data-testid={`remove-item-${item.menu_item_id}`}
                   >
                     <Trash2 className="w-6 h-6" />
                   </button>
@@ -142,20 +91,20 @@ const Cart = () => {
                 <div className="space-y-4 mb-6">
                   <div className="flex justify-between">
                     <span className="text-gray-600">Subtotal</span>
-                    <span className="font-semibold">${calculateTotal().toFixed(2)}</span>
+                    <span className="font-semibold">${cart.subtotal.toFixed(2)}</span>
                   </div>
                   <div className="flex justify-between">
                     <span className="text-gray-600">Tax (8%)</span>
-                    <span className="font-semibold">${(calculateTotal() * 0.08).toFixed(2)}</span>
+                    <span className="font-semibold">${cart.tax.toFixed(2)}</span>
                   </div>
                   <div className="flex justify-between">
                     <span className="text-gray-600">Delivery Fee</span>
-                    <span className="font-semibold">$5.00</span>
+                    <span className="font-semibold">${cart.delivery_fee.toFixed(2)}</span>
                   </div>
                   <div className="border-t pt-4">
                     <div className="flex justify-between text-xl font-bold">
                       <span>Total</span>
-                      <span className="text-red-600">${(calculateTotal() * 1.08 + 5).toFixed(2)}</span>
+                      <span className="text-red-600">${cart.total.toFixed(2)}</span>
                     </div>
                   </div>
                 </div>
@@ -10,8 +10,6 @@ const API = `${BACKEND_URL}/api`;
 const Checkout = () => {
   const navigate = useNavigate();
   const { cart, clearCart } = useCart();
-  const [menuItems, setMenuItems] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [submitting, setSubmitting] = useState(false);
   const [orderSuccess, setOrderSuccess] = useState(false);
   const [orderId, setOrderId] = useState('');
@@ -24,55 +22,18 @@ const Checkout = () => {
   });
 
   const [errors, setErrors] = useState({});
+  // Fee for the entered address, from the delivery zone it falls in
+  const [quote, setQuote] = useState(null);
+  const deliveryFee = quote && quote.deliverable ? quote.fee : cart.delivery_fee;
+  const total = cart.subtotal + cart.tax + deliveryFee;
 
   useEffect(() => {
     // Redirect if cart is empty
     if (cart.items.length === 0 && !orderSuccess) {
       navigate('/cart');
-      return;
     }
-    fetchMenuItems();
   }, [cart.items.length, navigate, orderSuccess]);
 
-  const fetchMenuItems = async () => {
-    if (cart.items.length === 0) {
-      setLoading(false);
-      return;
-    }
-
-    try {
-      const response = await axios.get(`${API}/menu`);
-      const allItems = response.data;
-      const cartItemIds = cart.items.map(item => item.menu_item_id);
-      const cartMenuItems = allItems.filter(item => cartItemIds.includes(item.id));
-      setMenuItems(cartMenuItems);
-      setLoading(false);
-    } catch (error) {
-      console.error('Error fetching menu items:', error);
-      setLoading(false);
-    }
-  };
-
-  const getItemQuantity = (itemId) => {
-    const cartItem = cart.items.find(item => item.menu_item_id === itemId);
-    return cartItem ? cartItem.quantity : 0;
-  };
-
-  const calculateSubtotal = (item) => {
-    return item.price * getItemQuantity(item.id);
-  };
-
-  const calculateTotal = () => {
-    return menuItems.reduce((total, item) => total + calculateSubtotal(item), 0);
-  };
-
-  const calculateGrandTotal = () => {
-    const subtotal = calculateTotal();
-    const tax = subtotal * 0.08;
-    const deliveryFee = 5.00;
-    return subtotal + tax + deliveryFee;
-  };
-
   const validateForm = () => {
     const newErrors = {};
 
@@ -115,6 +76,24 @@ const Checkout = () => {
     }
   };
 
+  const fetchQuote = async () => {
+    if (!formData.address.trim()) {
+      return;
+    }
+    try {
+      const response = await axios.post(`${API}/delivery/quote`, {
+        delivery_address: formData.address,
+        subtotal: cart.subtotal
+      });
+      setQuote(response.data);
+      if (!response.data.deliverable) {
+        setErrors(prev => ({ ...prev, address: response.data.reason }));
+      }
+    } catch (error) {
+      console.error('Error fetching delivery quote:', error);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
 
@@ -123,6 +102,7 @@ const Checkout = () => {
     }
 
     setSubmitting(true);
+    setErrors(prev => ({ ...prev, form: undefined }));
 
     try {
       // Prepare order data
@@ -131,11 +111,11 @@ const Checkout = () => {
         customer_email: formData.email,
         customer_phone: formData.phone,
         delivery_address: formData.address,
-        items: cart.items,
-        subtotal: calculateTotal(),
-        tax: calculateTotal() * 0.08,
-        delivery_fee: 5.00,
-        total: calculateGrandTotal(),
+        items: cart.items.map(({ menu_item_id, quantity }) => ({ menu_item_id, quantity })),
+        subtotal: cart.subtotal,
+        tax: cart.tax,
+        delivery_fee: deliveryFee,
+        total: total,
         payment_method: 'Cash on Delivery',
         status: 'Pending'
       };
@@ -150,20 +130,20 @@ const Checkout = () => {
       window.scrollTo(0, 0);
     } catch (error) {
       console.error('Error submitting order:', error);
-      alert('Failed to submit order. Please try again.');
+      if (error.response && error.response.status === 400) {
+        // Only the delivery address is refused with 400
+        setErrors(prev => ({ ...prev, address: error.response.data.detail }));
+      } else if (error.response && error.response.status === 409) {
+        // Closed, or a dish sold out or was taken off the menu
+        setErrors(prev => ({ ...prev, form: error.response.data.detail }));
+      } else {
+        alert('Failed to submit order. Please try again.');
+      }
     } finally {
       setSubmitting(false);
     }
   };
 
-  if (loading) {
-    return (
-      <div className="min-h-screen flex items-center justify-center">
-        <div className="text-2xl font-semibold">Loading...</div>
-      </div>
-    );
-  }
-
   // Success State
   if (orderSuccess) {
     return (
@@ -281,6 +261,7 @@ const Checkout = () => {
                     name="address"
                     value={formData.address}
                     onChange={handleChange}
+                    onBlur={fetchQuote}
                     rows="3"
                     className={`w-full px-4 py-3 border rounded-lg focus:outline-none focus:ring-2 focus:ring-red-600 ${
                       errors.address ? 'border-red-500' : 'border-gray-300'
@@ -293,6 +274,9 @@ const Checkout = () => {
                 </div>
 
                 <div className="pt-4">
+                  {errors.form && (
+                    <p className="text-red-500 text-sm mb-3" data-testid="order-error">{errors.form}</p>
+                  )}
                   <button
                     type="submit"
                     disabled={submitting}
@@ -311,12 +295,12 @@ const Checkout = () => {
               <h2 className="text-2xl font-bold mb-6">Order Summary</h2>
               
               <div className="space-y-3 mb-6 max-h-64 overflow-y-auto">
-                {menuItems.map((item) => (
-                  <div key={item.id} className="flex justify-between text-sm">
+                {cart.items.map((item) => (
+                  <div key={item.menu_item_id} className="flex justify-between text-sm">
                     <span className="text-gray-600">
-                      {item.name} x {getItemQuantity(item.id)}
+                      {item.name} x {item.quantity}
                     </span>
-                    <span className="font-semibold">${calculateSubtotal(item).toFixed(2)}</span>
+                    <span className="font-semibold">${item.line_subtotal.toFixed(2)}</span>
                   </div>
                 ))}
               </div>
@@ -324,20 +308,20 @@ const Checkout = () => {
               <div className="border-t pt-4 space-y-3">
                 <div className="flex justify-between">
                   <span className="text-gray-600">Subtotal</span>
-                  <span className="font-semibold">${calculateTotal().toFixed(2)}</span>
+                  <span className="font-semibold">${cart.subtotal.toFixed(2)}</span>
                 </div>
                 <div className="flex justify-between">
                   <span className="text-gray-600">Tax (8%)</span>
-                  <span className="font-semibold">${(calculateTotal() * 0.08).toFixed(2)}</span>
+                  <span className="font-semibold">${cart.tax.toFixed(2)}</span>
                 </div>
                 <div className="flex justify-between">
                   <span className="text-gray-600">Delivery Fee</span>
-                  <span className="font-semibold">$5.00</span>
+                  <span className="font-semibold">${deliveryFee.toFixed(2)}</span>
                 </div>
                 <div className="border-t pt-3">
                   <div className="flex justify-between text-xl font-bold">
                     <span>Total</span>
-                    <span className="text-red-600">${calculateGrandTotal().toFixed(2)}</span>
+                    <span className="text-red-600">${total.toFixed(2)}</span>
                   </div>
                 </div>
               </div>
@@ -3,6 +3,7 @@ import axios from 'axios';
 import { ShoppingCart, Heart } from 'lucide-react';
 import { useCart } from '@/context/CartContext';
 import { useWishlist } from '@/context/WishlistContext';
+import useAvailability from '@/hooks/use-availability';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -14,6 +15,7 @@ const DineInMenu = () => {
   const [loading, setLoading] = useState(true);
   const { addToCart } = useCart();
   const { addToWishlist, isInWishlist, removeFromWishlist } = useWishlist();
+  const isAvailable = useAvailability();
 
   useEffect(() => {
     fetchMenuItems();
@@ -127,6 +129,9 @@ const DineInMenu = () => {
                   <p className="text-gray-600 mb-4 text-sm">{item.description}</p>
                   <div className="flex items-center justify-between">
                     <p className="text-2xl font-bold text-red-600">${item.price.toFixed(2)}</p>
+                    {!isAvailable(item) && (
+                      <span className="text-sm font-semibold text-gray-500" data-testid={`sold-out-${item.id}`}>Sold out</span>
+                    )}
                   </div>
                 </div>
               </div>
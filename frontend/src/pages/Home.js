@@ -1,10 +1,9 @@
 import { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { ChevronLeft, ChevronRight, Star } from 'lucide-react';
-import axios from 'axios';
+import { fetchHomeBundle } from '@/lib/siteData';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
 
 // Carousel images
 const carouselImages = [
@@ -24,11 +23,7 @@ const Home = () => {
   const [currentTestimonial, setCurrentTestimonial] = useState(0);
 
   useEffect(() => {
-    fetchBanners();
-    fetchFeaturedItems();
-    fetchTestimonials();
-    fetchGalleryImages();
-    fetchStatistics();
+    fetchHome();
   }, []);
 
   useEffect(() => {
@@ -47,50 +42,17 @@ const Home = () => {
     return () => clearInterval(timer);
   }, [testimonials.length]);
 
-  const fetchBanners = async () => {
+  const fetchHome = async () => {
     try {
-      const response = await axios.get(`${API}/banners`);
-      setBanners(response.data);
+      // Banners, featured dishes, testimonials, gallery and statistics in one cached payload
+      const bundle = await fetchHomeBundle();
+      setBanners(bundle.banners);
+      setFeaturedItems(bundle.featured_items);
+      setTestimonials(bundle.testimonials);
+      setGalleryImages(bundle.gallery);
+      setStatistics(bundle.statistics);
     } catch (error) {
-      console.error('Error fetching banners:', error);
-    }
-  };
-
-  const fetchFeaturedItems = async () => {
-    try {
-      // Fetch dine-in menu items
-      const response = await axios.get(`${API}/menu?menu_type=dine-in`);
-      // Get first 6 items from dine-in menu
-      setFeaturedItems(response.data.slice(0, 6));
-    } catch (error) {
-      console.error('Error fetching featured items:', error);
-    }
-  };
-
-  const fetchTestimonials = async () => {
-    try {
-      const response = await axios.get(`${API}/testimonials`);
-      setTestimonials(response.data);
-    } catch (error) {
-      console.error('Error fetching testimonials:', error);
-    }
-  };
-
-  const fetchGalleryImages = async () => {
-    try {
-      const response = await axios.get(`${API}/gallery`);
-      setGalleryImages(response.data.slice(0, 6));
-    } catch (error) {
-      console.error('Error fetching gallery images:', error);
-    }
-  };
-
-  const fetchStatistics = async () => {
-    try {
-      const response = await axios.get(`${API}/statistics`);
-      setStatistics(response.data);
-    } catch (error) {
-      console.error('Error fetching statistics:', error);
+      console.error('Error fetching home page:', error);
     }
   };
 
@@ -44,7 +44,9 @@ const Reservation = () => {
         special_requests: ''
       });
     } catch (err) {
-      setError('Failed to submit the reservation. Please try again.');
+      // Outside opening hours and similar are explained by the server
+      const detail = err.response && err.response.status === 400 ? err.response.data.detail : null;
+      setError(detail || 'Failed to submit the reservation. Please try again.');
       console.error('Error submitting reservation:', err);
     }
     setSubmitting(false);
@@ -4,6 +4,7 @@ import axios from 'axios';
 import { ShoppingCart, Heart } from 'lucide-react';
 import { useCart } from '@/context/CartContext';
 import { useWishlist } from '@/context/WishlistContext';
+import useAvailability from '@/hooks/use-availability';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -15,6 +16,7 @@ const TakeawayMenu = () => {
   const [loading, setLoading] = useState(true);
   const { addToCart, getCartItemCount } = useCart();
   const { addToWishlist, isInWishlist, removeFromWishlist, wishlist } = useWishlist();
+  const isAvailable = useAvailability();
 
   useEffect(() => {
     fetchMenuItems();
@@ -141,11 +143,12 @@ const TakeawayMenu = () => {
                     <p className="text-2xl font-bold text-red-600">${item.price.toFixed(2)}</p>
                     <button
                       onClick={() => handleAddToCart(item.id)}
-                      className="bg-red-600 hover:bg-red-700 text-white px-4 py-2 rounded-lg flex items-center space-x-2 transition-colors"
+                      disabled={!isAvailable(item)}
+                      className="bg-red-600 hover:bg-red-700 disabled:bg-gray-400 disabled:cursor-not-allowed text-white px-4 py-2 rounded-lg flex items-center space-x-2 transition-colors"
                       data-testid={`add-to-cart-${item.id}`}
                     >
                       <ShoppingCart className="w-4 h-4" />
-                      <span>Add</span>
+                      <span>{isAvailable(item) ? 'Add' : 'Sold out'}</span>
                     </button>
                   </div>
                 </div>
@@ -1,40 +1,14 @@
-import { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { Heart, ShoppingCart, Trash2 } from 'lucide-react';
-import axios from 'axios';
 import { useWishlist } from '@/context/WishlistContext';
 import { useCart } from '@/context/CartContext';
 
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
-
 const Wishlist = () => {
   const { wishlist, removeFromWishlist } = useWishlist();
   const { addToCart } = useCart();
-  const [menuItems, setMenuItems] = useState([]);
-  const [loading, setLoading] = useState(true);
-
-  useEffect(() => {
-    fetchMenuItems();
-  }, [wishlist]);
-
-  const fetchMenuItems = async () => {
-    if (wishlist.menu_item_ids.length === 0) {
-      setLoading(false);
-      return;
-    }
-
-    try {
-      const response = await axios.get(`${API}/menu`);
-      const allItems = response.data;
-      const wishlistItems = allItems.filter(item => wishlist.menu_item_ids.includes(item.id));
-      setMenuItems(wishlistItems);
-      setLoading(false);
-    } catch (error) {
-      console.error('Error fetching menu items:', error);
-      setLoading(false);
-    }
-  };
+  // The context fetches with ?expand=items, so the menu records arrive with the ids
+  const menuItems = wishlist.items || [];
+  const loading = wishlist.items === undefined;
 
   const handleAddToCart = (itemId) => {
     addToCart(itemId, 1);
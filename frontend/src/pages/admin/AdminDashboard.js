@@ -12,8 +12,11 @@ const AdminDashboard = () => {
     contacts: 0,
     reservations: 0,
     menuItems: 0,
-    testimonials: 0
+    testimonials: 0,
+    orders: 0,
+    revenue: 0
   });
+  const [periods, setPeriods] = useState([]);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -23,20 +26,21 @@ const AdminDashboard = () => {
   const fetchStats = async () => {
     try {
       const headers = { Authorization: `Bearer ${token}` };
-      
-      const [contacts, reservations, menu, testimonials] = await Promise.all([
-        axios.get(`${API}/admin/contacts`, { headers }),
-        axios.get(`${API}/admin/reservations`, { headers }),
-        axios.get(`${API}/menu`),
-        axios.get(`${API}/testimonials`)
-      ]);
+      const response = await axios.get(`${API}/admin/dashboard/stats`, { headers });
+      const { totals, today, this_week } = response.data;
 
       setStats({
-        contacts: contacts.data.length,
-        reservations: reservations.data.length,
-        menuItems: menu.data.length,
-        testimonials: testimonials.data.length
+        contacts: totals.contacts,
+        reservations: totals.reservations,
+        menuItems: totals.menu_items,
+        testimonials: totals.testimonials,
+        orders: totals.orders,
+        revenue: totals.order_revenue
       });
+      setPeriods([
+        { label: 'Today', ...today },
+        { label: 'This Week', ...this_week }
+      ]);
     } catch (error) {
       console.error('Error fetching stats:', error);
     }
@@ -78,6 +82,21 @@ const AdminDashboard = () => {
         })}
       </div>
 
+      {/* Today / This Week */}
+      <div className="grid grid-cols-1 md:grid-cols-2 gap-6 mb-8">
+        {periods.map((period) => (
+          <div key={period.label} className="bg-white rounded-lg shadow-md p-6">
+            <h2 className="text-lg font-semibold text-gray-800 mb-4">{period.label}</h2>
+            <div className="grid grid-cols-2 gap-4 text-sm text-gray-600">
+              <p>Orders: <span className="font-bold text-gray-800">{period.orders}</span></p>
+              <p>Revenue: <span className="font-bold text-gray-800">${period.order_revenue.toFixed(2)}</span></p>
+              <p>Reservations: <span className="font-bold text-gray-800">{period.reservations}</span></p>
+              <p>Contacts: <span className="font-bold text-gray-800">{period.contacts}</span></p>
+            </div>
+          </div>
+        ))}
+      </div>
+
       {/* Welcome Message */}
       <div className="bg-white rounded-lg shadow-md p-6">
         <h2 className="text-2xl font-bold text-gray-800 mb-4">Welcome to Admin Panel</h2>
@@ -101,6 +120,7 @@ const AdminDashboard = () => {
               <li>• Pending Contacts: {stats.contacts}</li>
               <li>• Reservations: {stats.reservations}</li>
               <li>• Customer Reviews: {stats.testimonials}</li>
+              <li>• Orders: {stats.orders} (${stats.revenue.toFixed(2)} revenue)</li>
             </ul>
           </div>
         </div>
@@ -0,0 +1,90 @@
+"""
+Daily sales rollups on a fixed set of orders: local-day and hour buckets, cancelled orders, weekly and monthly ranges.
+"""
+import asyncio
+from datetime import date, datetime, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from analytics import COLLECTION, Rollups
+
+
+def order(order_id: str, created_at: datetime, total: float, lines, status: str = "Pending") -> dict:
+    return {
+        "order_id": order_id, "created_at": created_at, "total": total, "status": status,
+        "items": [{"menu_item_id": item_id, "quantity": quantity} for item_id, quantity in lines],
+    }
+
+
+ORDERS = [
+    order("a", datetime(2025, 2, 28, 23, 30, tzinfo=timezone.utc), 15.0, [("curry", 1)]),
+    order("b", datetime(2025, 3, 1, 8, 0, tzinfo=timezone.utc), 20.0, [("curry", 2)]),
+    order("b2", datetime(2025, 3, 1, 19, 0, tzinfo=timezone.utc), 30.0, [("curry", 1), ("naan", 2)]),
+    order("c", datetime(2025, 3, 1, 8, 15, tzinfo=timezone.utc), 99.0, [("curry", 5)], status="Cancelled"),
+    order("d", datetime(2025, 3, 5, 7, 0, tzinfo=timezone.utc), 12.5, [("naan", 3)]),
+    order("e", datetime(2025, 3, 20, 9, 0, tzinfo=timezone.utc), 40.0, [("lassi", 4)]),
+    # April, outside the month below
+    order("f", datetime(2025, 4, 2, 9, 0, tzinfo=timezone.utc), 50.0, [("curry", 1)]),
+]
+
+
+@pytest.fixture
+def rollups():
+    db = AsyncMongoMockClient()["analytics_test"]
+    # mongomock can't cut days in a timezone; test_record_order_uses_the_local_day covers that
+    rollups = Rollups("UTC")
+
+    async def seed():
+        await db.orders.insert_many([dict(doc) for doc in ORDERS])
+        await rollups.backfill(db, date(2025, 2, 1), date(2025, 4, 30), chunk_days=10)
+
+    asyncio.run(seed())
+    return db, rollups
+
+
+def test_orders_land_on_their_day_and_hour(rollups):
+    db, rollups = rollups
+    first = asyncio.run(db[COLLECTION].find_one({"day": "2025-03-01"}, {"_id": 0, "updated_at": 0}))
+    # The cancelled order is left out
+    assert first == {"day": "2025-03-01", "orders": 2, "revenue": 50.0,
+                     "items": {"curry": 3, "naan": 2}, "hours": {"8": 1, "19": 1}}
+    assert asyncio.run(db[COLLECTION].find_one({"day": "2025-02-28"}))["orders"] == 1
+
+
+def test_week_and_month_ranges(rollups):
+    db, rollups = rollups
+    week = asyncio.run(rollups.daily_sales(db, date(2025, 3, 1), date(2025, 3, 7)))
+    assert [row["day"] for row in week] == [f"2025-03-0{day}" for day in range(1, 8)]
+    assert [row["orders"] for row in week] == [2, 0, 0, 0, 1, 0, 0]
+    assert week[0]["average_order_value"] == 25.0 and week[1]["average_order_value"] == 0.0
+    assert sum(row["revenue"] for row in week) == 62.5
+
+    march = (date(2025, 3, 1), date(2025, 3, 31))
+    assert asyncio.run(rollups.item_totals(db, *march)) == {"curry": 3, "naan": 5, "lassi": 4}
+    hours = asyncio.run(rollups.hourly_orders(db, *march))
+    assert sum(hours) == 4 and hours[8] == 1 and hours[19] == 1
+
+
+def test_live_orders_and_cancellations_match_a_rebuild(rollups):
+    db, rollups = rollups
+    late = order("g", datetime(2025, 3, 5, 11, 0, tzinfo=timezone.utc), 7.5, [("naan", 1)])
+
+    async def run():
+        await db.orders.insert_one(dict(late))
+        await rollups.record_order(db, late)
+        await db.orders.update_one({"order_id": "d"}, {"$set": {"status": "Cancelled"}})
+        await rollups.rollup_day(db, date(2025, 3, 5))
+        return await rollups.daily_sales(db, date(2025, 3, 5), date(2025, 3, 5))
+
+    assert asyncio.run(run()) == [{"day": "2025-03-05", "orders": 1, "revenue": 7.5, "average_order_value": 7.5}]
+
+
+def test_record_order_uses_the_local_day():
+    db = AsyncMongoMockClient()["analytics_tz_test"]
+    rollups = Rollups("Australia/Melbourne")
+    # 10:30 on Saturday 1 March in Melbourne, still Friday in UTC
+    late = order("h", datetime(2025, 2, 28, 23, 30, tzinfo=timezone.utc), 15.0, [("curry", 1)])
+    asyncio.run(rollups.record_order(db, late))
+    doc = asyncio.run(db[COLLECTION].find_one({}, {"_id": 0, "updated_at": 0}))
+    assert doc == {"day": "2025-03-01", "orders": 1, "revenue": 15.0, "hours": {"10": 1}, "items": {"curry": 1}}
@@ -0,0 +1,53 @@
+"""
+Stream tokens: scoped, short-lived, and kept out of access logs.
+"""
+import logging
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from auth import (
+    STREAM_SCOPE, RedactQueryString, create_access_token, create_stream_token, verify_stream_token, verify_token,
+)
+
+
+def bearer(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_stream_token_opens_streams():
+    assert verify_stream_token(token=create_stream_token("admin"), credentials=None) == "admin"
+
+
+def test_admin_token_is_refused_in_the_query_string():
+    with pytest.raises(HTTPException) as refused:
+        verify_stream_token(token=create_access_token({"sub": "admin"}), credentials=None)
+    assert refused.value.status_code == 401
+    # The header still takes the admin token
+    assert verify_stream_token(token=None, credentials=bearer(create_access_token({"sub": "admin"}))) == "admin"
+
+
+def test_stream_token_is_refused_elsewhere():
+    with pytest.raises(HTTPException) as refused:
+        verify_token(bearer(create_stream_token("admin")))
+    assert refused.value.status_code == 401
+
+
+def test_expired_stream_token_is_refused():
+    expired = create_access_token({"sub": "admin", "scope": STREAM_SCOPE}, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(HTTPException):
+        verify_stream_token(token=expired, credentials=None)
+
+
+def test_access_log_leaves_out_query_strings():
+    def line(path: str) -> str:
+        record = logging.LogRecord("uvicorn.access", logging.INFO, __file__, 0, '%s - "%s %s HTTP/%s" %d',
+                                   ("127.0.0.1:5000", "GET", path, "1.1", 200), None)
+        assert RedactQueryString().filter(record)
+        return record.getMessage()
+
+    assert line("/api/kitchen/stations/tandoor/stream?token=secret") == \
+        '127.0.0.1:5000 - "GET /api/kitchen/stations/tandoor/stream?[redacted] HTTP/1.1" 200'
+    assert line("/api/menu") == '127.0.0.1:5000 - "GET /api/menu HTTP/1.1" 200'
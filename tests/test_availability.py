@@ -0,0 +1,163 @@
+"""
+Stock accounting: reservations roll back when any line is short, and orders give their stock back.
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from auth import create_access_token
+from availability import COLLECTION, Availability, SoldOut
+
+ADMIN = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+
+
+def stock_docs(db) -> dict:
+    docs = asyncio.run(db[COLLECTION].find({}, {"_id": 0}).to_list(None))
+    return {doc["menu_item_id"]: doc["stock"] for doc in docs}
+
+
+@pytest.fixture
+def stocked():
+    db = AsyncMongoMockClient()["availability_test"]
+    availability = Availability()
+
+    async def seed():
+        await availability.update(db, "naan", {"stock": 5})
+        await availability.update(db, "lassi", {"stock": 1})
+        await availability.update(db, "rice", {"stock": None})
+        await availability.load(db)
+
+    asyncio.run(seed())
+    return db, availability
+
+
+# ============= RESERVE / RELEASE =============
+
+def test_reserve_takes_counted_stock_only(stocked):
+    db, availability = stocked
+    taken = asyncio.run(availability.reserve(db, {"naan": 2, "rice": 9, "lassi": 1}))
+    assert taken == [("naan", 2), ("lassi", 1)]
+    assert stock_docs(db) == {"naan": 3, "lassi": 0, "rice": None}
+    assert availability.sold_out == {"lassi"}
+
+
+def test_short_line_puts_back_the_lines_already_taken(stocked):
+    db, availability = stocked
+    # naan is decremented before lassi turns out to be short
+    with pytest.raises(SoldOut) as short:
+        asyncio.run(availability.reserve(db, {"naan": 2, "lassi": 2}))
+    assert short.value.menu_item_id == "lassi"
+    assert stock_docs(db) == {"naan": 5, "lassi": 1, "rice": None}
+    assert availability.sold_out == frozenset()
+
+
+def test_stale_copy_is_corrected_when_the_last_portion_went_elsewhere(stocked):
+    db, availability = stocked
+    # Another worker sold the last lassi; this worker's copy still says 1
+    asyncio.run(db[COLLECTION].update_one({"menu_item_id": "lassi"}, {"$set": {"stock": 0}}))
+    with pytest.raises(SoldOut):
+        asyncio.run(availability.reserve(db, {"naan": 1, "lassi": 1}))
+    assert stock_docs(db)["naan"] == 5
+    assert availability.sold_out == {"lassi"}
+
+
+def test_switched_off_and_invalid_quantities_take_nothing(stocked):
+    db, availability = stocked
+    asyncio.run(availability.update(db, "rice", {"available": False}))
+    with pytest.raises(SoldOut):
+        asyncio.run(availability.reserve(db, {"naan": 1, "rice": 1}))
+    with pytest.raises(ValueError):
+        asyncio.run(availability.reserve(db, {"naan": -3}))
+    assert stock_docs(db)["naan"] == 5
+
+
+def test_release_returns_stock_and_brings_dishes_back(stocked):
+    db, availability = stocked
+    taken = asyncio.run(availability.reserve(db, {"lassi": 1, "naan": 1}))
+    assert "lassi" in availability.sold_out
+    asyncio.run(availability.release(db, taken))
+    assert stock_docs(db) == {"naan": 5, "lassi": 1, "rice": None}
+    assert availability.sold_out == frozenset()
+
+
+# ============= ORDERS =============
+
+@pytest.fixture
+def shop(monkeypatch):
+    monkeypatch.setattr(server, "db", AsyncMongoMockClient()["availability_orders_test"])
+    monkeypatch.setattr(server.write_guard, "ip_policy", server.BucketPolicy(1000, 1000))
+    monkeypatch.setattr(server.write_guard, "email_policy", server.BucketPolicy(1000, 1000))
+    server.menu_index.invalidate()
+    server.menu_availability.loaded = False
+    client = TestClient(server.app)
+    item_id = client.post("/api/admin/menu", headers=ADMIN, json={
+        "name": "Lamb Rogan Josh", "description": "Slow-cooked lamb", "price": 20.0,
+        "category": "Lamb", "menu_type": "takeaway",
+    }).json()["id"]
+    assert client.put(f"/api/admin/menu/{item_id}/availability", headers=ADMIN, json={"stock": 3}).status_code == 200
+    yield client, item_id
+    server.menu_index.invalidate()
+    server.menu_availability.loaded = False
+
+
+def place(client, item_id: str, quantity: int):
+    return client.post("/api/orders", json={
+        "customer_name": "Sam", "customer_email": "sam@example.com", "customer_phone": "0400000000",
+        "delivery_address": "1 Some Street, Hawthorn 3122", "payment_method": "Cash on Delivery",
+        "items": [{"menu_item_id": item_id, "quantity": quantity}],
+    })
+
+
+def current_stock(item_id: str) -> int:
+    return stock_docs(server.db)[item_id]
+
+
+def test_failed_order_insert_releases_its_stock(shop, monkeypatch):
+    client, item_id = shop
+
+    collection_class = type(server.db.orders)
+    insert_one = collection_class.insert_one
+
+    async def insert_fails(collection, *args, **kwargs):
+        if collection.name == "orders":
+            raise RuntimeError("primary stepped down")
+        return await insert_one(collection, *args, **kwargs)
+
+    # Each attribute access returns a new collection object, so patch the class
+    monkeypatch.setattr(collection_class, "insert_one", insert_fails)
+    response = place(client, item_id, 2)
+    assert response.status_code == 500
+    assert current_stock(item_id) == 3
+
+
+def test_cancel_returns_stock_and_restore_takes_it_again(shop):
+    client, item_id = shop
+    order_id = place(client, item_id, 2).json()["order_id"]
+    assert current_stock(item_id) == 1
+
+    assert client.patch(f"/api/orders/{order_id}", headers=ADMIN, json={"status": "Cancelled"}).status_code == 200
+    assert current_stock(item_id) == 3
+    # Cancelling twice doesn't return it twice
+    assert client.patch(f"/api/orders/{order_id}", headers=ADMIN, json={"status": "Cancelled"}).status_code == 200
+    assert current_stock(item_id) == 3
+
+    assert client.patch(f"/api/orders/{order_id}", headers=ADMIN, json={"status": "Confirmed"}).status_code == 200
+    assert current_stock(item_id) == 1
+    order = asyncio.run(server.db.orders.find_one({"order_id": order_id}))
+    assert order["reserved_stock"] == {item_id: 2}
+
+
+def test_restore_is_refused_when_the_stock_has_gone(shop):
+    client, item_id = shop
+    order_id = place(client, item_id, 2).json()["order_id"]
+    client.patch(f"/api/orders/{order_id}", headers=ADMIN, json={"status": "Cancelled"})
+    assert place(client, item_id, 2).status_code == 200
+
+    response = client.patch(f"/api/orders/{order_id}", headers=ADMIN, json={"status": "Confirmed"})
+    assert response.status_code == 409
+    assert current_stock(item_id) == 1
+    order = asyncio.run(server.db.orders.find_one({"order_id": order_id}))
+    assert order["status"] == "Cancelled"
@@ -0,0 +1,91 @@
+"""
+Cart compaction: expiry by updated_at, including legacy ISO-string timestamps, and pruning of deleted dishes.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import cart_compaction
+
+NOW = datetime.now(timezone.utc)
+OLD = NOW - timedelta(days=40)
+RECENT = NOW - timedelta(days=1)
+
+
+def cart(cart_id: str, updated_at, items=("live",)) -> dict:
+    return {"id": cart_id, "user_id": cart_id, "updated_at": updated_at,
+            "items": [{"menu_item_id": item_id, "quantity": 1} for item_id in items]}
+
+
+@pytest.fixture
+def db():
+    db = AsyncMongoMockClient()["cart_compaction_test"]
+
+    async def seed():
+        await db.menu_items.insert_one({"id": "live"})
+        await db.carts.insert_many([
+            cart("old", OLD),
+            cart("recent", RECENT),
+            cart("old-string", OLD.isoformat()),
+            # Naive strings were written as UTC
+            cart("old-naive-string", OLD.replace(tzinfo=None).isoformat()),
+            cart("recent-string", RECENT.isoformat(), items=("live", "deleted")),
+            cart("garbled", "last tuesday"),
+        ])
+
+    asyncio.run(seed())
+    return db
+
+
+def remaining(db) -> list:
+    return sorted(doc["id"] for doc in asyncio.run(db.carts.find({}, {"id": 1}).to_list(None)))
+
+
+def test_expires_dates_and_legacy_strings(db):
+    report = asyncio.run(cart_compaction.compact_collection(db, "carts", 30, batch_size=2))
+    assert report["expired"] == 3
+    assert remaining(db) == ["garbled", "recent", "recent-string"]
+
+
+def test_prunes_deleted_dishes_from_legacy_documents(db):
+    report = asyncio.run(cart_compaction.compact_collection(db, "carts", 30, batch_size=2))
+    assert report["stale"] == 1
+    doc = asyncio.run(db.carts.find_one({"id": "recent-string"}))
+    assert [line["menu_item_id"] for line in doc["items"]] == ["live"]
+    # Pruning doesn't count as activity
+    assert doc["updated_at"] == RECENT.isoformat()
+
+
+def test_dry_run_counts_without_changing_anything(db):
+    report = asyncio.run(cart_compaction.compact_collection(db, "carts", 30, batch_size=2, dry_run=True))
+    assert (report["expired"], report["stale"]) == (3, 1)
+    assert len(remaining(db)) == 6
+
+
+def test_merges_duplicate_documents_into_the_oldest():
+    db = AsyncMongoMockClient()["cart_merge_test"]
+
+    async def run():
+        await db.carts.insert_many([
+            cart("first", OLD, items=("a", "b")),
+            {**cart("second", RECENT, items=("a",)), "user_id": "first"},
+            cart("other", RECENT),
+        ])
+        await db.wishlists.insert_many([
+            {"id": "w1", "user_id": "u", "menu_item_ids": ["a", "b"]},
+            {"id": "w2", "user_id": "u", "menu_item_ids": ["b", "c"]},
+        ])
+        removed = (await cart_compaction.merge_duplicates(db, "carts"),
+                   await cart_compaction.merge_duplicates(db, "wishlists"))
+        return removed, await db.carts.find({}, {"_id": 0}).to_list(None), await db.wishlists.find({}, {"_id": 0}).to_list(None)
+
+    removed, carts, wishlists = asyncio.run(run())
+    assert removed == (1, 1)
+    merged = next(doc for doc in carts if doc["user_id"] == "first")
+    assert len(carts) == 2 and merged["id"] == "first"
+    # Two first adds of the same dish were both meant
+    assert merged["items"] == [{"menu_item_id": "a", "quantity": 2}, {"menu_item_id": "b", "quantity": 1}]
+    assert merged["updated_at"].replace(tzinfo=timezone.utc) == RECENT.replace(microsecond=RECENT.microsecond // 1000 * 1000)
+    assert wishlists == [{"id": "w1", "user_id": "u", "menu_item_ids": ["a", "b", "c"]}]
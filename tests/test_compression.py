@@ -0,0 +1,80 @@
+"""
+Response cache: one build per key however many requests miss together, and cheap compression for ad-hoc keys.
+"""
+import asyncio
+
+import brotli
+
+import compression
+from compression import CompressedPayload, ResponseCache
+
+BODY = b'{"items": [' + b",".join(b'{"name": "Butter Chicken %d"}' % i for i in range(200)) + b"]}"
+
+
+def test_concurrent_misses_build_once():
+    cache = ResponseCache()
+    builds = []
+
+    async def build():
+        builds.append(1)
+        await asyncio.sleep(0.01)
+        return BODY
+
+    async def run():
+        return await asyncio.gather(*(cache.get(1, "menu", build) for _ in range(20)))
+
+    payloads = asyncio.run(run())
+    assert len(builds) == 1
+    assert all(payload is payloads[0] for payload in payloads)
+    assert brotli.decompress(payloads[0].variants["br"]) == BODY
+    assert not cache._locks
+
+
+def test_waiters_take_over_a_failed_build_one_at_a_time():
+    cache = ResponseCache()
+    attempts = []
+
+    async def build():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("Mongo went away")
+        return BODY
+
+    async def run():
+        return await asyncio.gather(*(cache.get(1, "menu", build) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert isinstance(results[0], RuntimeError)
+    # The next waiter built it under the same lock; the rest found it stored
+    assert len(attempts) == 2
+    assert all(isinstance(result, CompressedPayload) for result in results[1:])
+    assert not cache._locks
+
+
+def test_ad_hoc_keys_get_the_cheap_level(monkeypatch):
+    levels = []
+    compress = compression._compress
+
+    def recording(body, encoding, precomputed):
+        levels.append((encoding, precomputed))
+        return compress(body, encoding, precomputed)
+
+    monkeypatch.setattr(compression, "_compress", recording)
+    cache = ResponseCache()
+
+    async def build():
+        return BODY
+
+    asyncio.run(cache.get(1, "canonical", build))
+    asyncio.run(cache.get(1, ("fields", "name"), build, precomputed=False))
+    assert levels == [("br", True), ("gzip", True), ("br", False), ("gzip", False)]
+
+
+def test_uncompressed_cache_stores_values_as_built():
+    cache = ResponseCache(compress=False)
+
+    async def build():
+        return [("id", b"{}")]
+
+    assert asyncio.run(cache.get(1, "fragments", build)) == [("id", b"{}")]
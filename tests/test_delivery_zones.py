@@ -0,0 +1,121 @@
+"""
+Delivery zone lookup: address resolution, the polygon grid and zone precedence.
+"""
+import math
+import random
+
+import pytest
+
+import delivery_zones
+from delivery_zones import DEFAULT_TABLE, Location, PostcodeTable, ZoneIndex, point_in_polygon
+
+TRIANGLE = [[145.00, -37.85], [145.06, -37.85], [145.00, -37.79]]
+SQUARE = [[145.00, -37.85], [145.06, -37.85], [145.06, -37.79], [145.00, -37.79]]
+
+
+def at(longitude: float, latitude: float, postcode: str = "9999") -> Location:
+    return Location("Somewhere", postcode, "VIC", latitude, longitude)
+
+
+def zone(name: str, fee: float, postcodes=None, polygon=None) -> dict:
+    return {"name": name, "fee": fee, "minimum_order": 0.0, "postcodes": postcodes, "polygon": polygon}
+
+
+@pytest.fixture(scope="module")
+def table():
+    return PostcodeTable.from_csv(DEFAULT_TABLE)
+
+
+# ============= GRID =============
+
+def test_interior_cells_are_exact_and_edge_cells_are_tested():
+    index = ZoneIndex([zone("Triangle", 4.0, polygon=TRIANGLE)])
+    exact = [cell for cell, entries in index.grid.items() if entries == [(0, True)]]
+    edges = [cell for cell, entries in index.grid.items() if entries == [(0, False)]]
+    assert exact and edges
+
+    # A cell wholly inside the triangle matches without a polygon test
+    i, j = exact[0]
+    centre = at((i + 0.5) * index.cell_size, (j + 0.5) * index.cell_size)
+    assert index.match(centre)["name"] == "Triangle"
+
+    # The hypotenuse cuts through edge cells: points either side of it must be told apart
+    inside, outside = at(145.0220, -37.8125), at(145.0230, -37.8125)
+    cell = index._cell(inside.longitude, inside.latitude)
+    assert cell == index._cell(outside.longitude, outside.latitude)
+    assert index.grid[cell] == [(0, False)]
+    assert point_in_polygon(inside.longitude, inside.latitude, TRIANGLE)
+    assert not point_in_polygon(outside.longitude, outside.latitude, TRIANGLE)
+    assert index.match(inside)["name"] == "Triangle"
+    assert index.match(outside) is None
+
+
+def star(points: int = 7) -> list:
+    """A concave polygon with edges at many angles"""
+    return [
+        [145.03 + radius * math.cos(angle), -37.82 + radius * math.sin(angle)]
+        for k in range(points * 2)
+        for angle, radius in [(math.pi * k / points, 0.04 if k % 2 == 0 else 0.012)]
+    ]
+
+
+@pytest.mark.parametrize("polygon", [TRIANGLE, star()], ids=["triangle", "star"])
+def test_grid_agrees_with_point_in_polygon(polygon):
+    index = ZoneIndex([zone("Zone", 4.0, polygon=polygon)])
+    assert any(entries == [(0, True)] for entries in index.grid.values())
+    rng = random.Random(48)
+    for _ in range(5_000):
+        x, y = rng.uniform(144.98, 145.08), rng.uniform(-37.87, -37.77)
+        expected = point_in_polygon(x, y, polygon)
+        assert (index.match(at(x, y)) is not None) == expected, (x, y)
+
+
+def test_large_zones_coarsen_the_grid(monkeypatch):
+    monkeypatch.setattr(delivery_zones, "MAX_CELLS", 1_000)
+    state = [[140.0, -39.0], [150.0, -39.0], [150.0, -34.0], [140.0, -34.0]]
+    index = ZoneIndex([zone("State", 9.0, polygon=state)])
+    assert index.cell_size > delivery_zones.CELL_SIZE
+    assert len(index.grid) <= 1_100
+    assert index.match(at(145.0, -37.8))["name"] == "State"
+    assert index.match(at(139.9, -37.8)) is None
+    assert index.match(at(149.999, -34.001))["name"] == "State"
+
+
+# ============= PRECEDENCE =============
+
+def test_overlapping_polygons_charge_the_cheapest():
+    index = ZoneIndex([zone("Outer", 8.0, polygon=SQUARE), zone("Inner", 3.0, polygon=TRIANGLE)])
+    assert index.match(at(145.01, -37.84))["name"] == "Inner"
+    assert index.match(at(145.05, -37.80))["name"] == "Outer"
+
+
+def test_postcode_and_polygon_zones_compete_on_fee():
+    point = at(145.01, -37.84, postcode="3121")
+    cheap_postcode = ZoneIndex([zone("Postcode", 2.0, postcodes=["3121"]), zone("Polygon", 6.0, polygon=SQUARE)])
+    assert cheap_postcode.match(point)["name"] == "Postcode"
+    cheap_polygon = ZoneIndex([zone("Postcode", 6.0, postcodes=["3121"]), zone("Polygon", 2.0, polygon=SQUARE)])
+    assert cheap_polygon.match(point)["name"] == "Polygon"
+    # Outside the polygon the postcode still matches
+    assert cheap_polygon.match(at(144.0, -37.0, postcode="3121"))["name"] == "Postcode"
+
+
+# ============= ADDRESSES =============
+
+def test_street_number_is_not_taken_for_a_postcode(table):
+    location = table.resolve("3121 Burwood Rd, Hawthorn")
+    assert (location.suburb, location.postcode) == ("Hawthorn", "3122")
+    location = table.resolve("3121 Burwood Rd, Hawthorn VIC 3122")
+    assert (location.suburb, location.postcode) == ("Hawthorn", "3122")
+
+
+def test_multi_word_suburbs(table):
+    assert table.resolve("12 Smith St, Hawthorn East").suburb == "Hawthorn East"
+    assert table.resolve("12 Smith St, Hawthorn East VIC 3123").suburb == "Hawthorn East"
+    assert table.resolve("5 Station St Box Hill North 3129").suburb == "Box Hill North"
+    # A street named after a suburb doesn't beat the suburb itself
+    assert table.resolve("1 Hawthorn Rd, Richmond").suburb == "Richmond"
+
+
+def test_postcode_alone_and_unknown_addresses(table):
+    assert table.resolve("1 Some Street 3122").postcode == "3122"
+    assert table.resolve("somewhere far away") is None
@@ -0,0 +1,58 @@
+"""
+Demand forecast on a small fixed history: weekly buckets, smoothing weights and the hourly split.
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+from forecast import forecast_demand
+from reports import columns_from_docs
+
+# A Monday; the two history weeks run Monday 2 June to Sunday 15 June
+NOW = datetime(2025, 6, 16, 12, tzinfo=timezone.utc)
+MENU = {
+    "curry": {"name": "Butter Chicken", "category": "Curry"},
+    "naan": {"name": "Garlic Naan", "category": "Bread"},
+}
+
+
+def order(day: int, hour: int, *lines) -> dict:
+    return {
+        "created_at": datetime(2025, 6, day, hour, tzinfo=timezone.utc),
+        "customer_email": "sam@example.com",
+        "total": 20.0,
+        "items": [{"menu_item_id": item_id, "quantity": quantity} for item_id, quantity in lines],
+    }
+
+
+@pytest.fixture
+def forecast():
+    docs = [
+        order(1, 18, ("curry", 50)),                  # Sunday before the window
+        order(2, 18, ("curry", 2)),                   # Monday, older week
+        order(9, 18, ("curry", 3)),                   # Monday, recent week
+        order(9, 19, ("curry", 1), ("gone", 9)),      # a dish since taken off the menu
+        order(10, 12, ("naan", 3)),                   # Tuesday, recent week only
+        order(16, 10, ("curry", 50)),                 # today, not a full day yet
+    ]
+    return forecast_demand(columns_from_docs(docs), MENU, "UTC", NOW, history_weeks=2, smoothing=0.5)
+
+
+def test_weekdays_are_smoothed_across_weeks(forecast):
+    monday, tuesday, wednesday = forecast["days"][:3]
+    assert [day["date"] for day in forecast["days"]][:3] == ["2025-06-16", "2025-06-17", "2025-06-18"]
+    assert monday["weekday"] == "Monday" and len(forecast["days"]) == 7
+
+    # Weights 0.5 and 1 normalise to 1/3 and 2/3: 2/3 + 2 * 4/3 = 3.33
+    assert [(item["menu_item_id"], item["expected"]) for item in monday["items"]] == [("curry", 3.33)]
+    assert tuesday["items"][0]["expected"] == 2.0
+    assert wednesday["items"] == [] and wednesday["categories"] == []
+
+
+def test_hours_follow_the_dish_pattern_and_retired_dishes_drop_out(forecast):
+    monday, tuesday = forecast["days"][:2]
+    # Five of the six Monday curries sold at 18:00
+    assert monday["items"][0]["hours"] == {"18": 2.78, "19": 0.56}
+    assert tuesday["items"][0]["hours"] == {"12": 2.0}
+    assert monday["categories"] == [{"category": "Curry", "expected": 3.33}]
+    assert all(item["menu_item_id"] != "gone" for day in forecast["days"] for item in day["items"])
@@ -0,0 +1,80 @@
+"""
+Unix socket bus: a peer whose socket buffer is full must not silently miss an invalidation.
+"""
+import asyncio
+
+import invalidation_bus
+from invalidation_bus import TOPICS, UnixSocketBus
+
+
+class FullOnce:
+    """Wraps the sending socket so the first send reports a full peer buffer"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.full = True
+
+    def sendto(self, payload, address):
+        if self.full:
+            self.full = False
+            raise BlockingIOError
+        return self.sock.sendto(payload, address)
+
+    def close(self):
+        self.sock.close()
+
+
+def run_pair(tmp_path, scenario):
+    async def main():
+        sender, receiver = UnixSocketBus(str(tmp_path)), UnixSocketBus(str(tmp_path))
+        seen = []
+        for topic in TOPICS:
+            receiver.subscribe(topic, lambda topic=topic: seen.append(topic))
+        await sender.start(None)
+        await receiver.start(None)
+        try:
+            await scenario(sender, seen)
+        finally:
+            await sender.stop()
+            await receiver.stop()
+        return seen
+
+    return asyncio.run(main())
+
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+
+
+def test_full_peer_is_resynced_on_the_next_send(tmp_path, monkeypatch):
+    monkeypatch.setattr(invalidation_bus, "RESYNC_RETRY_SECONDS", 60)
+
+    async def scenario(sender, seen):
+        sender._sender = FullOnce(sender._sender)
+        await sender.publish("menu")
+        await settle()
+        assert seen == []
+        await sender.publish("banners")
+        await settle()
+        # Every topic, not just the one published second
+        assert sorted(seen) == sorted(TOPICS)
+        seen.clear()
+        await sender.publish("settings")
+        await settle()
+        assert seen == ["settings"]
+
+    run_pair(tmp_path, scenario)
+
+
+def test_full_peer_is_resynced_without_another_publish(tmp_path, monkeypatch):
+    monkeypatch.setattr(invalidation_bus, "RESYNC_RETRY_SECONDS", 0.05)
+
+    async def scenario(sender, seen):
+        sender._sender = FullOnce(sender._sender)
+        await sender.publish("menu")
+        await asyncio.sleep(0.3)
+        assert sorted(seen) == sorted(TOPICS)
+        assert not sender._behind
+
+    run_pair(tmp_path, scenario)
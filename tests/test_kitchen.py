@@ -0,0 +1,132 @@
+"""
+Kitchen display queue: category routing, voiding cancelled orders, and who may open a station stream.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from auth import ALGORITHM, SECRET_KEY, STREAM_SCOPE, create_access_token
+from kitchen import COLLECTION, KitchenQueue
+
+ADMIN = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+MENU = {
+    "naan": {"name": "Garlic Naan", "category": "Bread"},
+    "korma": {"name": "Chicken Korma", "category": "Chicken"},
+    "nuggets": {"name": "Chicken Nuggets", "category": "Kids Menu"},
+    "special": {"name": "Chef's Special", "category": "Specials"},
+}
+
+
+def order(order_id: str, *lines) -> dict:
+    return {
+        "order_id": order_id, "customer_name": "Sam", "created_at": datetime.now(timezone.utc),
+        "items": [{"menu_item_id": item_id, "quantity": quantity} for item_id, quantity in lines],
+    }
+
+
+def names(queue: KitchenQueue, station: str) -> list:
+    return [[line["name"] for line in ticket["items"]] for ticket in queue.open_tickets(station)]
+
+
+# ============= ROUTING =============
+
+def test_lines_are_split_by_category_into_station_tickets():
+    db = AsyncMongoMockClient()["kitchen_routing_test"]
+    queue = KitchenQueue(routes={"Kids Menu": "bar"}, default_station="tandoor")
+    tickets = asyncio.run(queue.add_order(
+        db, order("ORD-1", ("naan", 2), ("korma", 1), ("nuggets", 1), ("special", 1), ("deleted", 1)), MENU,
+    ))
+
+    assert sorted(ticket["station"] for ticket in tickets) == ["bar", "curry", "tandoor"]
+    # Unmapped categories and dishes missing from the menu go to the default station
+    assert names(queue, "tandoor") == [["Garlic Naan", "Chef's Special", "deleted"]]
+    assert names(queue, "curry") == [["Chicken Korma"]]
+    assert names(queue, "bar") == [["Chicken Nuggets"]]
+    assert names(queue, "fryer") == []
+    assert asyncio.run(db[COLLECTION].count_documents({"order_id": "ORD-1", "status": "open"})) == 3
+
+
+def test_routes_to_unknown_stations_are_refused():
+    with pytest.raises(ValueError):
+        KitchenQueue(routes={"Drinks": "sommelier"})
+    with pytest.raises(ValueError):
+        KitchenQueue(default_station="grill")
+
+
+# ============= VOIDING =============
+
+@pytest.fixture
+def shop(monkeypatch):
+    monkeypatch.setattr(server, "db", AsyncMongoMockClient()["kitchen_orders_test"])
+    monkeypatch.setattr(server, "kitchen_queue", KitchenQueue())
+    monkeypatch.setattr(server.write_guard, "ip_policy", server.BucketPolicy(1000, 1000))
+    monkeypatch.setattr(server.write_guard, "email_policy", server.BucketPolicy(1000, 1000))
+    server.menu_index.invalidate()
+    server.menu_availability.loaded = False
+    client = TestClient(server.app)
+    item_ids = [
+        client.post("/api/admin/menu", headers=ADMIN, json={
+            "name": name, "description": name, "price": 10.0, "category": category, "menu_type": "takeaway",
+        }).json()["id"]
+        for name, category in (("Garlic Naan", "Bread"), ("Lamb Rogan Josh", "Lamb"))
+    ]
+    yield client, item_ids
+    server.menu_index.invalidate()
+    server.menu_availability.loaded = False
+
+
+def place(client, item_ids) -> str:
+    response = client.post("/api/orders", json={
+        "customer_name": "Sam", "customer_email": "sam@example.com", "customer_phone": "0400000000",
+        "delivery_address": "1 Some Street, Hawthorn 3122", "payment_method": "Cash on Delivery",
+        "items": [{"menu_item_id": item_id, "quantity": 1} for item_id in item_ids],
+    })
+    assert response.status_code == 200
+    return response.json()["order_id"]
+
+
+def test_cancelling_an_order_voids_its_open_tickets(shop):
+    client, (naan, lamb) = shop
+    cancelled = place(client, [naan, lamb])
+    kept = place(client, [naan])
+    tickets = lambda station: client.get(f"/api/kitchen/stations/{station}/tickets", headers=ADMIN).json()
+    assert [ticket["order_id"] for ticket in tickets("tandoor")] == [cancelled, kept]
+
+    assert client.patch(f"/api/orders/{cancelled}", headers=ADMIN, json={"status": "Cancelled"}).status_code == 200
+    assert [ticket["order_id"] for ticket in tickets("tandoor")] == [kept]
+    assert tickets("curry") == []
+    statuses = asyncio.run(server.db[COLLECTION].distinct("status", {"order_id": cancelled}))
+    assert statuses == ["voided"]
+    # Nothing left to void the second time
+    assert asyncio.run(server.kitchen_queue.void_order(server.db, cancelled)) == 0
+
+
+# ============= STREAM TOKENS =============
+
+@pytest.mark.parametrize("token", [
+    pytest.param(create_access_token({"sub": "admin", "scope": STREAM_SCOPE}, expires_delta=timedelta(seconds=-1)),
+                 id="expired"),
+    pytest.param(jwt.encode({"sub": "admin", "scope": STREAM_SCOPE,
+                             "exp": datetime.now(timezone.utc) + timedelta(minutes=1)}, "guessed-secret",
+                            algorithm=ALGORITHM),
+                 id="forged"),
+    pytest.param(create_access_token({"sub": "admin"}), id="admin-token-in-url"),
+])
+def test_station_stream_refuses_bad_tokens(token):
+    client = TestClient(server.app)
+    response = client.get("/api/kitchen/stations/tandoor/stream", params={"token": token})
+    assert response.status_code == 401
+
+
+def test_station_stream_needs_a_token():
+    client = TestClient(server.app)
+    assert client.get("/api/kitchen/stations/tandoor/stream").status_code == 403
+    assert client.post("/api/kitchen/stream-token").status_code == 403
+    issued = client.post("/api/kitchen/stream-token", headers=ADMIN).json()
+    assert issued["expires_in"] == 60
+    assert jwt.decode(issued["token"], SECRET_KEY, algorithms=[ALGORITHM])["scope"] == STREAM_SCOPE
@@ -0,0 +1,179 @@
+"""
+Graceful shutdown under a real uvicorn process.
+
+SIGTERM must start draining straight away, alongside uvicorn's own
+handling: readiness reports "draining", a request already in flight is
+allowed to finish, and open event streams are ended, before the process
+exits.
+"""
+import http.client
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+APP = textwrap.dedent("""
+    import asyncio
+    from contextlib import asynccontextmanager
+
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    from event_stream import EventHub
+    from lifecycle import DrainMiddleware, Lifecycle, drain_on_signal
+
+    lifecycle = Lifecycle()
+    lifecycle.ready = True
+    events = EventHub(heartbeat=0.2)
+    lifecycle.on_drain(events.close)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        restore = drain_on_signal(lifecycle)
+        yield
+        restore()
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(DrainMiddleware, lifecycle=lifecycle, exempt_prefix="/health")
+
+    @app.get("/health/ready")
+    async def ready():
+        if not lifecycle.ready:
+            return JSONResponse(status_code=503, content={"status": "draining" if lifecycle.draining else "starting"})
+        return {"status": "ready"}
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(1.5)
+        return {"done": True, "ready": (await ready()).status_code == 200}
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(events.stream("screen", lambda: {}), media_type="text/event-stream")
+
+    @app.get("/fast")
+    async def fast():
+        return {"done": True}
+""")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get(port: int, path: str):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def server_process(tmp_path):
+    (tmp_path / "drain_app.py").write_text(APP)
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "drain_app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=tmp_path, env={"PYTHONPATH": f"{tmp_path}:{BACKEND_DIR}"},
+    )
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            _get(port, "/health/ready")
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                process.kill()
+                pytest.fail("uvicorn did not start")
+            time.sleep(0.05)
+    yield process, port
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+
+def test_sigterm_drains_in_flight_request(server_process):
+    process, port = server_process
+    slow = {}
+    request = threading.Thread(target=lambda: slow.update(result=_get(port, "/slow")))
+    request.start()
+    time.sleep(0.3)
+
+    process.send_signal(signal.SIGTERM)
+    time.sleep(0.3)
+    assert process.poll() is None
+
+    request.join(10)
+    # Finished normally, having seen readiness drop while it ran
+    assert slow["result"] == (200, b'{"done":true,"ready":false}')
+    assert process.wait(10) == 0
+
+
+def test_sigterm_ends_open_event_streams(server_process):
+    process, port = server_process
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request("GET", "/stream")
+    response = connection.getresponse()
+    assert response.status == 200
+    assert response.readline() == b"retry: 3000\n"
+
+    process.send_signal(signal.SIGTERM)
+    # The stream ends instead of holding shutdown up until SIGKILL
+    assert process.wait(10) == 0
+    response.read()
+    connection.close()
+
+
+def test_handler_runs_alongside_the_one_already_installed():
+    import asyncio
+    import os
+
+    from lifecycle import Lifecycle, drain_on_signal
+
+    lifecycle = Lifecycle()
+    lifecycle.ready = True
+    seen = []
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, seen.append, "server")
+        restore = drain_on_signal(lifecycle)
+        try:
+            os.kill(os.getpid(), signal.SIGTERM)
+            await asyncio.sleep(0.05)
+        finally:
+            restore()
+            loop.remove_signal_handler(signal.SIGTERM)
+
+    asyncio.run(run())
+    assert seen == ["server"]
+    assert lifecycle.draining and not lifecycle.ready
+
+
+def test_readiness_does_not_leak_the_database_error(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import server
+
+    class Unreachable:
+        async def command(self, name):
+            raise RuntimeError("No servers found yet, Topology Description: <mongo-0.internal:27017>")
+
+    monkeypatch.setattr(server, "db", Unreachable())
+    monkeypatch.setattr(server.lifecycle, "ready", True)
+    response = TestClient(server.app).get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "unavailable"}
@@ -0,0 +1,81 @@
+"""
+Prometheus metrics: exposition format, which Mongo commands feed the load shedder, and who may scrape.
+"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import metrics
+from metrics import Counter, Ewma, Histogram, MongoCommandListener, Registry
+
+
+def test_render_histogram_and_escaped_labels():
+    registry = Registry()
+    latency = Histogram("demo_seconds", "Demo latency.", ("route",), buckets=(0.1, 1.0), registry=registry)
+    errors = Counter("demo_errors_total", "Demo errors.", ("detail",), registry=registry)
+    latency.labels("/menu").observe(0.05)
+    latency.labels("/menu").observe(0.5)
+    latency.labels("/menu").observe(3)
+    errors.labels('say "hi"\\\nbye').inc(2)
+
+    assert registry.render().splitlines() == [
+        "# HELP demo_seconds Demo latency.",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{route="/menu",le="0.1"} 1',
+        'demo_seconds_bucket{route="/menu",le="1"} 2',
+        'demo_seconds_bucket{route="/menu",le="+Inf"} 3',
+        'demo_seconds_sum{route="/menu"} 3.55',
+        'demo_seconds_count{route="/menu"} 3',
+        "# HELP demo_errors_total Demo errors.",
+        "# TYPE demo_errors_total counter",
+        'demo_errors_total{detail="say \\"hi\\"\\\\\\nbye"} 2',
+    ]
+
+
+def command_events(listener: MongoCommandListener, request_id: int, name: str, collection: str, micros: int):
+    started = SimpleNamespace(command_name=name, command={name: collection}, connection_id=("db", 27017),
+                              request_id=request_id)
+    listener.started(started)
+    listener.succeeded(SimpleNamespace(command_name=name, connection_id=("db", 27017), request_id=request_id,
+                                       duration_micros=micros))
+
+
+def test_only_public_writes_feed_the_latency_signal(monkeypatch):
+    monkeypatch.setattr(metrics, "mongo_latency_ewma", Ewma(alpha=1.0))
+    listener = MongoCommandListener(latency_collections=("orders",))
+    scans = metrics.mongo_command_duration_seconds.labels("aggregate", "orders")
+    timed = sum(scans.counts)
+
+    command_events(listener, 1, "aggregate", "orders", 4_000_000)       # an admin report scan
+    command_events(listener, 2, "insert", "analytics_daily", 3_000_000)  # a rollup backfill
+    assert metrics.mongo_latency_ewma.value == 0.0
+
+    command_events(listener, 3, "insert", "orders", 250_000)
+    assert metrics.mongo_latency_ewma.value == pytest.approx(0.25)
+    # Every command is still timed for /metrics
+    assert sum(scans.counts) == timed + 1
+    assert not listener._pending
+
+
+@pytest.fixture
+def client():
+    import server
+    return server, TestClient(server.app)
+
+
+def test_metrics_needs_an_admin_or_scraper_token(client, monkeypatch):
+    server, client = client
+    from auth import create_access_token
+
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer nonsense"}).status_code == 401
+
+    admin = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+    response = client.get("/metrics", headers=admin)
+    assert response.status_code == 200
+    assert "# TYPE http_requests_total counter" in response.text
+
+    monkeypatch.setattr(server, "METRICS_TOKEN", "scrape-me")
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-me"}).status_code == 200
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-you"}).status_code == 401
@@ -0,0 +1,162 @@
+"""
+Opening hours: legacy parsing, timeline compilation and the cached public payload.
+"""
+import asyncio
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from opening_hours import WEEKDAYS, OpeningHours, compile_timeline, from_legacy, parse_time, timezone_name
+
+MELBOURNE = ZoneInfo("Australia/Melbourne")
+EVENINGS = {day: [{"open": "17:00", "close": "22:00"}] for day in WEEKDAYS}
+
+
+def local(*args) -> float:
+    return datetime(*args, tzinfo=MELBOURNE).timestamp()
+
+
+def config(weekly=None, overrides=(), last_order_minutes=0) -> dict:
+    return {"weekly": weekly or EVENINGS, "overrides": list(overrides),
+            "last_order_minutes": last_order_minutes, "last_seating_minutes": 60}
+
+
+# ============= PARSING =============
+
+@pytest.mark.parametrize("text, minutes", [
+    ("17:30", 1050), ("5:30 PM", 1050), ("5 pm", 1020), ("12 AM", 0), ("12:15 PM", 735), ("24:00", 1440),
+])
+def test_parse_time(text, minutes):
+    assert parse_time(text) == minutes
+
+
+@pytest.mark.parametrize("text", ["", "25:00", "24:30", "13 PM", "0 AM", "5:75", "noon"])
+def test_parse_time_rejects(text):
+    with pytest.raises(ValueError):
+        parse_time(text)
+
+
+def test_from_legacy_expands_day_ranges():
+    weekly = from_legacy({
+        "monday_thursday": "5:00 PM - 10:00 PM",
+        "friday_saturday": "12 PM - 3 PM, 5 PM - 1 AM",
+        "sunday": "Closed",
+    })
+    assert weekly["tuesday"] == weekly["thursday"] == [{"open": "17:00", "close": "22:00"}]
+    assert weekly["saturday"] == [{"open": "12:00", "close": "15:00"}, {"open": "17:00", "close": "01:00"}]
+    assert weekly["sunday"] == []
+
+
+def test_from_legacy_rejects_unknown_days():
+    with pytest.raises(ValueError):
+        from_legacy({"weekdays": "5 PM - 10 PM"})
+
+
+# ============= TIMELINE =============
+
+def test_overnight_range_runs_into_the_next_day():
+    weekly = {**EVENINGS, "saturday": [{"open": "17:00", "close": "01:00"}], "sunday": []}
+    timeline = compile_timeline(config(weekly), MELBOURNE, date(2025, 3, 10), 14)
+    # Saturday 15 March 17:00 to Sunday 01:00
+    assert timeline.interval_at(local(2025, 3, 16, 0, 30)) == (local(2025, 3, 15, 17), local(2025, 3, 16, 1))
+    assert timeline.interval_at(local(2025, 3, 16, 1, 0)) is None
+    assert timeline.next_opening(local(2025, 3, 16, 1, 0)) == local(2025, 3, 17, 17)
+
+
+def test_overrides_replace_the_weekly_hours():
+    overrides = [
+        {"date": "2025-03-12", "ranges": [], "note": "Closed for a private event"},
+        {"date": "2025-03-13", "ranges": [{"open": "11:00", "close": "23:00"}]},
+    ]
+    timeline = compile_timeline(config(overrides=overrides), MELBOURNE, date(2025, 3, 10), 14)
+    assert timeline.interval_at(local(2025, 3, 12, 18)) is None
+    assert timeline.next_opening(local(2025, 3, 12, 18)) == local(2025, 3, 13, 11)
+    assert timeline.interval_at(local(2025, 3, 13, 22, 30)) == (local(2025, 3, 13, 11), local(2025, 3, 13, 23))
+    assert timeline.interval_at(local(2025, 3, 14, 18)) == (local(2025, 3, 14, 17), local(2025, 3, 14, 22))
+
+
+@pytest.mark.parametrize("day, hours", [(date(2025, 4, 6), 5), (date(2025, 10, 5), 3)], ids=["dst-ends", "dst-starts"])
+def test_dst_days_follow_the_wall_clock(day, hours):
+    weekly = {name: [{"open": "00:00", "close": "04:00"}] for name in WEEKDAYS}
+    timeline = compile_timeline(config(weekly), MELBOURNE, day, 2)
+    start, end = timeline.interval_at(local(day.year, day.month, day.day, 0, 30))
+    assert (start, end) == (local(day.year, day.month, day.day), local(day.year, day.month, day.day, 4))
+    assert end - start == hours * 3600
+
+
+def test_accepts_stops_last_order_minutes_before_closing():
+    timeline = compile_timeline(config(), MELBOURNE, date(2025, 3, 10), 14)
+    assert timeline.accepts(local(2025, 3, 11, 21, 45), 15)
+    assert not timeline.accepts(local(2025, 3, 11, 21, 46), 15)
+    assert timeline.accepts(local(2025, 3, 11, 21, 59), 0)
+    assert not timeline.accepts(local(2025, 3, 11, 16, 59), 0)
+
+
+def test_adjacent_ranges_merge():
+    weekly = {day: [{"open": "12:00", "close": "15:00"}, {"open": "15:00", "close": "22:00"}] for day in WEEKDAYS}
+    timeline = compile_timeline(config(weekly), MELBOURNE, date(2025, 3, 10), 3)
+    assert timeline.interval_at(local(2025, 3, 10, 14)) == (local(2025, 3, 10, 12), local(2025, 3, 10, 22))
+
+
+# ============= CACHED PAYLOAD =============
+
+@pytest.fixture
+def hours():
+    db = AsyncMongoMockClient()["opening_hours_test"]
+    asyncio.run(db.opening_hours.insert_one({"id": "hours", **config()}))
+    return db, OpeningHours("Australia/Melbourne", horizon_days=14)
+
+
+def test_public_is_cached_until_the_next_boundary(hours):
+    db, opening_hours = hours
+    at = lambda *args: datetime(*args, tzinfo=MELBOURNE)
+
+    payload, valid_until = asyncio.run(opening_hours.public(db, at(2025, 3, 11, 18)))
+    assert payload["open_now"] and valid_until == local(2025, 3, 11, 22)
+    # Same answer from the cache until closing time
+    assert asyncio.run(opening_hours.public(db, at(2025, 3, 11, 21, 59)))[0] is payload
+
+    closed, valid_until = asyncio.run(opening_hours.public(db, at(2025, 3, 11, 22)))
+    assert not closed["open_now"]
+    # Closed overnight: the next boundary is midnight, when the days shift
+    assert valid_until == local(2025, 3, 12)
+    assert closed["next_opening"] == at(2025, 3, 12, 17)
+
+
+def test_public_is_dropped_when_hours_change(hours):
+    db, opening_hours = hours
+    now = datetime(2025, 3, 11, 18, tzinfo=MELBOURNE)
+    assert asyncio.run(opening_hours.public(db, now))[0]["open_now"]
+
+    asyncio.run(db.opening_hours.update_one(
+        {"id": "hours"}, {"$set": {"overrides": [{"date": "2025-03-11", "ranges": []}]}}
+    ))
+    assert asyncio.run(opening_hours.public(db, now))[0]["open_now"]
+    opening_hours.invalidate()
+    payload = asyncio.run(opening_hours.public(db, now))[0]
+    assert not payload["open_now"]
+    assert payload["next_opening"] == now.replace(hour=17) + timedelta(days=1)
+
+
+# ============= TIMEZONE =============
+
+def test_timezone_defaults_to_the_restaurants_own():
+    assert timezone_name({}) == "Australia/Melbourne"
+    assert timezone_name({"ANALYTICS_TIMEZONE": "Australia/Sydney"}) == "Australia/Sydney"
+    assert timezone_name({"RESTAURANT_TIMEZONE": "Asia/Kolkata", "ANALYTICS_TIMEZONE": "UTC"}) == "Asia/Kolkata"
+
+
+def test_seeded_hours_are_open_in_the_evening_by_default():
+    db = AsyncMongoMockClient()["opening_hours_default_test"]
+    # As written by init_admin_and_menus.py
+    asyncio.run(db.admin_settings.insert_one({"id": "settings", "opening_hours": {
+        "monday_thursday": "5:00 PM - 10:00 PM", "friday_saturday": "5:00 PM - 10:30 PM", "sunday": "5:00 PM - 10:00 PM",
+    }}))
+    opening_hours = OpeningHours(timezone_name({}))
+    evening = datetime(2025, 3, 11, 18, tzinfo=MELBOURNE)
+    assert asyncio.run(opening_hours.public(db, evening))[0]["open_now"]
+    # 6 PM UTC is 5 AM the next morning in Hawthorn
+    morning = datetime(2025, 3, 11, 18, tzinfo=ZoneInfo("UTC"))
+    assert not asyncio.run(opening_hours.public(db, morning))[0]["open_now"]
@@ -0,0 +1,138 @@
+"""
+Write throttling: token buckets refill and reject in both stores, and WriteGuard answers 429 / 503.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from mongomock_motor import AsyncMongoMockClient
+
+import rate_limit
+from rate_limit import BucketPolicy, LoadShedder, MemoryBucketStore, MongoBucketStore, WriteGuard
+
+# Two requests straight away, then one a second
+POLICY = BucketPolicy(rate=1, burst=2)
+
+
+# ============= BUCKET STORES =============
+
+def test_memory_bucket_rejects_when_dry_and_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    store = MemoryBucketStore()
+
+    async def take():
+        return await store.take("contact:ip:1.2.3.4", POLICY)
+
+    assert asyncio.run(take()) == (True, 0.0)
+    assert asyncio.run(take()) == (True, 0.0)
+    assert asyncio.run(take()) == (False, 1.0)
+    # Other keys have their own bucket
+    assert asyncio.run(store.take("contact:ip:5.6.7.8", POLICY))[0]
+
+    now[0] += 0.5
+    allowed, retry_after = asyncio.run(take())
+    assert not allowed and retry_after == pytest.approx(0.5)
+    now[0] += 0.5
+    assert asyncio.run(take()) == (True, 0.0)
+
+
+def test_memory_bucket_forgets_the_least_recent_key():
+    store = MemoryBucketStore(max_keys=2)
+
+    async def run():
+        for key in ("a", "b", "a", "c"):
+            await store.take(key, POLICY)
+
+    asyncio.run(run())
+    assert list(store._buckets) == ["a", "c"]
+
+
+def test_mongo_bucket_rejects_when_dry_and_refills():
+    collection = AsyncMongoMockClient()["rate_limit_test"].rate_limits
+    store = MongoBucketStore(collection)
+
+    async def run():
+        results = [await store.take("orders:email:sam@example.com", POLICY) for _ in range(3)]
+        # Pretend the last take was two seconds ago
+        await collection.update_one({"key": "orders:email:sam@example.com"},
+                                    {"$set": {"updated_at": datetime.now(timezone.utc) - timedelta(seconds=2)}})
+        results.append(await store.take("orders:email:sam@example.com", POLICY))
+        return results, await collection.count_documents({})
+
+    results, documents = asyncio.run(run())
+    assert [allowed for allowed, _ in results] == [True, True, False, True]
+    assert results[2][1] == pytest.approx(1, abs=0.1)
+    assert documents == 1
+
+
+# ============= WRITE GUARD =============
+
+def guarded_app(guard: WriteGuard, release: asyncio.Event = None) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/contact", dependencies=[Depends(guard("contact", "email"))])
+    async def contact():
+        if release is not None:
+            await release.wait()
+        return {"ok": True}
+
+    return app
+
+
+class RoundTripStore(MemoryBucketStore):
+    """Yields to the loop on every take, as the Mongo store does while it waits for the server"""
+
+    async def take(self, key: str, policy: BucketPolicy):
+        await asyncio.sleep(0)
+        return await super().take(key, policy)
+
+
+def guard_with(shedder: LoadShedder, ip_burst: float = 100, email_burst: float = 100) -> WriteGuard:
+    return WriteGuard(RoundTripStore(), BucketPolicy(rate=0.01, burst=ip_burst),
+                      BucketPolicy(rate=0.01, burst=email_burst), shedder)
+
+
+async def post_all(app: FastAPI, bodies: list, release: asyncio.Event = None) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        requests = [asyncio.create_task(client.post("/contact", json=body)) for body in bodies]
+        if release is not None:
+            await asyncio.sleep(0.1)
+            release.set()
+        return await asyncio.gather(*requests)
+
+
+def test_guard_returns_429_with_retry_after_per_email():
+    guard = guard_with(LoadShedder(10, 1.0, 10), email_burst=1)
+    responses = asyncio.run(post_all(guarded_app(guard), [{"email": "Sam@Example.com"}, {"email": "sam@example.com "},
+                                                         {"email": "alex@example.com"}]))
+    assert [response.status_code for response in responses] == [200, 429, 200]
+    assert int(responses[1].headers["retry-after"]) >= 1
+    assert guard.shedder.active == 0
+
+
+def test_guard_sheds_a_burst_beyond_the_concurrency_cap():
+    async def run():
+        release = asyncio.Event()
+        guard = guard_with(LoadShedder(2, 1.0, 10))
+        responses = await post_all(guarded_app(guard, release), [{"email": f"{i}@example.com"} for i in range(6)], release)
+        return guard, responses
+
+    guard, responses = asyncio.run(run())
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200, 200, 503, 503, 503, 503]
+    assert all(response.headers["retry-after"] == "5" for response in responses if response.status_code == 503)
+    # Slots are given back, including by requests turned away with 429
+    assert guard.shedder.active == 0
+
+
+def test_guard_sheds_while_the_database_is_slow(monkeypatch):
+    monkeypatch.setattr(rate_limit, "mongo_latency_ewma", SimpleNamespace(value=2.5))
+    guard = guard_with(LoadShedder(10, 1.0, 10))
+    response = asyncio.run(post_all(guarded_app(guard), [{"email": "sam@example.com"}]))[0]
+    assert response.status_code == 503
+    assert guard.shedder.active == 0
@@ -0,0 +1,178 @@
+"""
+Order history reports: NumPy/pandas columns versus a plain loop over order dicts.
+
+Each report in reports.py is benchmarked next to the straightforward Python
+version it replaces, on synthetic order histories of 1k to 100k orders, and
+both must agree before anything is timed. The one-off cost of streaming
+orders into columns (paid once per REPORTS_CACHE_SECONDS) is measured on
+its own:
+
+  python -m pytest tests/test_reports_benchmarks.py --benchmark-group-by=group,param:size
+"""
+import os
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from reports import basket_sizes, cohort_repeat_rates, columns_from_docs, item_mix, revenue_by_period
+
+MAX_ROWS = int(os.environ.get("BENCH_MAX_ROWS", "100000"))
+SIZES = [size for size in (1_000, 10_000, 100_000) if size <= MAX_ROWS]
+NOW = datetime(2025, 6, 15, 12, tzinfo=timezone.utc)
+MENU_ITEM_IDS = [str(uuid.UUID(int=i)) for i in range(60)]
+CUSTOMERS = 2_000
+MONTHS = 6
+
+
+def order_docs(n):
+    rnd = random.Random(n)
+    return [
+        {
+            "customer_email": f"guest{rnd.randrange(CUSTOMERS)}@example.com",
+            "created_at": NOW - timedelta(minutes=rnd.randrange(365 * 24 * 60)),
+            "total": round(rnd.uniform(12, 120), 2),
+            "items": [
+                {"menu_item_id": rnd.choice(MENU_ITEM_IDS), "quantity": rnd.randint(1, 3)}
+                for _ in range(rnd.randint(1, 6))
+            ],
+        }
+        for _ in range(n)
+    ]
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda size: f"size{size}")
+def history(request):
+    docs = order_docs(request.param)
+    return docs, columns_from_docs(docs)
+
+
+# ============= PURE-PYTHON REFERENCES =============
+
+def month_of(moment):
+    return moment.year * 12 + moment.month - 1
+
+
+def py_revenue_by_month(docs, periods):
+    current = month_of(NOW)
+    revenue, orders = defaultdict(float), defaultdict(int)
+    for doc in docs:
+        month = month_of(doc["created_at"])
+        if current - periods <= month <= current:
+            revenue[month] += doc["total"]
+            orders[month] += 1
+    return [(round(revenue[m], 2), orders[m]) for m in range(current - periods + 1, current + 1)]
+
+
+def py_basket_sizes(docs):
+    distribution = defaultdict(int)
+    total_items = 0
+    for doc in docs:
+        size = sum(line["quantity"] for line in doc["items"])
+        total_items += size
+        distribution[min(size, 10)] += 1
+    return [distribution[size] for size in range(1, 11)], round(total_items / len(docs), 2)
+
+
+def py_item_mix(docs, periods):
+    current = month_of(NOW)
+    quantities = defaultdict(lambda: [0] * periods)
+    for doc in docs:
+        month = month_of(doc["created_at"])
+        if current - periods < month <= current:
+            for line in doc["items"]:
+                quantities[line["menu_item_id"]][month - current + periods - 1] += line["quantity"]
+    return dict(quantities)
+
+
+def py_cohorts(docs, cohorts):
+    months_by_customer = defaultdict(set)
+    for doc in docs:
+        months_by_customer[doc["customer_email"]].add(month_of(doc["created_at"]))
+    current = month_of(NOW)
+    sizes, returning = defaultdict(int), defaultdict(int)
+    for months in months_by_customer.values():
+        first = min(months)
+        sizes[first] += 1
+        for month in months:
+            returning[(first, month - first)] += 1
+    rows = []
+    for cohort in range(current - cohorts + 1, current + 1):
+        size = sizes[cohort]
+        rows.append((size, [
+            round(returning[(cohort, k)] / size, 4) if size else None for k in range(1, current - cohort + 1)
+        ]))
+    return rows
+
+
+# ============= BENCHMARKS =============
+
+@pytest.mark.benchmark(group="report-columns")
+def test_load_columns(benchmark, history):
+    docs, _ = history
+    cols = benchmark.pedantic(columns_from_docs, args=(docs,), rounds=3)
+    assert cols.order_count == len(docs)
+
+
+@pytest.mark.benchmark(group="report-revenue")
+def test_revenue_python(benchmark, history):
+    docs, cols = history
+    expected = benchmark(py_revenue_by_month, docs, MONTHS)
+    rows = revenue_by_period(cols, "UTC", NOW, "month", MONTHS)["rows"]
+    assert [row["orders"] for row in rows] == [orders for _, orders in expected]
+    assert [row["revenue"] for row in rows] == pytest.approx([revenue for revenue, _ in expected], abs=0.011)
+
+
+@pytest.mark.benchmark(group="report-revenue")
+def test_revenue_vectorized(benchmark, history):
+    _, cols = history
+    result = benchmark(revenue_by_period, cols, "UTC", NOW, "month", MONTHS)
+    assert len(result["rows"]) == MONTHS
+
+
+@pytest.mark.benchmark(group="report-basket-sizes")
+def test_basket_sizes_python(benchmark, history):
+    docs, cols = history
+    distribution, mean_items = benchmark(py_basket_sizes, docs)
+    result = basket_sizes(cols, "UTC", NOW)
+    assert [bucket["orders"] for bucket in result["distribution"]] == distribution
+    assert result["mean_items"] == mean_items
+
+
+@pytest.mark.benchmark(group="report-basket-sizes")
+def test_basket_sizes_vectorized(benchmark, history):
+    _, cols = history
+    result = benchmark(basket_sizes, cols, "UTC", NOW)
+    assert result["orders"] == cols.order_count
+
+
+@pytest.mark.benchmark(group="report-item-mix")
+def test_item_mix_python(benchmark, history):
+    docs, cols = history
+    expected = benchmark(py_item_mix, docs, MONTHS)
+    result = item_mix(cols, "UTC", NOW, "month", MONTHS, limit=len(MENU_ITEM_IDS))
+    assert {item["menu_item_id"]: item["quantities"] for item in result["items"]} == expected
+
+
+@pytest.mark.benchmark(group="report-item-mix")
+def test_item_mix_vectorized(benchmark, history):
+    _, cols = history
+    result = benchmark(item_mix, cols, "UTC", NOW, "month", MONTHS)
+    assert result["items"]
+
+
+@pytest.mark.benchmark(group="report-cohorts")
+def test_cohorts_python(benchmark, history):
+    docs, cols = history
+    expected = benchmark(py_cohorts, docs, MONTHS)
+    rows = cohort_repeat_rates(cols, "UTC", NOW, MONTHS)["cohorts"]
+    assert [(row["customers"], row["repeat_rates"]) for row in rows] == expected
+
+
+@pytest.mark.benchmark(group="report-cohorts")
+def test_cohorts_vectorized(benchmark, history):
+    _, cols = history
+    result = benchmark(cohort_repeat_rates, cols, "UTC", NOW, MONTHS)
+    assert len(result["cohorts"]) == MONTHS
@@ -0,0 +1,27 @@
+"""
+Trusted reads: documents missing fields come out the way validation would have shaped them.
+"""
+from datetime import datetime
+
+import orjson
+
+from serialization import dump_trusted, fill_defaults
+from server import MenuItem
+
+
+def test_fills_static_defaults_and_calls_factories():
+    # A seeded dish from before id/created_at were written
+    docs = [{"name": "Samosa", "description": "Two pieces", "price": 8.0, "category": "Entree", "menu_type": "takeaway"},
+            {"name": "Naan", "description": "Butter", "price": 4.0, "category": "Bread", "menu_type": "dine-in"}]
+    filled = fill_defaults(MenuItem, docs)
+    assert all(isinstance(doc["id"], str) and doc["id"] for doc in filled)
+    assert filled[0]["id"] != filled[1]["id"]
+    assert all(isinstance(doc["created_at"], datetime) for doc in filled)
+    assert set(MenuItem.model_fields) <= set(filled[0])
+
+
+def test_keeps_stored_values():
+    doc = {"id": "dish-1", "name": "Samosa", "description": "Two pieces", "price": 8.0, "category": "Entree", "menu_type": "takeaway",
+           "created_at": datetime(2024, 5, 1)}
+    assert orjson.loads(dump_trusted(MenuItem, [dict(doc)]))[0]["id"] == "dish-1"
+    assert fill_defaults(MenuItem, [dict(doc)])[0]["created_at"] == datetime(2024, 5, 1)
@@ -0,0 +1,258 @@
+"""
+Micro-benchmarks for the serialization hot paths behind the list endpoints.
+
+Each benchmark runs on synthetic documents shaped exactly like what Mongo
+returns to server.py, at 100 to 100k rows. Record a baseline, then gate
+later runs on it:
+
+  python -m pytest tests/test_serialization_benchmarks.py --benchmark-autosave
+  python -m pytest tests/test_serialization_benchmarks.py \
+      --benchmark-compare --benchmark-compare-fail=median:20%
+
+Set BENCH_MAX_ROWS (default 100000) to skip the larger data sets locally.
+"""
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import List
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from email_service import EmailService
+from serialization import dump_trusted, dumps
+from server import Banner, ContactForm, MenuItem, Reservation
+
+MAX_ROWS = int(os.environ.get("BENCH_MAX_ROWS", "100000"))
+SIZES = [size for size in (100, 1_000, 10_000, 100_000) if size <= MAX_ROWS]
+EMAIL_LINE_COUNTS = [10, 100, 1_000]
+
+
+# ============= SYNTHETIC DATA =============
+
+def _created_at(i):
+    return (datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i)).isoformat()
+
+
+def menu_item_docs(n):
+    return [
+        {
+            "id": str(uuid.UUID(int=i)),
+            "name": f"Dish {i}",
+            "description": "Tender chicken in a rich, creamy tomato-based sauce with aromatic spices",
+            "price": 10 + (i % 200) / 10,
+            "category": ("Starters", "Curries", "Biryani", "Breads", "Desserts")[i % 5],
+            "menu_type": "dine-in" if i % 2 else "takeaway",
+            "image": f"/api/uploads/dish-{i}.jpg",
+            "featured": i % 10 == 0,
+            "created_at": _created_at(i),
+        }
+        for i in range(n)
+    ]
+
+
+def contact_docs(n):
+    return [
+        {
+            "id": str(uuid.UUID(int=i)),
+            "name": f"Guest {i}",
+            "email": f"guest{i}@example.com",
+            "phone": "+61 3 9749 3400",
+            "message": "Do you cater for private events on weekends?",
+            "created_at": _created_at(i),
+        }
+        for i in range(n)
+    ]
+
+
+def reservation_docs(n):
+    return [
+        {
+            "id": str(uuid.UUID(int=i)),
+            "name": f"Guest {i}",
+            "email": f"guest{i}@example.com",
+            "phone": "+61 3 9749 3400",
+            "date": "2025-12-24",
+            "time": "19:00",
+            "guests": 2 + i % 6,
+            "special_requests": "Window table" if i % 3 == 0 else None,
+            "created_at": _created_at(i),
+        }
+        for i in range(n)
+    ]
+
+
+def banner_docs(n):
+    return [
+        {
+            "id": str(uuid.UUID(int=i)),
+            "image": f"/api/uploads/banner-{i}.jpg",
+            "title": f"Banner {i}",
+            "description": "Authentic Indian flavours by the lake",
+            "button_text": "Order Now",
+            "button_link": "/menu",
+            "order": i,
+            "active": True,
+            "created_at": _created_at(i),
+        }
+        for i in range(n)
+    ]
+
+
+DATASETS = {
+    "menu_items": (MenuItem, menu_item_docs),
+    "contacts": (ContactForm, contact_docs),
+    "reservations": (Reservation, reservation_docs),
+    "banners": (Banner, banner_docs),
+}
+
+
+def parse_created_at(docs):
+    """The per-row loop list endpoints ran before timestamps were stored as BSON dates"""
+    for doc in docs:
+        if isinstance(doc.get('created_at'), str):
+            doc['created_at'] = datetime.fromisoformat(doc['created_at'])
+    return docs
+
+
+def parsed_docs(make_docs, size):
+    return parse_created_at(make_docs(size))
+
+
+def rounds_for(size):
+    return max(3, min(50, 100_000 // size))
+
+
+# ============= BENCHMARKS =============
+
+@pytest.mark.benchmark(group="iso-date-parse")
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("dataset", DATASETS)
+def test_parse_iso_dates(benchmark, dataset, size):
+    _, make_docs = DATASETS[dataset]
+    docs = make_docs(size)
+
+    # Every round needs fresh string timestamps, so copy outside the timer
+    result = benchmark.pedantic(
+        parse_created_at,
+        setup=lambda: (([dict(doc) for doc in docs],), {}),
+        rounds=rounds_for(size),
+    )
+    assert isinstance(result[0]['created_at'], datetime)
+
+
+@pytest.mark.benchmark(group="response-model-validate")
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("dataset", DATASETS)
+def test_response_model_validation(benchmark, dataset, size):
+    model, make_docs = DATASETS[dataset]
+    adapter = TypeAdapter(List[model])
+    docs = parsed_docs(make_docs, size)
+
+    result = benchmark.pedantic(adapter.validate_python, args=(docs,), rounds=rounds_for(size))
+    assert len(result) == size
+
+
+@pytest.mark.benchmark(group="model-dump")
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("dataset", DATASETS)
+def test_model_dump(benchmark, dataset, size):
+    model, make_docs = DATASETS[dataset]
+    models = TypeAdapter(List[model]).validate_python(parsed_docs(make_docs, size))
+
+    result = benchmark.pedantic(
+        lambda: [m.model_dump() for m in models], rounds=rounds_for(size)
+    )
+    assert len(result) == size
+
+
+@pytest.mark.benchmark(group="json-encode")
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("dataset", DATASETS)
+def test_json_encode(benchmark, dataset, size):
+    """FastAPI's default path for dict responses: jsonable_encoder then json.dumps"""
+    _, make_docs = DATASETS[dataset]
+    docs = parsed_docs(make_docs, size)
+
+    result = benchmark.pedantic(
+        lambda: json.dumps(jsonable_encoder(docs)).encode("utf-8"), rounds=rounds_for(size)
+    )
+    assert result.startswith(b"[")
+
+
+@pytest.mark.benchmark(group="json-encode")
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("dataset", DATASETS)
+def test_fast_json_encode(benchmark, dataset, size):
+    """The FastJSONResponse path trusted reads take: orjson straight from the Mongo dicts"""
+    _, make_docs = DATASETS[dataset]
+    docs = parsed_docs(make_docs, size)
+
+    result = benchmark.pedantic(dumps, args=(docs,), rounds=rounds_for(size))
+    assert result.startswith(b"[")
+
+
+@pytest.mark.benchmark(group="trusted-read")
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("dataset", DATASETS)
+def test_validated_read(benchmark, dataset, size):
+    """What response_model did to every row: validate, then serialize"""
+    model, make_docs = DATASETS[dataset]
+    adapter = TypeAdapter(List[model])
+    docs = parsed_docs(make_docs, size)
+
+    result = benchmark.pedantic(lambda: adapter.dump_json(adapter.validate_python(docs)), rounds=rounds_for(size))
+    assert result.startswith(b"[")
+
+
+@pytest.mark.benchmark(group="trusted-read")
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("dataset", DATASETS)
+def test_trusted_read(benchmark, dataset, size):
+    """list_response's path: fill in missing defaults, then orjson"""
+    model, make_docs = DATASETS[dataset]
+    docs = parsed_docs(make_docs, size)
+
+    result = benchmark.pedantic(dump_trusted, args=(model, docs), rounds=rounds_for(size))
+    assert result.startswith(b"[")
+
+
+@pytest.mark.benchmark(group="email-render")
+@pytest.mark.parametrize("lines", EMAIL_LINE_COUNTS)
+def test_order_confirmation_render(benchmark, lines):
+    """Renders the order emails with SMTP delivery replaced by a no-op"""
+    rendered = []
+
+    async def capture(to_email, subject, body, body_html=None):
+        rendered.append(len(body) + len(body_html or ""))
+        return True
+
+    service = EmailService()
+    service.send_email = capture
+    items = [
+        {"name": f"Dish {i}", "quantity": 1 + i % 3, "price": 12.5, "subtotal": 12.5 * (1 + i % 3)}
+        for i in range(lines)
+    ]
+    subtotal = sum(item["subtotal"] for item in items)
+    loop = asyncio.new_event_loop()
+
+    def render():
+        loop.run_until_complete(service.send_order_confirmation(
+            to_email="guest@example.com", customer_name="Guest", order_id="ORD-BENCH001",
+            items=items, subtotal=subtotal, tax=subtotal * 0.08, delivery_fee=5.0,
+            total=subtotal * 1.08 + 5.0, delivery_address="1 Lake St", payment_method="Card",
+        ))
+        loop.run_until_complete(service.send_new_order_notification(
+            to_email="admin@example.com", order_id="ORD-BENCH001", customer_name="Guest",
+            customer_phone="0400 000 000", items=items, total=subtotal * 1.08 + 5.0,
+            delivery_address="1 Lake St",
+        ))
+
+    try:
+        benchmark.pedantic(render, rounds=rounds_for(lines * 10))
+    finally:
+        loop.close()
+    assert rendered
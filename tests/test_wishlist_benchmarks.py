@@ -0,0 +1,86 @@
+"""
+Wishlist page: fetch-everything versus the expanded wishlist endpoint.
+
+The old Wishlist.js downloaded the whole of /api/menu and filtered it
+against the wishlist ids in the browser; it now calls
+/api/wishlist/{user_id}?expand=items. Both paths run in process against a
+mongomock database so only server work and payload size are compared:
+
+  python -m pytest tests/test_wishlist_benchmarks.py --benchmark-group-by=group,param:seeded
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+MAX_ROWS = int(os.environ.get("BENCH_MAX_ROWS", "100000"))
+MENU_SIZES = [size for size in (100, 1_000, 5_000) if size <= MAX_ROWS]
+WISHLIST_SIZE = 5
+USER_ID = "bench-user"
+
+
+@pytest.fixture(scope="module", params=MENU_SIZES, ids=lambda size: f"menu{size}")
+def seeded(request):
+    menu_size = request.param
+    original_db = server.db
+    server.db = AsyncMongoMockClient()["wishlist_bench"]
+    items = [
+        server.MenuItem(
+            id=str(uuid.UUID(int=i)), name=f"Dish {i}",
+            description="Tender chicken in a rich, creamy tomato-based sauce with aromatic spices",
+            price=10 + (i % 200) / 10, category=("Starters", "Curries", "Biryani")[i % 3],
+            menu_type="dine-in" if i % 2 else "takeaway", image=f"/api/uploads/dish-{i}.jpg",
+        ).model_dump()
+        for i in range(menu_size)
+    ]
+    wishlist_ids = [item["id"] for item in items[::max(1, menu_size // WISHLIST_SIZE)][:WISHLIST_SIZE]]
+
+    async def seed():
+        await server.db.menu_items.insert_many(items)
+        await server.db.wishlists.insert_one(
+            server.Wishlist(user_id=USER_ID, menu_item_ids=wishlist_ids).model_dump()
+        )
+
+    asyncio.run(seed())
+    server.menu_index.invalidate()
+    yield menu_size, wishlist_ids
+    server.db = original_db
+    server.menu_index.invalidate()
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(server.app)
+
+
+@pytest.mark.benchmark(group="wishlist-page")
+def test_fetch_full_menu_and_filter(benchmark, seeded, client):
+    menu_size, wishlist_ids = seeded
+
+    def load_page():
+        wishlist = client.get(f"/api/wishlist/{USER_ID}").json()
+        menu = client.get("/api/menu")
+        items = [item for item in menu.json() if item["id"] in wishlist["menu_item_ids"]]
+        return items, len(menu.content)
+
+    items, payload_bytes = benchmark(load_page)
+    benchmark.extra_info["payload_bytes"] = payload_bytes
+    assert [item["id"] for item in items] == wishlist_ids
+
+
+@pytest.mark.benchmark(group="wishlist-page")
+def test_expanded_wishlist(benchmark, seeded, client):
+    menu_size, wishlist_ids = seeded
+
+    def load_page():
+        response = client.get(f"/api/wishlist/{USER_ID}", params={"expand": "items"})
+        return response.json()["items"], len(response.content)
+
+    items, payload_bytes = benchmark(load_page)
+    benchmark.extra_info["payload_bytes"] = payload_bytes
+    assert [item["id"] for item in items] == wishlist_ids